@@ -0,0 +1,252 @@
+import json
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlparse
+
+from dateutil.relativedelta import relativedelta
+
+from camp.enums.date_format import DateFormat
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+
+# A recreation.gov month payload recorded in July 2020.
+RECORDED_SAMPLE = Path(__file__).resolve().parent.parent / \
+    "camp" / "other" / "sample.json"
+RECORDED_SAMPLE_MONTH = datetime(2020, 7, 1)
+
+CAMPSITE_TYPES = ("STANDARD NONELECTRIC", "RV ELECTRIC",
+                  "TENT ONLY NONELECTRIC", "GROUP STANDARD NONELECTRIC")
+UNAVAILABLE_VALUES = ("Reserved", "Not Available", "Not Reservable")
+
+
+def _days_in_month(month_date):
+    start = datetime(month_date.year, month_date.month, 1)
+    end = start + relativedelta(months=1)
+    return [start + timedelta(days=i) for i in range((end - start).days)]
+
+
+def _site_ids(park_id, sites):
+    base = (int(park_id) % 100000) * 10000
+    return [str(base + i) for i in range(sites)]
+
+
+def recreation_month(park_id, month_date, sites=500, available_ratio=0.3, seed=0):
+    """ Build a synthetic recreation.gov availability payload for one month.
+
+    Args:
+        park_id: The park ID.
+        month_date: Any date in the month.
+        sites: The number of campsites. Defaults to 500.
+        available_ratio: The share of site nights that are available. Defaults to 0.3.
+        seed: The random seed, the same inputs always give the same payload. Defaults to 0.
+
+    Returns:
+        dict: The payload, shaped like /api/camps/availability/campground/{id}/month.
+    """
+    rng = random.Random("{}-{}-{}-{}".format(park_id,
+                        month_date.year, month_date.month, seed))
+    days = [
+        d.strftime(DateFormat.ISO_DATE_FORMAT_RESPONSE.value)
+        for d in _days_in_month(month_date)
+    ]
+    campsites = {}
+    for index, site_id in enumerate(_site_ids(park_id, sites)):
+        campsites[site_id] = {
+            "availabilities": {
+                day: "Available" if rng.random() < available_ratio else rng.choice(UNAVAILABLE_VALUES)
+                for day in days
+            },
+            "campsite_id": site_id,
+            "campsite_reserve_type": "Site-Specific",
+            "campsite_type": CAMPSITE_TYPES[index % len(CAMPSITE_TYPES)],
+            "capacity_rating": "Single",
+            "loop": "LOOP {}".format(chr(ord("A") + index % 6)),
+            "max_num_people": 8,
+            "min_num_people": 1,
+            "quantities": None,
+            "site": "{:03d}".format(index + 1),
+            "type_of_use": "Overnight",
+        }
+    return {"campsites": campsites, "count": len(campsites)}
+
+
+def recreation_campground(park_id):
+    """ Build a synthetic recreation.gov campground payload.
+
+    Args:
+        park_id: The park ID.
+
+    Returns:
+        dict: The payload, shaped like /api/camps/campgrounds/{id}.
+    """
+    return {"campground": {"facility_id": str(park_id), "facility_name": "Synthetic Campground {}".format(park_id)}}
+
+
+def reservecalifornia_grid(facility_id, start_date, end_date, units=500, available_ratio=0.3, seed=0):
+    """ Build a synthetic ReserveCalifornia grid payload.
+
+    Args:
+        facility_id: The facility ID.
+        start_date: The first date of the grid.
+        end_date: The last date of the grid.
+        units: The number of campsites. Defaults to 500.
+        available_ratio: The share of site nights that are free. Defaults to 0.3.
+        seed: The random seed. Defaults to 0.
+
+    Returns:
+        dict: The payload, shaped like the usedirect /search/grid response.
+    """
+    rng = random.Random("{}-{}-{}".format(facility_id, start_date.date(), seed))
+    days = [
+        (start_date + timedelta(days=i)).strftime("%Y-%m-%d")
+        for i in range(max((end_date - start_date).days, 1))
+    ]
+    unit_map = {}
+    for index, unit_id in enumerate(_site_ids(facility_id, units)):
+        unit_map[unit_id] = {
+            "UnitId": int(unit_id),
+            "Name": "Campsite #{}".format(index + 1),
+            "ShortName": str(index + 1),
+            "RecentPopups": 0,
+            "IsAda": index % 20 == 0,
+            "AllowWebBooking": True,
+            "MapInfo": {},
+            "IsWebViewable": True,
+            "IsFiltered": False,
+            "UnitCategoryId": 1,
+            "SleepingUnitIds": [83, 84],
+            "UnitTypeGroupId": 1,
+            "UnitTypeId": 1,
+            "VehicleLength": 24,
+            "OrderBy": index,
+            "OrderByRaw": index,
+            "SliceCount": len(days),
+            "AvailableCount": 0,
+            "Slices": {
+                day: {"Date": day, "IsFree": rng.random() < available_ratio}
+                for day in days
+            },
+        }
+    return {
+        "Facility": {
+            "FacilityId": int(facility_id),
+            "Name": "Synthetic State Park {}".format(facility_id),
+            "Units": unit_map,
+        }
+    }
+
+
+def reservecalifornia_place(place_id):
+    """ Build a synthetic ReserveCalifornia place payload.
+
+    Args:
+        place_id: The place ID.
+
+    Returns:
+        dict: The payload, shaped like the usedirect /search/place response.
+    """
+    return {
+        "SelectedPlace": {
+            "PlaceId": int(place_id),
+            "Name": "Synthetic State Park {}".format(place_id),
+            "Facilities": {
+                str(place_id * 10 + i): {"FacilityId": place_id * 10 + i, "Name": "Campground {}".format(i)}
+                for i in range(1, 4)
+            },
+        }
+    }
+
+
+def load_recorded_sample():
+    """ Load the recorded recreation.gov month payload.
+
+    Returns:
+        dict: The payload for July 2020.
+    """
+    with open(RECORDED_SAMPLE, "r", encoding="utf-8") as f:
+        return json.load(f)[0]
+
+
+class Recording:
+    """ Upstream payloads keyed by request, replayed instead of calling the APIs. """
+
+    def __init__(self, entries=None, meta=None):
+        self.entries = entries or {}
+        self.meta = meta or {}
+
+    @staticmethod
+    def key(url, params):
+        # Keyed by path so a recording replays against any base URL.
+        return "{} {}".format(urlparse(url).path, json.dumps(params or {}, sort_keys=True))
+
+    def add(self, url, params, payload):
+        self.entries[self.key(url, params)] = payload
+
+    def get(self, url, params):
+        return self.entries.get(self.key(url, params))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["entries"], data.get("meta"))
+
+    def save(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"meta": self.meta, "entries": self.entries}, f)
+
+
+class RecreationReplay:
+    """ Stands in for RecreationClient._send_request.
+
+    Recorded payloads are served first. Anything not recorded is generated
+    with the synthetic builders, so any park ID and month can be replayed.
+    """
+
+    def __init__(self, recording=None, sites=500, available_ratio=0.3):
+        self.recording = recording or Recording()
+        self.sites = sites
+        self.available_ratio = available_ratio
+        self.calls = 0
+
+    def __call__(self, url, params, endpoint=None):
+        self.calls += 1
+        recorded = self.recording.get(url, params)
+        if recorded is not None:
+            return recorded
+
+        park_id = url.rstrip("/").split("/")[-2 if url.endswith("/month") else -1]
+        if url.endswith("/month"):
+            month_date = datetime.strptime(
+                params["start_date"], DateFormat.ISO_DATE_FORMAT_REQUEST.value)
+            return recreation_month(park_id, month_date, self.sites, self.available_ratio)
+        return recreation_campground(park_id)
+
+
+class ReserveCaliforniaReplay:
+    """ Stands in for reservecalifornia_client.make_post_request.
+
+    Recorded payloads are served first, like RecreationReplay, anything
+    else is generated with the synthetic builders.
+    """
+
+    def __init__(self, recording=None, units=500, available_ratio=0.3):
+        self.recording = recording or Recording()
+        self.units = units
+        self.available_ratio = available_ratio
+        self.calls = 0
+
+    def __call__(self, url, data):
+        self.calls += 1
+        recorded = self.recording.get(url, data)
+        if recorded is not None:
+            return recorded
+
+        if url.endswith("/search/place"):
+            return reservecalifornia_place(int(data["PlaceId"]))
+        start_date = datetime.strptime(data["StartDate"], "%m-%d-%Y")
+        end_date = datetime.strptime(data["EndDate"], "%m-%d-%Y")
+        return reservecalifornia_grid(
+            data["FacilityId"], start_date, end_date, self.units, self.available_ratio)
@@ -0,0 +1,254 @@
+""" A local stand-in for the recreation.gov and ReserveCalifornia APIs.
+
+Serves the endpoints the clients use from recorded or synthetic payloads,
+with configurable latency, errors, throttling and payload size, so the
+scanner can be load tested without touching the live APIs:
+
+    python -m benchmarks.mock_server --port 8765 --latency-ms 80 --error-rate 0.01 --rate-limit 200
+    python cli.py --base-url http://127.0.0.1:8765 --start-date 2025-06-01 --end-date 2025-06-08 --parks 232447
+
+GET /__stats returns the request counters as JSON.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from benchmarks.fixtures import (Recording, RecreationReplay,
+                                 ReserveCaliforniaReplay)
+
+AVAILABILITY_PATH = re.compile(
+    r"^/api/camps/availability/campground/(?P<park_id>\d+)/month$")
+CAMPGROUND_PATH = re.compile(r"^/api/camps/campgrounds/(?P<park_id>\d+)$")
+SEARCH_PATH = re.compile(r"/fd/citypark/namecontains/(?P<query>.+)$")
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    # Share of requests answered with a 500.
+    error_rate: float = 0.0
+    # Share of requests answered with a 429, on top of rate_limit.
+    throttle_rate: float = 0.0
+    # Requests per second allowed before answering 429, None for no limit.
+    rate_limit: float = None
+    # Share of requests that stall for stall_ms, the slow tail.
+    stall_rate: float = 0.0
+    stall_ms: float = 0.0
+    sites: int = 500
+    available_ratio: float = 0.3
+    seed: int = 0
+
+
+class MockUpstream(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config, recording=None):
+        super().__init__(address, MockRequestHandler)
+        self.config = config
+        self.recreation = RecreationReplay(
+            recording, sites=config.sites, available_ratio=config.available_ratio)
+        self.reserve_california = ReserveCaliforniaReplay(
+            recording, units=config.sites, available_ratio=config.available_ratio)
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.tokens = config.rate_limit or 0.0
+        self.refilled_at = time.monotonic()
+        self.stats = {"requests": 0, "ok": 0, "errors": 0,
+                      "throttled": 0, "not_modified": 0, "bytes_sent": 0, "by_endpoint": {}}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def take_token(self):
+        """ Take a token from the rate limit bucket. """
+        if not self.config.rate_limit:
+            return True
+        now = time.monotonic()
+        self.tokens = min(
+            self.config.rate_limit,
+            self.tokens + (now - self.refilled_at) * self.config.rate_limit,
+        )
+        self.refilled_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def decide(self, endpoint):
+        """ Pick the status of the next response. """
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["by_endpoint"][endpoint] = self.stats["by_endpoint"].get(
+                endpoint, 0) + 1
+            roll = self.random.random()
+            if not self.take_token() or roll < self.config.throttle_rate:
+                self.stats["throttled"] += 1
+                return 429
+            if roll < self.config.throttle_rate + self.config.error_rate:
+                self.stats["errors"] += 1
+                return 500
+            self.stats["ok"] += 1
+            return 200
+
+    def delay(self):
+        with self.lock:
+            jitter = self.random.uniform(-self.config.jitter_ms,
+                                         self.config.jitter_ms)
+            if self.random.random() < self.config.stall_rate:
+                jitter += self.config.stall_ms
+        seconds = max(self.config.latency_ms + jitter, 0) / 1000
+        if seconds:
+            time.sleep(seconds)
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path == "/__stats":
+            with self.server.lock:
+                return self.send_json(200, dict(self.server.stats, config=asdict(self.server.config)))
+
+        match = AVAILABILITY_PATH.match(url.path)
+        if match:
+            return self.respond("availability", lambda: self.server.recreation(
+                self.server.url + url.path, {"start_date": params["start_date"]}))
+
+        match = CAMPGROUND_PATH.match(url.path)
+        if match:
+            return self.respond("campground", lambda: self.server.recreation(
+                self.server.url + url.path, {}))
+
+        match = SEARCH_PATH.search(url.path)
+        if match:
+            query = unquote(match.group("query"))
+            return self.respond("search", lambda: [{"Name": query, "PlaceId": zlib.crc32(query.encode()) % 1000 + 1}])
+
+        self.send_json(404, {"error": "Not found: {}".format(url.path)})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        data = json.loads(self.rfile.read(length) or b"{}")
+
+        if url.path.endswith("/search/grid"):
+            return self.respond("grid", lambda: self.server.reserve_california(url.path, data))
+        if url.path.endswith("/search/place"):
+            return self.respond("place", lambda: self.server.reserve_california(url.path, data))
+
+        self.send_json(404, {"error": "Not found: {}".format(url.path)})
+
+    def respond(self, endpoint, build):
+        self.server.delay()
+        status = self.server.decide(endpoint)
+        if status == 429:
+            return self.send_json(429, {"error": "Too Many Requests"}, {"Retry-After": "1"})
+        if status != 200:
+            return self.send_json(status, {"error": "Internal Server Error"})
+        self.send_json(200, build())
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        if status == 200:
+            # Validators like a CDN would send, so conditional requests can be tested.
+            etag = '"{:08x}"'.format(zlib.crc32(body))
+            headers = dict(headers or {}, ETag=etag)
+            if self.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+                with self.server.lock:
+                    self.server.stats["not_modified"] += 1
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.stats["bytes_sent"] += len(body)
+
+
+def start(config=None, host="127.0.0.1", port=0, recording=None):
+    """ Start the server on a background thread.
+
+    Args:
+        config: The MockConfig. Defaults to MockConfig().
+        host: The host to bind. Defaults to "127.0.0.1".
+        port: The port to bind, 0 picks a free one. Defaults to 0.
+        recording: Recorded payloads to serve before synthetic ones. Defaults to None.
+
+    Returns:
+        MockUpstream: The running server, stop it with shutdown().
+    """
+    server = MockUpstream((host, port), config or MockConfig(), recording)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve mock recreation.gov and ReserveCalifornia APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Share of requests answered with a 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="Share of requests answered with a 429")
+    parser.add_argument("--rate-limit", type=float,
+                        help="Requests per second before answering 429")
+    parser.add_argument("--stall-rate", type=float, default=0.0,
+                        help="Share of requests that stall for --stall-ms")
+    parser.add_argument("--stall-ms", type=float, default=0.0)
+    parser.add_argument("--sites", type=int, default=500,
+                        help="Campsites per campground, sets the payload size")
+    parser.add_argument("--available-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--recording", help="Recorded payloads from benchmarks.record")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        rate_limit=args.rate_limit,
+        stall_rate=args.stall_rate,
+        stall_ms=args.stall_ms,
+        sites=args.sites,
+        available_ratio=args.available_ratio,
+        seed=args.seed,
+    )
+    recording = Recording.load(args.recording) if args.recording else None
+    server = MockUpstream((args.host, args.port), config, recording)
+    print("{} Serving mock APIs on {}".format(
+        datetime.now().isoformat(timespec="seconds"), server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
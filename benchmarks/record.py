@@ -0,0 +1,80 @@
+""" Record live recreation.gov or ReserveCalifornia payloads for offline benchmarks.
+
+    python -m benchmarks.record --park 232447 --start-date 2025-06-01 --end-date 2025-08-01
+    python -m benchmarks.record --source reserve_california --park 718 --start-date 2025-06-01 --end-date 2025-08-01
+
+The file is written to benchmarks/fixtures/ and can be replayed with
+python -m benchmarks.run --recording <file>.
+"""
+import argparse
+from datetime import datetime
+
+import cli
+from benchmarks.fixtures import FIXTURE_DIR, Recording
+from camp.clients import reservecalifornia_client
+from camp.clients.recreation_client import RecreationClient
+
+SOURCES = ("recreation", "reserve_california")
+
+
+def record(park_id, start_date, end_date, source="recreation"):
+    """ Run one search against the live API and keep every payload.
+
+    Args:
+        park_id: The park ID, or the facility ID for ReserveCalifornia.
+        start_date: The start date.
+        end_date: The end date.
+        source: The API, recreation or reserve_california. Defaults to recreation.
+
+    Returns:
+        Recording: The recorded payloads.
+    """
+    recording = Recording(meta={
+        "park_id": park_id,
+        "source": source,
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "end_date": end_date.strftime("%Y-%m-%d"),
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+    })
+    if source == "reserve_california":
+        owner, name = reservecalifornia_client, "make_post_request"
+    else:
+        owner, name = RecreationClient, "_send_request"
+    send = getattr(owner, name)
+
+    def recording_send(url, params, *args, **kwargs):
+        payload = send(url, params, *args, **kwargs)
+        recording.add(url, params, payload)
+        return payload
+
+    setattr(owner, name, recording_send)
+    try:
+        cli.check_park(park_id, start_date, end_date, None, source=source)
+    finally:
+        setattr(owner, name, send)
+    return recording
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Record recreation.gov or ReserveCalifornia payloads for offline benchmarks.")
+    parser.add_argument("--park", type=int, required=True)
+    parser.add_argument("--source", choices=SOURCES, default="recreation")
+    parser.add_argument("--start-date", required=True, help="[YYYY-MM-DD]")
+    parser.add_argument("--end-date", required=True, help="[YYYY-MM-DD]")
+    parser.add_argument("--output", help="Defaults to benchmarks/fixtures/<source>_<park>.json")
+    args = parser.parse_args(argv)
+
+    recording = record(
+        args.park,
+        datetime.strptime(args.start_date, "%Y-%m-%d"),
+        datetime.strptime(args.end_date, "%Y-%m-%d"),
+        source=args.source,
+    )
+    path = args.output or FIXTURE_DIR / "{}_{}.json".format(args.source, args.park)
+    recording.save(path)
+    print("Recorded {} payloads to {}".format(len(recording.entries), path))
+
+
+if __name__ == "__main__":
+    main()
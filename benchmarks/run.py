@@ -0,0 +1,269 @@
+""" Benchmarks for the availability pipeline.
+
+Every upstream call is replayed from recorded or synthetic payloads, so this
+runs without network access:
+
+    python -m benchmarks.run --output bench_results.json
+    python -m benchmarks.run --compare bench_results.json
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+from dateutil.relativedelta import relativedelta
+
+import cli
+from benchmarks.fixtures import (FIXTURE_DIR, RECORDED_SAMPLE_MONTH, Recording, RecreationReplay,
+                                 ReserveCaliforniaReplay, load_recorded_sample)
+from camp.clients import reservecalifornia_client
+from camp.clients.recreation_client import RecreationClient
+from camp.itinerary import find_itineraries
+from camp.utils import formatter
+
+RECORDED_PARK_ID = 0
+SYNTHETIC_PARK_ID = 232447
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def timed(func, repeat, number):
+    """ Time a function, best of repeat runs of number calls each.
+
+    Args:
+        func: The function to time, called without arguments.
+        repeat: The number of runs.
+        number: The number of calls per run.
+
+    Returns:
+        dict: The timings in seconds per call.
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        runs.append((time.perf_counter() - start) / number)
+    return {
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.mean(runs),
+        "stdev": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def recorded_scenario():
+    """ The recorded July 2020 recreation.gov month. """
+    recording = Recording()
+    recording.add(
+        RecreationClient.availability_url(RECORDED_PARK_ID),
+        {"start_date": formatter.format_date(RECORDED_SAMPLE_MONTH)},
+        load_recorded_sample(),
+    )
+    return {
+        "park_id": RECORDED_PARK_ID,
+        "start_date": datetime(2020, 7, 1),
+        "end_date": datetime(2020, 7, 31),
+        "replay": RecreationReplay(recording),
+        "rc_replay": ReserveCaliforniaReplay(units=50),
+    }
+
+
+def recording_scenario(path):
+    """ A search recorded with benchmarks.record, replayed for the API it was recorded from. """
+    recording = Recording.load(path)
+    reserve_california = recording.meta.get("source") == "reserve_california"
+    return {
+        "park_id": recording.meta["park_id"],
+        "start_date": datetime.strptime(recording.meta["start_date"], "%Y-%m-%d"),
+        "end_date": datetime.strptime(recording.meta["end_date"], "%Y-%m-%d"),
+        "replay": RecreationReplay(None if reserve_california else recording),
+        "rc_replay": ReserveCaliforniaReplay(recording if reserve_california else None, units=50),
+    }
+
+
+def synthetic_scenario(sites, months):
+    """ A large synthetic campground over several months. """
+    start_date = datetime(2025, 5, 1)
+    end_date = start_date + relativedelta(months=months)
+    return {
+        "park_id": SYNTHETIC_PARK_ID,
+        "start_date": start_date,
+        "end_date": end_date,
+        "replay": RecreationReplay(sites=sites),
+        "rc_replay": ReserveCaliforniaReplay(units=sites),
+    }
+
+
+def run_scenario(scenario, repeat, number, nights):
+    park_id = scenario["park_id"]
+    start_date, end_date = scenario["start_date"], scenario["end_date"]
+    results = {}
+
+    with mock.patch.object(RecreationClient, "_send_request", scenario["replay"]), \
+            mock.patch.object(reservecalifornia_client, "make_post_request", scenario["rc_replay"]):
+        park_information = cli.get_park_information(
+            park_id, start_date, end_date)
+        results["get_park_information"] = timed(
+            lambda: cli.get_park_information(park_id, start_date, end_date), repeat, number)
+
+        results["get_num_available_sites"] = timed(
+            lambda: cli.get_num_available_sites(
+                park_information, start_date, end_date, nights=nights),
+            repeat, number)
+
+        # Whole range stays switching sites, see camp.itinerary.
+        results["find_itineraries"] = timed(
+            lambda: find_itineraries(park_information, start_date, end_date, nights=nights), repeat, number)
+
+        longest = max(park_information.values(), key=len)
+        results["consecutive_nights"] = timed(
+            lambda: cli.consecutive_nights(longest, nights), repeat, number)
+
+        info_by_park_id = {park_id: cli.check_park(
+            park_id, start_date, end_date, None, nights=nights)}
+        results["generate_human_output"] = timed(
+            lambda: cli.generate_human_output(
+                info_by_park_id, start_date, end_date, True),
+            repeat, number)
+        results["generate_json_output"] = timed(
+            lambda: cli.generate_json_output(info_by_park_id), repeat, number)
+
+        results["check_park"] = timed(
+            lambda: cli.check_park(
+                park_id, start_date, end_date, None, nights=nights),
+            repeat, number)
+        results["check_park_reserve_california"] = timed(
+            lambda: cli.check_park(
+                park_id, start_date, end_date, None, nights=nights, source="reserve_california"),
+            repeat, number)
+
+    results["_shape"] = {
+        "sites": len(park_information),
+        "site_nights_available": sum(len(v) for v in park_information.values()),
+        "days": (end_date - start_date).days,
+    }
+    return results
+
+
+def time_startup(repeat, statement="import cli"):
+    """ Time a fresh interpreter running a statement, best of repeat runs.
+
+    Args:
+        repeat: The number of runs.
+        statement: The Python statement to run. Defaults to "import cli".
+
+    Returns:
+        dict: The timings in seconds per run.
+    """
+    return timed(
+        lambda: subprocess.run(
+            [sys.executable, "-c", statement], cwd=REPO_ROOT, check=True),
+        repeat, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """ Print the change of each median against a baseline run. """
+    print("{:<55} {:>12} {:>12} {:>8}".format(
+        "benchmark", "baseline", "current", "change"))
+    for name, timing in sorted(results["benchmarks"].items()):
+        before = baseline["benchmarks"].get(name)
+        if not before:
+            continue
+        change = timing["median"] / before["median"] if before["median"] else float("inf")
+        print("{:<55} {:>10.3f}ms {:>10.3f}ms {:>7.2f}x".format(
+            name, before["median"] * 1000, timing["median"] * 1000, change))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the availability pipeline offline.")
+    parser.add_argument("--sites", type=int, default=500,
+                        help="Campsites in the synthetic campground (default 500)")
+    parser.add_argument("--months", type=int, default=6,
+                        help="Months in the synthetic search (default 6)")
+    parser.add_argument("--nights", type=int, default=2,
+                        help="Consecutive nights to search for (default 2)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Timed runs per benchmark (default 5)")
+    parser.add_argument("--number", type=int, default=1,
+                        help="Calls per timed run (default 1)")
+    parser.add_argument("--recording", action="append", default=[],
+                        help="Extra recorded payloads made with benchmarks.record (repeatable)")
+    parser.add_argument("--no-startup", action="store_true",
+                        help="Skip timing the start up of a fresh interpreter")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Compare against results written by an earlier run")
+    args = parser.parse_args(argv)
+
+    # The pipeline logs every site it finds, keep that out of the timings.
+    logging.disable(logging.INFO)
+
+    scenarios = {
+        "recorded": recorded_scenario(),
+        "synthetic_{}x{}".format(args.sites, args.months): synthetic_scenario(args.sites, args.months),
+    }
+    for path in args.recording:
+        scenarios["recorded_{}".format(Path(path).stem)] = recording_scenario(path)
+
+    benchmarks = {}
+    shapes = {}
+    try:
+        for scenario_name, scenario in scenarios.items():
+            timings = run_scenario(
+                scenario, args.repeat, args.number, args.nights)
+            shapes[scenario_name] = timings.pop("_shape")
+            for name, timing in timings.items():
+                benchmarks["{}/{}".format(scenario_name, name)] = timing
+    finally:
+        logging.disable(logging.NOTSET)
+
+    if not args.no_startup:
+        benchmarks["startup/python"] = time_startup(args.repeat, "pass")
+        benchmarks["startup/import_cli"] = time_startup(args.repeat)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fixtures": str(FIXTURE_DIR),
+            "scenarios": shapes,
+        },
+        "benchmarks": benchmarks,
+    }
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
+    else:
+        for name, timing in sorted(benchmarks.items()):
+            print("{:<55} {:>10.3f}ms".format(name, timing["median"] * 1000))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print("Results written to {}".format(args.output))
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+""" The JSON API of the web app.
+
+Every list is paginated (`page`, `page_size`) and takes `fields` to keep
+only some keys of each result. Responses carry an ETag and Last-Modified
+derived from the data and a Cache-Control max-age of how long it stays
+fresh, so clients polling with If-None-Match or If-Modified-Since get a 304
+instead of a new search, and are gzipped when the client accepts it.
+
+    GET /api/parks/?q=yosemite
+    GET /api/parks/<recarea_id>/facilities/
+    GET /api/facilities/<facility_id>/campsites/
+    GET /api/availability/?parks=232447,232449&start=2025-06-01&end=2025-06-05[&nights=2&weekends_only=1
+        &campsite_type=STANDARD+NONELECTRIC&campsite_ids=1,2]
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, time as datetime_time, timezone
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Case, IntegerField, Max, Value, When
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+
+from camp import metrics
+from camp.cache import AvailabilityCache
+from camp.engine import check_parks_async, month_starts
+from camp.enums.date_format import DateFormat
+from camp.models import Campsite, Facility, RecreationArea
+from camp.site_index import SiteIndex
+
+LOG = logging.getLogger(__name__)
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# The catalog changes with the RIDB imports, a few times a year.
+CATALOG_MAX_AGE = 3600
+# Availability months are fetched at most this often, however often clients poll.
+AVAILABILITY_MAX_AGE = 60
+
+AVAILABILITY_CACHE = AvailabilityCache(AVAILABILITY_MAX_AGE)
+
+
+class BadRequest(ValueError):
+    """ A query parameter is missing or invalid. """
+
+
+def paginate(request, items):
+    """ Pick the requested page of a list or queryset.
+
+    Returns:
+        tuple: The items of the page and the pagination fields of the response.
+    """
+    try:
+        page_size = min(int(request.GET.get("page_size", PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        raise BadRequest("page_size must be an integer")
+    if page_size < 1:
+        raise BadRequest("page_size must be positive")
+    paginator = Paginator(items, page_size)
+    try:
+        page = paginator.page(request.GET.get("page", 1))
+    except PageNotAnInteger:
+        raise BadRequest("page must be an integer")
+    except EmptyPage:
+        raise BadRequest("page must be between 1 and {}".format(paginator.num_pages))
+    return list(page.object_list), {
+        "count": paginator.count,
+        "page": page.number,
+        "num_pages": paginator.num_pages,
+        "page_size": page_size,
+    }
+
+
+def select_fields(request, results, available):
+    """ Keep the keys of each result listed in the `fields` parameter, all of them without it. """
+    fields = [f for f in request.GET.get("fields", "").split(",") if f]
+    unknown = sorted(set(fields) - set(available))
+    if unknown:
+        raise BadRequest("Unknown field(s) {}, expected some of {}".format(
+            ", ".join(unknown), ", ".join(available)))
+    if not fields:
+        return results
+    return [{field: result[field] for field in fields} for result in results]
+
+
+def cached_json(request, body, last_modified, max_age, etag=None):
+    """ A JSON response with validators, or a 304 if the client already has it.
+
+    Args:
+        request: The request.
+        body: The JSON body.
+        last_modified: When the data last changed, a Unix timestamp, or None.
+        max_age: Seconds the response stays fresh.
+        etag: The ETag. Defaults to a hash of the body.
+    """
+    data = json.dumps(body, sort_keys=True, separators=(",", ":"))
+    etag = etag or '"{}"'.format(hashlib.md5(data.encode()).hexdigest())
+    response = HttpResponse(data, content_type="application/json")
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=max(int(max_age), 0))
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+    metrics.inc("campquest_api_responses_total", status=str(response.status_code))
+    return response
+
+
+def api_view(view):
+    """ Only answer GET, gzip the response and turn a BadRequest into a 400. Works for sync and async views. """
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                return await view(request, *args, **kwargs)
+            except BadRequest as e:
+                return JsonResponse({"error": str(e)}, status=400)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except BadRequest as e:
+                return JsonResponse({"error": str(e)}, status=400)
+    return gzip_page(require_GET(wrapper))
+
+
+def catalog_response(request, queryset, fields, to_dict):
+    """ A page of a catalog queryset, last modified on the latest last_updated_date in it. """
+    latest = queryset.aggregate(latest=Max("last_updated_date"))["latest"]
+    last_modified = None
+    if latest is not None:
+        last_modified = datetime.combine(latest, datetime_time.min, tzinfo=timezone.utc).timestamp()
+    objects, body = paginate(request, queryset)
+    body["results"] = select_fields(request, [to_dict(o) for o in objects], fields)
+    return cached_json(request, body, last_modified, CATALOG_MAX_AGE)
+
+
+PARK_FIELDS = ("id", "name", "latitude", "longitude")
+FACILITY_FIELDS = ("id", "name", "type", "reservable", "latitude", "longitude")
+CAMPSITE_FIELDS = ("id", "name", "loop", "campsite_type", "type_of_use", "accessible", "latitude", "longitude")
+
+
+@api_view
+def parks(request):
+    """ The recreation areas whose name contains `q`. """
+    queryset = RecreationArea.objects.filter(
+        name__icontains=request.GET.get("q", "")).order_by("name", "rec_area_id")
+    return catalog_response(request, queryset, PARK_FIELDS, lambda area: {
+        "id": area.rec_area_id, "name": area.name, "latitude": area.latitude, "longitude": area.longitude,
+    })
+
+
+@api_view
+def facilities(request, recarea_id):
+    """ The facilities of a recreation area, campgrounds first. """
+    if not RecreationArea.objects.filter(pk=recarea_id).exists():
+        return JsonResponse({"error": "RecreationArea not found"}, status=404)
+    queryset = Facility.objects.filter(parent_rec_area_id=recarea_id).annotate(
+        campground_first=Case(When(type_description="Campground", then=Value(0)), default=Value(1),
+                              output_field=IntegerField()),
+    ).order_by("campground_first", "name", "facility_id")
+    return catalog_response(request, queryset, FACILITY_FIELDS, lambda facility: {
+        "id": facility.facility_id, "name": facility.name, "type": facility.type_description,
+        "reservable": facility.reservable, "latitude": facility.latitude, "longitude": facility.longitude,
+    })
+
+
+@api_view
+def campsites(request, facility_id):
+    """ The campsites of a facility. """
+    if not Facility.objects.filter(pk=facility_id).exists():
+        return JsonResponse({"error": "Facility not found"}, status=404)
+    queryset = Campsite.objects.filter(facility_id=facility_id).order_by("name", "campsite_id")
+    return catalog_response(request, queryset, CAMPSITE_FIELDS, lambda campsite: {
+        "id": campsite.campsite_id, "name": campsite.name, "loop": campsite.loop,
+        "campsite_type": campsite.campsite_type, "type_of_use": campsite.type_of_use,
+        "accessible": campsite.accessible, "latitude": campsite.latitude, "longitude": campsite.longitude,
+    })
+
+
+AVAILABILITY_FIELDS = ("park_id", "park_name", "available", "maximum", "sites", "error")
+
+
+def _date_param(request, name):
+    value = request.GET.get(name)
+    try:
+        return datetime.strptime(value, DateFormat.INPUT_DATE_FORMAT.value)
+    except (TypeError, ValueError):
+        raise BadRequest("{} must be a date [YYYY-MM-DD]".format(name))
+
+
+def _int_param(request, name):
+    value = request.GET.get(name)
+    try:
+        return int(value) if value else None
+    except ValueError:
+        raise BadRequest("{} must be an integer".format(name))
+
+
+def _int_list_param(request, name):
+    try:
+        return [int(v) for v in request.GET.get(name, "").split(",") if v]
+    except ValueError:
+        raise BadRequest("{} must be comma-separated integers".format(name))
+
+
+def availability_validators(request, parks, months):
+    """ The validators of an availability page, from the query and when its months were fetched.
+
+    They can be checked before searching, so a client polling an unchanged page gets its 304
+    without the search being evaluated again.
+
+    Returns:
+        tuple: The ETag, the last modified Unix timestamp and the seconds the page stays fresh,
+        or None if a month of the page is not cached or expired.
+    """
+    fetched = [AVAILABILITY_CACHE.fetched_at(park_id, month) for park_id in parks for month in months]
+    if None in fetched:
+        return None
+    key = json.dumps([sorted(request.GET.items()), fetched])
+    ages = [AVAILABILITY_CACHE.clock() - fetched_at for fetched_at in fetched] or [0.0]
+    return (
+        '"{}"'.format(hashlib.md5(key.encode()).hexdigest()),
+        time.time() - min(ages),
+        AVAILABILITY_MAX_AGE - max(ages),
+    )
+
+
+@api_view
+async def availability(request):
+    """ Search the availability of some parks. A page holds parks, each with its available sites or its error.
+
+    The parks are fetched concurrently on the event loop, a slow upstream does not hold a thread.
+    """
+    parks = [p for p in request.GET.get("parks", "").split(",") if p]
+    if not parks:
+        raise BadRequest("parks is required")
+    start_date, end_date = _date_param(request, "start"), _date_param(request, "end")
+    if end_date <= start_date:
+        raise BadRequest("end must be after start")
+    nights = _int_param(request, "nights")
+    campsite_ids = _int_list_param(request, "campsite_ids")
+    weekends_only = request.GET.get("weekends_only") in ("1", "true")
+    campsite_type = request.GET.get("campsite_type")
+
+    # Only the parks of the page are searched.
+    page_parks, body = paginate(request, parks)
+    months = list(month_starts(start_date, end_date))
+    AVAILABILITY_CACHE.prune()
+    validators = availability_validators(request, page_parks, months)
+    if validators is not None:
+        etag, last_modified, max_age = validators
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            patch_cache_control(not_modified, public=True, max_age=max(int(max_age), 0))
+            metrics.inc("campquest_api_responses_total", status=str(not_modified.status_code))
+            return not_modified
+
+    site_index = await sync_to_async(SiteIndex.from_db)(facility_ids=page_parks)
+    info_by_park_id = await check_parks_async(
+        page_parks, start_date, end_date, campsite_type, campsite_ids, nights=nights,
+        weekends_only=weekends_only, cache=AVAILABILITY_CACHE,
+    )
+    results = []
+    failed = False
+    for park_id, info in info_by_park_id.items():
+        if isinstance(info, Exception):
+            # One park failing upstream, e.g. an unknown ID or an open circuit, does not fail the page.
+            failed = True
+            results.append({
+                "park_id": park_id, "park_name": None, "available": None, "maximum": None, "sites": [],
+                "error": str(info),
+            })
+            continue
+        current, maximum, available_dates_by_site_id, park_name = info
+        metadata = site_index.metadata_for(available_dates_by_site_id)
+        results.append({
+            "park_id": park_id,
+            "park_name": park_name,
+            "available": current,
+            "maximum": maximum,
+            "sites": [
+                dict(metadata.get(str(site_id), {}), site_id=site_id, dates=dates)
+                for site_id, dates in available_dates_by_site_id.items()
+            ],
+            "error": None,
+        })
+    body["results"] = select_fields(request, results, AVAILABILITY_FIELDS)
+
+    # Fresh until the oldest month used is fetched again, modified when the newest one was fetched.
+    # A page with a failed park is not cached, the park is tried again on the next request.
+    validators = None if failed else availability_validators(request, page_parks, months)
+    if validators is None:
+        return cached_json(request, body, None, 0)
+    etag, last_modified, max_age = validators
+    return cached_json(request, body, last_modified, max_age, etag=etag)
@@ -0,0 +1,115 @@
+""" Burst polling around a known release time.
+
+Campsites released at a set time are gone within seconds. Before the
+release the park names are resolved and connections opened, so the first
+poll only fetches availability. The first poll is sent at the release
+instant, the next ones every `interval` seconds for `window` seconds, then
+polling drops back to the normal schedule. The request budget set with
+latency.configure keeps the burst within the allowed rate.
+"""
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+LOG = logging.getLogger(__name__)
+
+# Connections are opened this long before the release, so they are not closed as idle.
+WARMUP_SECONDS = 30
+# Requests a minute when a burst is run without --request-budget.
+DEFAULT_BUDGET = 120
+
+
+def parse_release(value):
+    """ Parse a release time, ISO 8601 with an optional UTC offset, local time without one.
+
+    Args:
+        value: The release time, e.g. "2025-01-15 10:00" or "2025-01-15T10:00:00-08:00".
+
+    Returns:
+        float: The release time as a Unix timestamp.
+    """
+    try:
+        return datetime.fromisoformat(value.strip()).timestamp()
+    except ValueError:
+        raise ValueError("Invalid release time {!r}, expected YYYY-MM-DD HH:MM[:SS][+HH:MM].".format(value))
+
+
+class BurstSchedule:
+    """ When to poll around a release.
+
+    Args:
+        release_at: The release time, a Unix timestamp.
+        window: Seconds of fast polling from the release. Defaults to 120.
+        interval: Seconds between polls during the window. Defaults to 1.
+        normal_interval: Seconds between polls outside the window. Defaults to 5.
+        clock: The wall clock. Defaults to time.time.
+    """
+
+    def __init__(self, release_at, window=120.0, interval=1.0, normal_interval=5.0, clock=time.time):
+        self.release_at = release_at
+        self.window = window
+        self.interval = interval
+        self.normal_interval = normal_interval
+        self.clock = clock
+
+    def in_burst(self, now=None):
+        now = self.clock() if now is None else now
+        return self.release_at <= now < self.release_at + self.window
+
+    def next_poll(self, now=None):
+        """ The time of the next poll after one that ended at `now`.
+
+        Polls in the window stay on a grid starting at the release instant,
+        so a slow sweep does not shift the ones after it.
+        """
+        now = self.clock() if now is None else now
+        if now < self.release_at:
+            return self.release_at
+        if now < self.release_at + self.window:
+            return self.release_at + math.floor((now - self.release_at) / self.interval + 1) * self.interval
+        return now + self.normal_interval
+
+
+def sleep_until(wall_time, clock=time.time, sleep=time.sleep):
+    """ Sleep until a wall clock time, in steps of at most a second so clock adjustments are noticed. """
+    while True:
+        left = wall_time - clock()
+        if left <= 0:
+            return
+        sleep(min(left, 1.0))
+
+
+def warm_up(parks, connections=4):
+    """ Resolve the names of the parks, opening up to `connections` connections to recreation.gov.
+
+    Returns:
+        dict: The error by park ID of the parks that could not be resolved.
+    """
+    from camp.clients.recreation_client import RecreationClient
+
+    RecreationClient.get_session()
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max(min(connections, len(parks)), 1)) as pool:
+        futures = {park_id: pool.submit(RecreationClient.get_park_name, park_id) for park_id in parks}
+        for park_id, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                LOG.warning("Could not warm up park %s: %s", park_id, error)
+                failed[park_id] = error
+    return failed
+
+
+def prepare(schedule, parks, connections=4, clock=time.time, sleep=time.sleep):
+    """ Wait for the release: warm up shortly before it, then sleep until the release instant. """
+    release_at = schedule.release_at
+    if clock() < release_at - WARMUP_SECONDS:
+        LOG.info("Waiting until %s to warm up", datetime.fromtimestamp(release_at - WARMUP_SECONDS))
+        sleep_until(release_at - WARMUP_SECONDS, clock, sleep)
+    started = time.perf_counter()
+    failed = warm_up(parks, connections)
+    LOG.info("Warmed up %s park(s) in %.2fs, %s failed", len(parks), time.perf_counter() - started, len(failed))
+    if clock() < release_at:
+        LOG.info("First poll at the release, %s", datetime.fromtimestamp(release_at))
+        sleep_until(release_at, clock, sleep)
@@ -0,0 +1,82 @@
+""" The availability cache shared by the watch daemon, the CLI and the web API. """
+import time
+
+from camp import metrics
+
+
+class AvailabilityCache:
+    """ Months of recreation.gov availability, kept for ttl seconds.
+
+    Pass get as the fetch argument of check_park so searches that overlap
+    share one request per park and month. With a StateStore the payloads
+    outlive the process: fresh ones are reused after a restart and stale
+    ones are revalidated with a conditional request.
+    """
+
+    def __init__(self, ttl, fetch=None, clock=time.monotonic, store=None):
+        self.ttl = ttl
+        self.fetch = fetch
+        self.clock = clock
+        self.store = store
+        self.entries = {}
+
+    def get(self, park_id, month_date):
+        key = (str(park_id), month_date.year, month_date.month)
+        entry = self.entries.get(key)
+        hit = entry is not None and self.clock() - entry[0] < self.ttl
+        metrics.record_cache("availability", hit)
+        if not hit:
+            entry = self.entries[key] = (self.clock(), self._load(park_id, month_date))
+        return entry[1]
+
+    async def get_async(self, park_id, month_date, fetch):
+        """ get for the event loop: a miss awaits fetch(park_id, month_date). The state store is not used. """
+        key = (str(park_id), month_date.year, month_date.month)
+        entry = self.entries.get(key)
+        hit = entry is not None and self.clock() - entry[0] < self.ttl
+        metrics.record_cache("availability", hit)
+        if not hit:
+            payload = await fetch(park_id, month_date)
+            entry = self.entries[key] = (self.clock(), payload)
+        return entry[1]
+
+    def _load(self, park_id, month_date):
+        stored = self.store.load_month(park_id, month_date) if self.store else None
+        if stored is not None and time.time() - stored[0] < self.ttl:
+            return stored[1]
+
+        if self.fetch is not None:
+            payload = self.fetch(park_id, month_date)
+            if self.store:
+                self.store.save_month(park_id, month_date, payload)
+            return payload
+
+        from camp.clients.recreation_client import RecreationClient
+        if self.store is None:
+            return RecreationClient.get_availability(park_id, month_date)
+        etag, last_modified = stored[2:] if stored else (None, None)
+        payload, etag, last_modified = RecreationClient.get_availability_if_changed(
+            park_id, month_date, etag, last_modified)
+        if payload is None:
+            self.store.touch_month(park_id, month_date)
+            return stored[1]
+        self.store.save_month(park_id, month_date, payload, etag, last_modified)
+        return payload
+
+    def age(self, park_id, month_date):
+        """ Seconds since a month was fetched, None if it is not cached. """
+        entry = self.entries.get((str(park_id), month_date.year, month_date.month))
+        return None if entry is None else self.clock() - entry[0]
+
+    def fetched_at(self, park_id, month_date):
+        """ When a month was fetched, on the cache clock, None if it is not cached or expired. """
+        entry = self.entries.get((str(park_id), month_date.year, month_date.month))
+        if entry is None or self.clock() - entry[0] >= self.ttl:
+            return None
+        return entry[0]
+
+    def prune(self):
+        """ Drop expired months. """
+        now = self.clock()
+        for key in [k for k, (fetched_at, _) in self.entries.items() if now - fetched_at >= self.ttl]:
+            del self.entries[key]
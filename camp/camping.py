@@ -1,26 +1,15 @@
 # -*- coding: utf-8 -*-
 #!/usr/bin/env python3
 
-import json
+import asyncio
 import logging
-from collections import defaultdict
-from datetime import datetime, timedelta
-from itertools import count, groupby
 
-from dateutil import rrule
-
-from camp.clients.recreation_client import RecreationClient
-from camp.enums.date_format import DateFormat
+from camp import metrics
+from camp.engine import check_park, check_parks_async, generate_human_output, generate_json_output
 from camp.enums.emoji import Emoji
-from camp.utils import formatter
 
+# Handlers come from LOGGING in campsitefinder/settings.py.
 LOG = logging.getLogger(__name__)
-log_formatter = logging.Formatter(
-    "%(asctime)s - %(process)s - %(levelname)s - %(message)s"
-)
-sh = logging.StreamHandler()
-sh.setFormatter(log_formatter)
-LOG.addHandler(sh)
 
 
 class bcolors:
@@ -35,149 +24,50 @@ class bcolors:
     UNDERLINE = '\033[4m'
 
 
-def get_park_information(
-    park_id, start_date, end_date, campsite_type=None, campsite_ids=(), excluded_site_ids=[]
-):
-    start_of_month = datetime(start_date.year, start_date.month, 1)
-    months = list(
-        rrule.rrule(rrule.MONTHLY, dtstart=start_of_month, until=end_date)
-    )
-
-    api_data = []
-    for month_date in months:
-        api_data.append(RecreationClient.get_availability(park_id, month_date))
-
-    data = {}
-    for month_data in api_data:
-        for campsite_id, campsite_data in month_data["campsites"].items():
-            if campsite_id in excluded_site_ids:
-                continue
-            available = []
-            a = data.setdefault(campsite_id, [])
-            for date, availability_value in campsite_data[
-                "availabilities"
-            ].items():
-                if availability_value != "Available":
-                    continue
-
-                if (
-                    campsite_type
-                    and campsite_type != campsite_data["campsite_type"]
-                ):
-                    continue
-
-                if (
-                    len(campsite_ids) > 0
-                    and campsite_data["campsite_id"] not in campsite_ids
-                ):
-                    continue
-
-                available.append(date)
-            if available:
-                a += available
-
-    return data
-
-
-def is_weekend(date):
-    weekday = date.weekday()
-    return weekday == 5 or weekday == 6  # Saturday is 5, Sunday is 6
-
-
-def get_num_available_sites(
-    park_information, start_date, end_date, nights=None, weekends_only=False,
+def run_campsite_check(
+    parks,
+    start_date,
+    end_date,
+    campsite_type=None,
+    campsite_ids=(),
+    nights=None,
+    weekends_only=False,
+    show_campsite_info=False,
+    excluded_site_ids=(),
+    json_output=False,
+    site_index=None,
+    source="recreation",
+    index_url=None,
 ):
-    maximum = len(park_information)
-    num_available = 0
-    num_days = (end_date - start_date).days
-    dates = [end_date - timedelta(days=i) for i in range(1, num_days + 1)]
-
-    if weekends_only:
-        # Convert the filter object to a list
-        dates = list(filter(is_weekend, dates))
-    dates = set(
-        formatter.format_date(
-            i, format_string=DateFormat.ISO_DATE_FORMAT_RESPONSE.value
-        )
-        for i in dates
-    )
-
-    if nights not in range(1, num_days + 1):
-        nights = num_days
-        # LOG.debug("Setting number of nights to {}.".format(nights))
-
-    available_dates_by_campsite_id = defaultdict(list)
-    for site, availabilities in park_information.items():
-        desired_available = [
-            date for date in availabilities if date in dates
-        ]
-
-        if not desired_available:
-            continue
+    info_by_park_id = {}
+    if index_url and source == "recreation":
+        from camp.index import IndexClient
 
-        appropriate_consecutive_ranges = consecutive_nights(
-            desired_available, nights
+        # The index service answers from memory, parks it does not index are checked upstream.
+        indexed, _ = IndexClient(index_url).query(
+            parks, start_date, end_date, nights=nights, weekends_only=weekends_only, campsite_type=campsite_type,
+            campsite_ids=campsite_ids, excluded_site_ids=excluded_site_ids,
         )
-
-        if appropriate_consecutive_ranges:
-            num_available += 1
-            # LOG.debug("Available site {}: {}".format(num_available, site))
-
-        for r in appropriate_consecutive_ranges:
-            start, end = r
-            available_dates_by_campsite_id[int(site)].append(
-                {"start": start, "end": end}
-            )
-
-    return num_available, maximum, available_dates_by_campsite_id
-
-
-def consecutive_nights(available, nights):
-    ordinal_dates = [
-        datetime.strptime(
-            dstr, DateFormat.ISO_DATE_FORMAT_RESPONSE.value
-        ).toordinal()
-        for dstr in available
-    ]
-    c = count()
-
-    consecutive_ranges = list(
-        list(g) for _, g in groupby(ordinal_dates, lambda x: x - next(c))
-    )
-
-    long_enough_consecutive_ranges = []
-    for r in consecutive_ranges:
-        if len(r) < nights:
+        info_by_park_id.update(indexed)
+    for park_id in parks:
+        if park_id in info_by_park_id:
             continue
-        for start_index in range(0, len(r) - nights + 1):
-            start_nice = formatter.format_date(
-                datetime.fromordinal(r[start_index]),
-                format_string=DateFormat.INPUT_DATE_FORMAT.value,
+        with metrics.timer("campquest_stage_seconds", stage="check_park", park=str(park_id)):
+            info_by_park_id[park_id] = check_park(
+                park_id,
+                start_date,
+                end_date,
+                campsite_type,
+                campsite_ids,
+                nights=nights,
+                weekends_only=weekends_only,
+                excluded_site_ids=excluded_site_ids,
+                source=source,
             )
-            end_nice = formatter.format_date(
-                datetime.fromordinal(r[start_index + nights - 1] + 1),
-                format_string=DateFormat.INPUT_DATE_FORMAT.value,
-            )
-            long_enough_consecutive_ranges.append((start_nice, end_nice))
-
-    return long_enough_consecutive_ranges
+    return _render(info_by_park_id, start_date, end_date, show_campsite_info, json_output, site_index)
 
 
-def check_park(
-    park_id, start_date, end_date, campsite_type, campsite_ids=(), nights=None, weekends_only=False, excluded_site_ids=[],
-):
-    park_information = get_park_information(
-        park_id, start_date, end_date, campsite_type, campsite_ids, excluded_site_ids=excluded_site_ids,
-    )
-    # LOG.debug("Park information: {}".format(park_information))
-    park_name = RecreationClient.get_park_name(park_id)
-    current, maximum, availabilities_filtered = get_num_available_sites(
-        park_information, start_date, end_date, nights=nights, weekends_only=weekends_only,
-    )
-    return current, maximum, availabilities_filtered, park_name
-
-
-def run_campsite_check(
+async def run_campsite_check_async(
     parks,
     start_date,
     end_date,
@@ -186,91 +76,51 @@ def run_campsite_check(
     nights=None,
     weekends_only=False,
     show_campsite_info=False,
-    excluded_site_ids=[],
+    excluded_site_ids=(),
     json_output=False,
+    site_index=None,
+    index_url=None,
+    cache=None,
 ):
+    """ run_campsite_check for the async views: recreation.gov parks are fetched concurrently on the event loop. """
     info_by_park_id = {}
-    for park_id in parks:
-        info_by_park_id[park_id] = check_park(
-            park_id,
-            start_date,
-            end_date,
-            campsite_type,
-            campsite_ids,
-            nights=nights,
-            weekends_only=weekends_only,
-            excluded_site_ids=excluded_site_ids,
+    if index_url:
+        from camp.index import IndexClient
+
+        # A local socket, answered from memory, the thread is not held for long.
+        indexed, _ = await asyncio.to_thread(
+            IndexClient(index_url).query, parks, start_date, end_date, nights=nights, weekends_only=weekends_only,
+            campsite_type=campsite_type, campsite_ids=campsite_ids, excluded_site_ids=excluded_site_ids,
         )
+        info_by_park_id.update(indexed)
+    remaining = [park_id for park_id in parks if park_id not in info_by_park_id]
+    if remaining:
+        with metrics.timer("campquest_stage_seconds", stage="check_parks"):
+            info_by_park_id.update(await check_parks_async(
+                remaining, start_date, end_date, campsite_type, campsite_ids, nights=nights,
+                weekends_only=weekends_only, excluded_site_ids=excluded_site_ids, cache=cache,
+            ))
+    # A failed park is reported as skipped instead of failing the whole search
+    failed = {park_id: info for park_id, info in info_by_park_id.items() if isinstance(info, Exception)}
+    info_by_park_id = {park_id: info_by_park_id[park_id] for park_id in parks if park_id not in failed}
+    return _render(info_by_park_id, start_date, end_date, show_campsite_info, json_output, site_index, failed)
+
+
+def _render(info_by_park_id, start_date, end_date, show_campsite_info, json_output, site_index, failed=None):
+    """ Render the results as JSON or human output, returning the parks' info too with show_campsite_info. """
     if json_output:
-        output, has_availabilities = generate_json_output(info_by_park_id)
+        output, has_availabilities = generate_json_output(
+            info_by_park_id, site_index=site_index, errors=failed)
     else:
         output, has_availabilities = generate_human_output(
-            info_by_park_id, start_date, end_date, gen_campsite_info=show_campsite_info
+            info_by_park_id, start_date, end_date, gen_campsite_info=show_campsite_info,
+            site_index=site_index,
         )
+        for park_id, error in (failed or {}).items():
+            output += "\n{emoji} Park {park_id} skipped: {error}".format(
+                emoji=Emoji.SKIPPED.value, park_id=park_id, error=error)
 
     if show_campsite_info:
         return output, has_availabilities, info_by_park_id
 
     return output, has_availabilities
-
-
-def generate_human_output(
-    info_by_park_id, start_date, end_date, gen_campsite_info=False
-):
-    out = []
-    has_availabilities = False
-    for park_id, info in info_by_park_id.items():
-        current, maximum, available_dates_by_site_id, park_name = info
-        if current:
-            emoji = Emoji.SUCCESS.value
-            has_availabilities = True
-        else:
-            emoji = Emoji.FAILURE.value
-
-        out.append(
-            "{emoji} {park_name} ({park_id}): {current} site(s) available out of {maximum} site(s)".format(
-                emoji=emoji,
-                park_name=park_name,
-                park_id=park_id,
-                current=current,
-                maximum=maximum,
-            )
-        )
-
-        if gen_campsite_info and available_dates_by_site_id:
-            for site_id, dates in available_dates_by_site_id.items():
-                out.append(
-                    "  * Site {site_id} is available on the following dates:".format(
-                        site_id=site_id
-                    )
-                )
-                for date in dates:
-                    out.append(
-                        "    * {start} -> {end}".format(
-                            start=date["start"], end=date["end"]
-                        )
-                    )
-
-    if has_availabilities:
-        out.insert(
-            0,
-            "There are campsites available from {start} to {end} 🟩".format(
-                start=start_date.strftime(DateFormat.INPUT_DATE_FORMAT.value),
-                end=end_date.strftime(DateFormat.INPUT_DATE_FORMAT.value),
-            ),
-        )
-    else:
-        out.insert(0, "There are no campsites available 😢")
-    return "\n".join(out), has_availabilities
-
-
-def generate_json_output(info_by_park_id):
-    availabilities_by_park_id = {}
-    has_availabilities = False
-    for park_id, info in info_by_park_id.items():
-        current, _, available_dates_by_site_id, _ = info
-        if current:
-            has_availabilities = True
-            availabilities_by_park_id[park_id] = available_dates_by_site_id
-
-    return json.dumps(availabilities_by_park_id), has_availabilities
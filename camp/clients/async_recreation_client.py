@@ -0,0 +1,100 @@
+""" An asyncio client for recreation.gov, used by the async Django views.
+
+It sends the same requests as RecreationClient and shares its base URL,
+headers, park name cache and circuit breakers. It runs them on an
+httpx.AsyncClient, so one event loop can wait on many requests at once
+instead of holding a thread per request.
+"""
+import asyncio
+import logging
+from urllib.parse import urlparse
+
+import httpx
+import requests
+
+from camp import metrics
+from camp.clients import breaker, latency
+from camp.clients.recreation_client import RecreationClient
+from camp.utils import formatter
+
+LOG = logging.getLogger(__name__)
+
+
+class AsyncRecreationClient:
+    """ An async recreation.gov client with its own connection pool, use it as an async context manager.
+
+    Args:
+        max_concurrency: The most requests in flight at once. Defaults to 8.
+    """
+
+    def __init__(self, max_concurrency=8):
+        self._client = httpx.AsyncClient(
+            headers=RecreationClient.get_headers(),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def get_availability(self, park_id, month_date):
+        params = {"start_date": formatter.format_date(month_date)}
+        LOG.info("Querying for {} with these params: {}".format(park_id, params))
+        resp = await self._get(RecreationClient.availability_url(park_id), params, "availability")
+        return self._decode(resp, "availability")
+
+    async def get_park_name(self, park_id):
+        park_name = RecreationClient._park_names.get(park_id)
+        metrics.record_cache("park_name", park_name is not None)
+        if park_name is None:
+            resp = await self._get(RecreationClient.main_page_url(park_id), {}, "campground")
+            park_name = self._decode(resp, "campground")["campground"]["facility_name"]
+            RecreationClient._park_names[park_id] = park_name
+        return park_name
+
+    async def _get(self, url, params, endpoint):
+        async def send():
+            async with self._slots:
+                connect, read = latency.request_timeout()
+                with metrics.timer("campquest_http_request_seconds", endpoint=endpoint):
+                    return await self._client.get(url, params=params, timeout=httpx.Timeout(read, connect=connect))
+
+        host = urlparse(url).netloc
+        park_id = RecreationClient.park_id_from_url(url)
+        breaker.BREAKERS.before(host, park_id)
+        try:
+            # The request budget and hedging apply like they do to RecreationClient.
+            resp = await latency.hedged_async(send, endpoint)
+        except latency.DeadlineExceeded:
+            breaker.BREAKERS.cancel(host, park_id)
+            raise
+        except httpx.TransportError as e:
+            metrics.inc("campquest_http_requests_total", endpoint=endpoint, status="error")
+            breaker.BREAKERS.error(host, park_id)
+            # Raised as the requests errors RecreationClient raises, so timeouts are reported stale the same way.
+            if isinstance(e, httpx.TimeoutException):
+                raise requests.Timeout(str(e)) from e
+            raise requests.ConnectionError(str(e)) from e
+        breaker.BREAKERS.after(host, park_id, resp.status_code)
+        metrics.inc("campquest_http_requests_total", endpoint=endpoint, status=str(resp.status_code))
+        metrics.inc("campquest_http_response_bytes_total", len(resp.content), endpoint=endpoint)
+        if resp.status_code != 200:
+            LOG.error("ERROR, {status_code} code received from {url}: {resp_text}".format(
+                status_code=resp.status_code, url=url, resp_text=resp.text))
+            raise RuntimeError(
+                "failedRequest",
+                "ERROR, {status_code} code received from {url}: {resp_text}".format(
+                    status_code=resp.status_code, url=url, resp_text=resp.text),
+            )
+        return resp
+
+    @staticmethod
+    def _decode(resp, endpoint):
+        with metrics.timer("campquest_parse_seconds", endpoint=endpoint):
+            return resp.json()
@@ -0,0 +1,247 @@
+""" Circuit breakers for upstream hosts and parks, and a negative cache of unknown IDs.
+
+A park that was taken down, a mistyped ID or an upstream outage fails the
+same way on every cycle. After a few consecutive failures the breaker of the
+park, or of the whole host for outages, opens and requests to it fail at
+once with CircuitOpen, without touching the network. Once the reset timeout
+has passed, one request is let through: its success closes the breaker, its
+failure opens it again for twice as long.
+
+IDs the upstream answered 404 for, and ReserveCalifornia searches without a
+match, are remembered for a TTL and fail at once too.
+"""
+import logging
+import threading
+import time
+
+from camp import metrics
+from camp.clients import latency
+
+LOG = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(RuntimeError):
+    """ The target failed recently, the request was not sent. """
+
+    def __init__(self, target, retry_in):
+        super().__init__("{} is failing, not retrying for {:.0f}s".format(target, max(retry_in, 0)))
+        self.target = target
+        self.retry_in = retry_in
+
+
+def is_skipped(error):
+    """ Whether a failed check means the park should be skipped this sweep rather than failing the search. """
+    return isinstance(error, CircuitOpen) or latency.is_stale(error)
+
+
+class CircuitBreaker:
+    """ Opens after `threshold` consecutive failures, for `reset_after` seconds, doubling up to `max_reset_after`. """
+
+    def __init__(self, threshold=3, reset_after=60.0, max_reset_after=3600.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.max_reset_after = max_reset_after
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = None
+        self.probing = False
+
+    def open_for(self):
+        return min(self.reset_after * 2 ** max(self.trips - 1, 0), self.max_reset_after)
+
+    def retry_in(self):
+        if self.state == CLOSED:
+            return 0.0
+        return self.opened_at + self.open_for() - self.clock()
+
+    def allow(self):
+        """ Whether a request may be sent now. In the half-open state only one probe is let through. """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.retry_in() <= 0:
+            self.state = HALF_OPEN
+            self.probing = False
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def cancel(self):
+        """ Let another probe through when the probe's outcome is unknown. """
+        self.probing = False
+
+    def success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.probing = False
+
+    def failure(self):
+        """ Count a failure.
+
+        Returns:
+            bool: True if the breaker opened.
+        """
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.threshold):
+            self.state = OPEN
+            self.trips += 1
+            self.opened_at = self.clock()
+            self.probing = False
+            return True
+        return False
+
+
+class NegativeCache:
+    """ Keys known to be missing, forgotten after `ttl` seconds. """
+
+    def __init__(self, ttl=3600.0, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._expires = {}
+
+    def add(self, key):
+        self._expires[key] = self.clock() + self.ttl
+
+    def expires_in(self, key):
+        return self._expires.get(key, self.clock()) - self.clock()
+
+    def __contains__(self, key):
+        expires = self._expires.get(key)
+        if expires is None:
+            return False
+        if expires <= self.clock():
+            self._expires.pop(key, None)
+            return False
+        return True
+
+
+class Breakers:
+    """ The breakers of every host and park, and the unknown IDs.
+
+    Args:
+        threshold: Consecutive failures that open a breaker. Defaults to 3.
+        reset_after: Seconds a breaker stays open the first time. Defaults to 60.
+        unknown_ttl: Seconds an unknown ID is remembered. Defaults to 3600.
+        clock: The monotonic clock. Defaults to time.monotonic.
+    """
+
+    def __init__(self, threshold=3, reset_after=60.0, unknown_ttl=3600.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.unknown = NegativeCache(unknown_ttl, clock)
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, key):
+        breaker = self._breakers.get((kind, key))
+        if breaker is None:
+            breaker = self._breakers[(kind, key)] = CircuitBreaker(
+                self.threshold, self.reset_after, clock=self.clock)
+        return breaker
+
+    @staticmethod
+    def _targets(host, park_id):
+        # A park ID only means something on its own host.
+        targets = [("host", host)]
+        if park_id is not None:
+            targets.append(("park", "{}/{}".format(host, park_id)))
+        return targets
+
+    def before(self, host, park_id=None):
+        """ Raise CircuitOpen unless a request to this host and park may be sent. """
+        with self._lock:
+            targets = self._targets(host, park_id)
+            if park_id is not None and targets[1] in self.unknown:
+                metrics.inc("campquest_requests_skipped_total", reason="unknown")
+                raise CircuitOpen("park {}".format(park_id), self.unknown.expires_in(targets[1]))
+            allowed = []
+            for target in targets:
+                breaker = self._get(*target)
+                if not breaker.allow():
+                    # Give back the probe a breaker checked earlier handed out.
+                    for other in allowed:
+                        other.cancel()
+                    metrics.inc("campquest_requests_skipped_total", reason="circuit")
+                    raise CircuitOpen("{} {}".format(*target), breaker.retry_in())
+                allowed.append(breaker)
+
+    def after(self, host, park_id=None, status=None):
+        """ Record the outcome of a request.
+
+        Args:
+            host: The host.
+            park_id: The park, or None.
+            status: The HTTP status, None if no response came back.
+        """
+        host_failed = status is None or status == 429 or status >= 500
+        park_failed = status is None or status >= 400
+        with self._lock:
+            targets = self._targets(host, park_id)
+            if status in (404, 410) and park_id is not None:
+                LOG.warning("Park %s is unknown upstream, skipping it for %.0fs", park_id, self.unknown.ttl)
+                self.unknown.add(targets[1])
+            self._record(targets[0], host_failed)
+            if park_id is None:
+                return
+            if status == 429:
+                # Rate limiting is the host backing off, it says nothing about the park.
+                self._get(*targets[1]).cancel()
+            else:
+                self._record(targets[1], park_failed)
+
+    def error(self, host, park_id=None):
+        """ Record a request that ended without a response.
+
+        A request cut short by the sweep deadline times out like a stalled
+        one, but only tells that the sweep ran out of time, so it is
+        forgotten instead of counted as a failure.
+        """
+        left = latency.remaining()
+        if left is not None and left <= 0:
+            self.cancel(host, park_id)
+        else:
+            self.after(host, park_id)
+
+    def cancel(self, host, park_id=None):
+        """ Forget a request that ended without telling anything about the target, e.g. at the sweep deadline. """
+        with self._lock:
+            for target in self._targets(host, park_id):
+                self._get(*target).cancel()
+
+    def is_unknown(self, key):
+        """ Whether a key, e.g. a search without a match, is in the negative cache. """
+        with self._lock:
+            return key in self.unknown
+
+    def mark_unknown(self, key):
+        """ Remember a key the upstream has nothing for, until the negative cache forgets it. """
+        with self._lock:
+            self.unknown.add(key)
+
+    def _record(self, target, failed):
+        kind, key = target
+        breaker = self._get(kind, key)
+        if not failed:
+            breaker.success()
+        elif breaker.failure():
+            metrics.inc("campquest_circuit_opened_total", kind=kind)
+            LOG.warning("Circuit of %s %s opened for %.0fs", kind, key, breaker.open_for())
+
+    def states(self):
+        """ The breakers that are not closed, by (kind, key). """
+        with self._lock:
+            return {target: breaker.state for target, breaker in self._breakers.items() if breaker.state != CLOSED}
+
+    def reset(self):
+        with self._lock:
+            self._breakers = {}
+            self.unknown = NegativeCache(self.unknown.ttl, self.clock)
+
+
+BREAKERS = Breakers()
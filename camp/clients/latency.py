@@ -0,0 +1,289 @@
+""" Latency control for upstream requests.
+
+- Every request has a timeout, so one stalled connection cannot hang a sweep.
+- A sweep can have a deadline. Requests are cut short when it passes, and
+  requests after it fail at once with DeadlineExceeded, so the parks left
+  are reported stale instead of delaying the rest.
+- With hedging on, a GET still unanswered after the observed p95 latency
+  of its endpoint is sent again and the first answer wins. Hedges are
+  limited to a share of the latest requests, so the tail gets shorter
+  without spending the rate limit.
+- With a request budget, every request takes a token first and waits for
+  one when the budget is spent, so bursts never exceed the allowed rate.
+
+The async client goes through the same budget and hedging with
+acquire_async and hedged_async.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import requests
+
+from camp import metrics
+
+LOG = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = float(os.environ.get("CAMPQUEST_HTTP_TIMEOUT", 30))
+READ_TIMEOUT = DEFAULT_READ_TIMEOUT
+
+# Hedge only once the p95 is known, and at most this share of requests.
+HEDGE_MIN_SAMPLES = 20
+HEDGE_RATIO = 0.1
+# The share is counted over the latest requests and hedges, so a long quiet run does not bank hedges for a burst.
+HEDGE_WINDOW = 200
+
+_lock = threading.Lock()
+_deadline = None
+_hedging = False
+# True for a hedge, False for a request, the latest HEDGE_WINDOW of them.
+_recent = deque()
+_recent_hedges = 0
+_pool = None
+_budget = None
+
+
+class DeadlineExceeded(requests.Timeout):
+    """ The sweep deadline passed before the request could complete. """
+
+
+class RequestBudget:
+    """ A token bucket: `per_minute` requests a minute, at most `burst` of them at once.
+
+    Args:
+        per_minute: The sustained number of requests a minute.
+        burst: The most requests sent back to back. Defaults to a tenth of a minute's budget, at least 1.
+        clock: The monotonic clock. Defaults to time.monotonic.
+        sleep: Waits a number of seconds. Defaults to time.sleep.
+    """
+
+    def __init__(self, per_minute, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(per_minute / 10.0, 1.0)
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self):
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def _wait(self):
+        # Take a token and return 0, or return how long to wait for one.
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            wait = (1 - self.tokens) / self.rate
+        left = remaining()
+        if left is not None and left < wait:
+            raise DeadlineExceeded("The request budget is spent until after the sweep deadline.")
+        metrics.inc("campquest_budget_waits_total")
+        return wait
+
+    def take(self):
+        """ Take a token, waiting for one. Waiting past the sweep deadline raises DeadlineExceeded. """
+        while True:
+            wait = self._wait()
+            if not wait:
+                return
+            self.sleep(wait)
+
+    async def take_async(self):
+        """ take, waiting on the event loop instead of blocking the thread. """
+        while True:
+            wait = self._wait()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+def configure(timeout=None, hedge=False, budget=None):
+    """ Set the read timeout in seconds, None for the default, whether to hedge requests and the RequestBudget. """
+    global READ_TIMEOUT, _hedging, _budget
+    READ_TIMEOUT = timeout or DEFAULT_READ_TIMEOUT
+    _hedging = hedge
+    _budget = budget
+
+
+def acquire():
+    """ Take a request from the budget, waiting if it is spent. Without a budget, returns at once. """
+    budget = _budget
+    if budget is not None:
+        budget.take()
+
+
+async def acquire_async():
+    """ acquire for the async client. """
+    budget = _budget
+    if budget is not None:
+        await budget.take_async()
+
+
+def set_deadline(seconds):
+    """ Start a sweep deadline `seconds` from now, None clears it. """
+    global _deadline
+    _deadline = time.monotonic() + seconds if seconds is not None else None
+
+
+def remaining():
+    """ Seconds left before the sweep deadline, None without one. """
+    deadline = _deadline
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def request_timeout():
+    """ The timeout of a request starting now, as a (connect, read) tuple for requests.
+
+    Raises:
+        DeadlineExceeded: The sweep deadline has passed.
+    """
+    left = remaining()
+    if left is None:
+        return CONNECT_TIMEOUT, READ_TIMEOUT
+    if left <= 0:
+        raise DeadlineExceeded("The sweep deadline has passed.")
+    return min(CONNECT_TIMEOUT, left), min(READ_TIMEOUT, left)
+
+
+def is_stale(error):
+    """ Whether a failed check means the park is stale rather than broken. """
+    return isinstance(error, requests.Timeout)
+
+
+def hedge_delay(endpoint):
+    """ The p95 latency of an endpoint, None until there are enough samples. """
+    p95, count = metrics.quantile("campquest_http_request_seconds", 0.95, endpoint=endpoint)
+    return p95 if count >= HEDGE_MIN_SAMPLES else None
+
+
+def _record(hedge):
+    # Called with _lock held.
+    global _recent_hedges
+    _recent.append(hedge)
+    _recent_hedges += hedge
+    if len(_recent) > HEDGE_WINDOW:
+        _recent_hedges -= _recent.popleft()
+
+
+def _count_request():
+    with _lock:
+        _record(False)
+
+
+def _take_hedge():
+    with _lock:
+        if _recent_hedges >= (len(_recent) - _recent_hedges) * HEDGE_RATIO:
+            return False
+        _record(True)
+        return True
+
+
+def _may_hedge():
+    budget = _budget
+    return _take_hedge() and (budget is None or budget.try_take())
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+        return _pool
+
+
+def hedged(call, endpoint):
+    """ Call an idempotent request, sending a duplicate if it is slower than the endpoint's p95.
+
+    Args:
+        call: Sends the request, called without arguments, possibly twice at once.
+        endpoint: The metrics endpoint label.
+
+    Returns:
+        The first successful result. If both attempts fail, the first error is raised.
+    """
+    acquire()
+    _count_request()
+    delay = hedge_delay(endpoint) if _hedging else None
+    if delay is None:
+        return call()
+
+    first = _get_pool().submit(call)
+    try:
+        return first.result(timeout=delay)
+    except FutureTimeout:
+        pass
+    if not _may_hedge():
+        return first.result()
+
+    second = _get_pool().submit(call)
+    attempts = [first, second]
+    pending = set(attempts)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in sorted(done, key=attempts.index):
+            if future.exception() is None:
+                metrics.inc("campquest_hedged_requests_total", endpoint=endpoint,
+                            winner="hedge" if future is second else "original")
+                return future.result()
+    metrics.inc("campquest_hedged_requests_total", endpoint=endpoint, winner="none")
+    return first.result()
+
+
+async def hedged_async(call, endpoint):
+    """ hedged for the async client: the attempts are tasks, and the slower one is cancelled.
+
+    Args:
+        call: Returns a coroutine sending the request, called without arguments, possibly twice.
+        endpoint: The metrics endpoint label.
+
+    Returns:
+        The first successful result. If both attempts fail, the first error is raised.
+    """
+    await acquire_async()
+    _count_request()
+    delay = hedge_delay(endpoint) if _hedging else None
+    if delay is None:
+        return await call()
+
+    first = asyncio.ensure_future(call())
+    attempts = [first]
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=delay)
+        if done or not _may_hedge():
+            return await first
+
+        second = asyncio.ensure_future(call())
+        attempts.append(second)
+        pending = set(attempts)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in sorted(done, key=attempts.index):
+                if future.exception() is None:
+                    metrics.inc("campquest_hedged_requests_total", endpoint=endpoint,
+                                winner="hedge" if future is second else "original")
+                    return future.result()
+        metrics.inc("campquest_hedged_requests_total", endpoint=endpoint, winner="none")
+        return first.result()
+    finally:
+        for future in attempts:
+            if not future.done():
+                future.cancel()
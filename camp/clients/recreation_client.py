@@ -1,30 +1,56 @@
 import logging
+import os
+import re
+from urllib.parse import urlparse
 
 import requests
-import user_agent
 
+from camp import metrics
+from camp.clients import breaker, latency
 from camp.utils import formatter
 
 LOG = logging.getLogger(__name__)
-log_formatter = logging.Formatter(
-    "%(asctime)s - %(process)s - %(levelname)s - %(message)s"
-)
 
-# FileHandler for file output
-fh = logging.FileHandler('campquest.log')  # specify your log file name
-fh.setFormatter(log_formatter)
-LOG.addHandler(fh)
+PARK_PATH = re.compile(r"/campgrounds?/(\d+)(?:/month)?$")
 
 
 class RecreationClient:
 
-    BASE_URL = "https://www.recreation.gov"
-    AVAILABILITY_ENDPOINT = (
-        BASE_URL + "/api/camps/availability/campground/{park_id}/month"
-    )
-    MAIN_PAGE_ENDPOINT = BASE_URL + "/api/camps/campgrounds/{park_id}"
+    DEFAULT_BASE_URL = "https://www.recreation.gov"
+    # Point the client at another server, e.g. benchmarks/mock_server.py
+    BASE_URL = os.environ.get(
+        "CAMPQUEST_RECREATION_URL", DEFAULT_BASE_URL).rstrip("/")
+    AVAILABILITY_ENDPOINT = "/api/camps/availability/campground/{park_id}/month"
+    MAIN_PAGE_ENDPOINT = "/api/camps/campgrounds/{park_id}"
 
-    headers = {"User-Agent": user_agent.generate_user_agent()}
+    # Generated on the first request, user_agent is slow to import.
+    headers = None
+
+    # Park names do not change, so they are looked up once per process.
+    _park_names = {}
+
+    # One connection pool for every request, long running processes reuse
+    # their connections instead of opening one per request.
+    _session = None
+
+    @classmethod
+    def set_base_url(cls, base_url):
+        cls.BASE_URL = (base_url or cls.DEFAULT_BASE_URL).rstrip("/")
+        cls._park_names = {}
+
+    @classmethod
+    def availability_url(cls, park_id):
+        return cls.BASE_URL + cls.AVAILABILITY_ENDPOINT.format(park_id=park_id)
+
+    @classmethod
+    def main_page_url(cls, park_id):
+        return cls.BASE_URL + cls.MAIN_PAGE_ENDPOINT.format(park_id=park_id)
+
+    @staticmethod
+    def park_id_from_url(url):
+        """ The park ID of an availability or campground URL, None for other URLs. """
+        match = PARK_PATH.search(urlparse(url).path)
+        return match.group(1) if match else None
 
     @classmethod
     def get_availability(cls, park_id, month_date):
@@ -32,21 +58,95 @@ class RecreationClient:
         LOG.info(
             "Querying for {} with these params: {}".format(park_id, params)
         )
-        url = cls.AVAILABILITY_ENDPOINT.format(park_id=park_id)
-        resp = cls._send_request(url, params)
+        url = cls.availability_url(park_id)
+        resp = cls._send_request(url, params, endpoint="availability")
         return resp
 
+    @classmethod
+    def get_availability_raw(cls, park_id, month_date):
+        """ get_availability without decoding, for callers that decode elsewhere, e.g. camp.pipeline.
+
+        Returns:
+            bytes: The JSON body.
+        """
+        params = {"start_date": formatter.format_date(month_date)}
+        return cls._get(cls.availability_url(park_id), params, "availability").content
+
+    @classmethod
+    def get_availability_if_changed(cls, park_id, month_date, etag=None, last_modified=None):
+        """ Conditional get_availability, for callers that kept the previous payload.
+
+        Returns:
+            tuple: The payload, or None when it did not change, and the new ETag and Last-Modified.
+        """
+        params = {"start_date": formatter.format_date(month_date)}
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        resp = cls._get(cls.availability_url(park_id), params, "availability", headers)
+        etag = resp.headers.get("ETag", etag)
+        last_modified = resp.headers.get("Last-Modified", last_modified)
+        if resp.status_code == 304:
+            return None, etag, last_modified
+        return cls._decode(resp, "availability"), etag, last_modified
+
     @classmethod
     def get_park_name(cls, park_id):
-        resp = cls._send_request(
-            cls.MAIN_PAGE_ENDPOINT.format(park_id=park_id), {}
-        )
-        return resp["campground"]["facility_name"]
+        park_name = cls._park_names.get(park_id)
+        metrics.record_cache("park_name", park_name is not None)
+        if park_name is None:
+            resp = cls._send_request(
+                cls.main_page_url(park_id), {}, endpoint="campground")
+            park_name = cls._park_names[park_id] = resp["campground"]["facility_name"]
+        return park_name
+
+    @classmethod
+    def get_headers(cls):
+        if cls.headers is None:
+            import user_agent
+
+            cls.headers = {"User-Agent": user_agent.generate_user_agent()}
+        return cls.headers
+
+    @classmethod
+    def get_session(cls):
+        if cls._session is None:
+            cls._session = requests.Session()
+            cls._session.headers.update(cls.get_headers())
+        return cls._session
+
+    @classmethod
+    def _send_request(cls, url, params, endpoint="other"):
+        return cls._decode(cls._get(url, params, endpoint), endpoint)
 
     @classmethod
-    def _send_request(cls, url, params):
-        resp = requests.get(url, params=params, headers=cls.headers)
-        if resp.status_code != 200:
+    def _get(cls, url, params, endpoint, headers=None):
+        def send():
+            timeout = latency.request_timeout()
+            with metrics.timer("campquest_http_request_seconds", endpoint=endpoint):
+                return cls.get_session().get(url, params=params, headers=headers, timeout=timeout)
+
+        host = urlparse(url).netloc
+        park_id = cls.park_id_from_url(url)
+        breaker.BREAKERS.before(host, park_id)
+        try:
+            resp = latency.hedged(send, endpoint)
+        except latency.DeadlineExceeded:
+            breaker.BREAKERS.cancel(host, park_id)
+            raise
+        except requests.RequestException:
+            metrics.inc("campquest_http_requests_total",
+                        endpoint=endpoint, status="error")
+            breaker.BREAKERS.error(host, park_id)
+            raise
+        breaker.BREAKERS.after(host, park_id, resp.status_code)
+        metrics.inc("campquest_http_requests_total",
+                    endpoint=endpoint, status=str(resp.status_code))
+        metrics.inc("campquest_http_response_bytes_total",
+                    len(resp.content), endpoint=endpoint)
+        if resp.status_code not in (200, 304):
             LOG.error(
                 "ERROR, {status_code} code received from {url}: {resp_text}".format(
                     status_code=resp.status_code, url=url, resp_text=resp.text
@@ -58,4 +158,9 @@ class RecreationClient:
                     status_code=resp.status_code, url=url, resp_text=resp.text
                 ),
             )
-        return resp.json()
+        return resp
+
+    @classmethod
+    def _decode(cls, resp, endpoint):
+        with metrics.timer("campquest_parse_seconds", endpoint=endpoint):
+            return resp.json()
@@ -2,27 +2,24 @@
 
 import dataclasses
 import logging
+import os
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Any, Dict, List
+from urllib.parse import urlparse
 
 import requests
 from dateutil.relativedelta import relativedelta
 
+from camp import metrics
+from camp.clients import breaker, latency
 
 LOG = logging.getLogger(__name__)
-log_formatter = logging.Formatter(
-    "%(asctime)s - %(process)s - %(levelname)s - %(message)s"
-)
 
-# FileHandler for file output
-fh = logging.FileHandler('campquest.log')  # specify your log file name
-fh.setFormatter(log_formatter)
-LOG.addHandler(fh)
-
-LOG.setLevel(logging.INFO)
-
-BASE_URL = "https://calirdr.usedirect.com"
+DEFAULT_BASE_URL = "https://calirdr.usedirect.com"
+# Point the client at another server, e.g. benchmarks/mock_server.py
+BASE_URL = os.environ.get("CAMPQUEST_RESERVECALIFORNIA_URL",
+                          DEFAULT_BASE_URL).rstrip("/")
 SEARCH_ENDPOINT = "/rdr/rdr/fd/citypark/namecontains/"
 PLACE_ENDPOINT = "/rdr/rdr/search/place"
 AVAILABILITY_ENDPOINT = "/rdr/rdr/search/grid"
@@ -84,23 +81,83 @@ class ReserveCaliforniaCampsite:
         return Campsite(campground=self.Campground, campsite=self.Name)
 
 
-def make_get_request(url: str) -> Dict[str, Any]:
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+def set_base_url(base_url: str) -> None:
+    global BASE_URL
+    BASE_URL = (base_url or DEFAULT_BASE_URL).rstrip("/")
 
 
-def make_post_request(url: str, data: Dict[str, Any]) -> Dict[str, Any]:
-    response = requests.post(url, json=data)
+def _endpoint(url: str) -> str:
+    if SEARCH_ENDPOINT in url:
+        return "rc_search"
+    return "rc_" + url.rstrip("/").rsplit("/", 1)[-1]
+
+
+def _handle_response(response: requests.Response, endpoint: str) -> Dict[str, Any]:
+    metrics.inc("campquest_http_requests_total",
+                endpoint=endpoint, status=str(response.status_code))
+    metrics.inc("campquest_http_response_bytes_total",
+                len(response.content), endpoint=endpoint)
     response.raise_for_status()
-    return response.json()
+    with metrics.timer("campquest_parse_seconds", endpoint=endpoint):
+        return response.json()
 
 
-def get_campground_id(query: str, url: str = f"{BASE_URL}{SEARCH_ENDPOINT}") -> str:
+def make_get_request(url: str) -> Dict[str, Any]:
+    endpoint = _endpoint(url)
+    def send():
+        timeout = latency.request_timeout()
+        with metrics.timer("campquest_http_request_seconds", endpoint=endpoint):
+            return requests.get(url, timeout=timeout)
+
+    host = urlparse(url).netloc
+    breaker.BREAKERS.before(host)
+    try:
+        response = latency.hedged(send, endpoint)
+    except latency.DeadlineExceeded:
+        breaker.BREAKERS.cancel(host)
+        raise
+    except requests.RequestException:
+        metrics.inc("campquest_http_requests_total",
+                    endpoint=endpoint, status="error")
+        breaker.BREAKERS.error(host)
+        raise
+    breaker.BREAKERS.after(host, status=response.status_code)
+    return _handle_response(response, endpoint)
+
+
+def make_post_request(url: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    endpoint = _endpoint(url)
+    host = urlparse(url).netloc
+    facility_id = data.get("FacilityId")
+    breaker.BREAKERS.before(host, facility_id)
+    try:
+        latency.acquire()
+        timeout = latency.request_timeout()
+        with metrics.timer("campquest_http_request_seconds", endpoint=endpoint):
+            response = requests.post(url, json=data, timeout=timeout)
+    except latency.DeadlineExceeded:
+        breaker.BREAKERS.cancel(host, facility_id)
+        raise
+    except requests.RequestException:
+        metrics.inc("campquest_http_requests_total",
+                    endpoint=endpoint, status="error")
+        breaker.BREAKERS.error(host, facility_id)
+        raise
+    breaker.BREAKERS.after(host, facility_id, response.status_code)
+    return _handle_response(response, endpoint)
+
+
+def get_campground_id(query: str, url: str = None) -> str:
+    url = url or f"{BASE_URL}{SEARCH_ENDPOINT}"
     url_with_query = f"{url}{requests.utils.quote(query)}"  # type: ignore
+    # Searches without a match are not repeated until the negative cache forgets them.
+    if breaker.BREAKERS.is_unknown(("rc_search", url_with_query)):
+        raise ValueError(
+            f"Campground: {query} not found. Try being more specific.")
     response = make_get_request(url_with_query)
     if not response:
         LOG.error(f"Could not find campground: {query}")
+        breaker.BREAKERS.mark_unknown(("rc_search", url_with_query))
         raise ValueError(
             f"Campground: {query} not found. Try being more specific.")
     top_hit = response[0]
@@ -112,8 +169,9 @@ def get_campground_id(query: str, url: str = f"{BASE_URL}{SEARCH_ENDPOINT}") ->
 
 
 def get_facility_ids(
-    campground: str, url: str = f"{BASE_URL}{PLACE_ENDPOINT}"
+    campground: str, url: str = None
 ) -> List[Dict[str, str]]:
+    url = url or f"{BASE_URL}{PLACE_ENDPOINT}"
     campground_id = get_campground_id(campground)
     data = {
         "PlaceId": campground_id,
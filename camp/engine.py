@@ -0,0 +1,515 @@
+""" The campsite search engine shared by cli.py and the Django app.
+
+Fetches availability from the upstream APIs, finds the sites with enough
+consecutive nights in the requested range and formats the results. The
+functions here are the stable API, callers should not reach into the clients.
+"""
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import count, groupby
+
+from camp import metrics
+from camp.enums.date_format import DateFormat
+from camp.enums.emoji import Emoji
+from camp.utils import formatter
+
+# The API clients import requests or httpx and are only loaded when a search runs.
+
+LOG = logging.getLogger(__name__)
+
+__all__ = [
+    "get_park_information",
+    "month_starts",
+    "is_weekend",
+    "get_num_available_sites",
+    "consecutive_nights",
+    "check_park",
+    "check_park_async",
+    "check_parks_async",
+    "iter_parks_async",
+    "generate_human_output",
+    "generate_json_output",
+]
+
+
+def get_park_information(
+    park_id, start_date, end_date, campsite_type=None, campsite_ids=(), excluded_site_ids=(), allowed_site_ids=None,
+    fetch=None,
+):
+    """ Get park information for a given date range.
+
+    Args:
+        park_id: The park ID to get information for.
+        start_date: The start date of the date range.
+        end_date: The end date of the date range.
+        campsite_type: The campsite type, only for recreation.gov. Defaults to None.
+        campsite_ids: The campsite IDs to get information for. Defaults to ().
+        excluded_site_ids: The campsite IDs to exclude. Defaults to ().
+        allowed_site_ids: The campsite IDs that passed the local site index filters, or None to keep all. Defaults to None.
+        fetch: Called with (park_id, month_date) to get a month of availability, e.g. a cache. Defaults to RecreationClient.get_availability.
+
+    Returns:
+        dict: The park information.
+    """
+    if fetch is None:
+        from camp.clients.recreation_client import RecreationClient
+        fetch = RecreationClient.get_availability
+
+    # Get each first of the month for months in the range we care about.
+    months = month_starts(start_date, end_date)
+
+    # Get data for each month.
+    api_data = []
+    with metrics.timer("campquest_stage_seconds", stage="fetch", park=str(park_id)):
+        for month_date in months:
+            api_data.append(fetch(park_id, month_date))
+
+    with metrics.timer("campquest_stage_seconds", stage="filter", park=str(park_id)):
+        return _collapse_availability(
+            api_data, campsite_type, campsite_ids, excluded_site_ids, allowed_site_ids)
+
+
+def _collapse_availability(api_data, campsite_type, campsite_ids, excluded_site_ids, allowed_site_ids):
+    """ Collapse monthly availability payloads into the available dates by campsite ID.
+
+    Args:
+        api_data: The monthly availability payloads.
+        campsite_type: The campsite type, or None.
+        campsite_ids: The campsite IDs to keep, or ().
+        excluded_site_ids: The campsite IDs to exclude.
+        allowed_site_ids: The campsite IDs that passed the local site index filters, or None.
+
+    Returns:
+        dict: The available dates by campsite ID.
+    """
+    # Filter by campsite_type if necessary.
+    data = {}
+
+    for month_data in api_data:
+        for campsite_id, campsite_data in month_data["campsites"].items():
+            if campsite_id in excluded_site_ids:
+                continue
+            if allowed_site_ids is not None and campsite_id not in allowed_site_ids:
+                continue
+            available = []
+            a = data.setdefault(campsite_id, [])
+            for date, availability_value in campsite_data[
+                "availabilities"
+            ].items():
+                if availability_value != "Available":
+                    continue
+
+                if (
+                    campsite_type
+                    and campsite_type != campsite_data["campsite_type"]
+                ):
+                    continue
+
+                if (
+                    len(campsite_ids) > 0
+                    and int(campsite_data["campsite_id"]) not in campsite_ids
+                ):
+                    continue
+
+                available.append(date)
+            if available:
+                a += available
+
+    return data
+
+
+def month_starts(start_date, end_date):
+    """ Get the first day of each month from the month of start_date up to end_date.
+
+    Args:
+        start_date: The start date of the date range.
+        end_date: The end date of the date range.
+
+    Returns:
+        list: The first day of each month.
+    """
+    months = []
+    month = datetime(start_date.year, start_date.month, 1)
+    while month <= end_date:
+        months.append(month)
+        month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+    return months
+
+
+def is_weekend(date):
+    """ Check if a date is a weekend.
+
+    Args:
+        date: The date to check if it is a weekend.
+
+    Returns:
+        bool: True if the date is a weekend, False otherwise.
+    """
+    weekday = date.weekday()
+    return weekday == 5 or weekday == 6
+
+
+def get_num_available_sites(
+    park_information, start_date, end_date, nights=None, weekends_only=False,
+):
+    """ Get the number of available sites for a given date range.
+
+    Args:
+        park_information: The park information.
+        start_date: The start date of the date range.
+        end_date: The end date of the date range.
+        nights: The number of nights. Defaults to None.
+        weekends_only: Whether to include only weekends. Defaults to False.
+
+    Returns:
+        tuple: The number of available sites, the maximum number of sites, and the available dates by campsite ID
+    """
+    maximum = len(park_information)
+
+    num_available = 0
+    num_days = (end_date - start_date).days
+    dates = [end_date - timedelta(days=i) for i in range(1, num_days + 1)]
+    if weekends_only:
+        dates = filter(is_weekend, dates)
+    dates = set(
+        formatter.format_date(
+            i, format_string=DateFormat.ISO_DATE_FORMAT_RESPONSE.value
+        )
+        for i in dates
+    )
+
+    if nights not in range(1, num_days + 1):
+        nights = num_days
+        LOG.info("Setting number of nights to {}.".format(nights))
+
+    available_dates_by_campsite_id = defaultdict(list)
+    for site, availabilities in park_information.items():
+        # List of dates that are in the desired range for this site.
+        desired_available = []
+
+        for date in availabilities:
+            if date not in dates:
+                continue
+            desired_available.append(date)
+
+        if not desired_available:
+            continue
+
+        appropriate_consecutive_ranges = consecutive_nights(
+            desired_available, nights
+        )
+
+        if appropriate_consecutive_ranges:
+            num_available += 1
+            LOG.info("Available site {}: {}".format(num_available, site))
+
+        for r in appropriate_consecutive_ranges:
+            start, end = r
+            available_dates_by_campsite_id[int(site)].append(
+                {"start": start, "end": end}
+            )
+
+    return num_available, maximum, available_dates_by_campsite_id
+
+
+def consecutive_nights(available, nights):
+    """ Returns a list of dates from which you can start that have
+    enough consecutive nights. If there is one or more entries in this list, there is at least one date range for this site that is available.
+
+    Args:
+        available: The list of available dates.
+        nights: The number of nights to find.
+
+    Returns:
+        list: The list of consecutive nights.
+    """
+    ordinal_dates = [
+        datetime.strptime(
+            dstr, DateFormat.ISO_DATE_FORMAT_RESPONSE.value
+        ).toordinal()
+        for dstr in available
+    ]
+    c = count()
+
+    consecutive_ranges = list(
+        list(g) for _, g in groupby(ordinal_dates, lambda x: x - next(c))
+    )
+
+    long_enough_consecutive_ranges = []
+    for r in consecutive_ranges:
+        # Skip ranges that are too short.
+        if len(r) < nights:
+            continue
+        for start_index in range(0, len(r) - nights + 1):
+            start_nice = formatter.format_date(
+                datetime.fromordinal(r[start_index]),
+                format_string=DateFormat.INPUT_DATE_FORMAT.value,
+            )
+            end_nice = formatter.format_date(
+                datetime.fromordinal(r[start_index + nights - 1] + 1),
+                format_string=DateFormat.INPUT_DATE_FORMAT.value,
+            )
+            long_enough_consecutive_ranges.append((start_nice, end_nice))
+
+    return long_enough_consecutive_ranges
+
+
+def check_park(
+    park_id, start_date, end_date, campsite_type, campsite_ids=(), nights=None, weekends_only=False, excluded_site_ids=(), source="recreation",
+    allowed_site_ids=None, fetch=None,
+):
+    """ Check a park for availability.
+
+    Args:
+        park_id: The park ID to check.
+        start_date: The start date.
+        end_date: The end date.
+        campsite_type: The campsite type. Defaults to None.
+        campsite_ids: The campsite IDs. Defaults to ().
+        nights: The number of nights. Defaults to None.
+        weekends_only: Whether to include only weekends. Defaults to False.
+        excluded_site_ids: The campsite IDs to exclude. Defaults to ().
+        source: The source of the park information, recreation or reserve_california. Defaults to "recreation".
+        allowed_site_ids: The campsite IDs left by the query planner, or None to keep all. Defaults to None.
+        fetch: Gets a month of recreation.gov availability, see get_park_information. Defaults to None.
+
+    Returns:
+        tuple: The number of available sites, the maximum number of sites, and the available dates by campsite ID, park name
+    """
+    if source == "recreation":
+        from camp.clients.recreation_client import RecreationClient
+
+        park_information = get_park_information(
+            park_id, start_date, end_date, campsite_type, campsite_ids, excluded_site_ids=excluded_site_ids,
+            allowed_site_ids=allowed_site_ids, fetch=fetch,
+        )
+        park_name = RecreationClient.get_park_name(park_id)
+        with metrics.timer("campquest_stage_seconds", stage="windows", park=str(park_id)):
+            current, maximum, availabilities_filtered = get_num_available_sites(
+                park_information, start_date, end_date, nights=nights, weekends_only=weekends_only,
+            )
+    elif source == "reserve_california":
+        from camp.clients.reservecalifornia_client import rc_get_all_available_campsites
+
+        park_information = rc_get_all_available_campsites(
+            park_id, start_date, (end_date - start_date).days // 30
+        )
+        # Get the campground name from the first available campsite
+        park_name = park_information[0].campsite.campground if park_information else "Unknown"
+        current = len(park_information)
+        maximum = current  # Update with the actual max if available
+        availabilities_filtered = {site.campsite.campsite: [
+            {"start": site.date, "end": site.date}] for site in park_information}
+
+    return current, maximum, availabilities_filtered, park_name
+
+
+async def check_park_async(
+    park_id, start_date, end_date, campsite_type, campsite_ids=(), nights=None, weekends_only=False, excluded_site_ids=(),
+    allowed_site_ids=None, client=None, fetch=None,
+):
+    """ check_park for recreation.gov on an event loop: the months and the park name are fetched concurrently.
+
+    Args:
+        park_id: The park ID to check.
+        start_date: The start date.
+        end_date: The end date.
+        campsite_type: The campsite type. Defaults to None.
+        campsite_ids: The campsite IDs. Defaults to ().
+        nights: The number of nights. Defaults to None.
+        weekends_only: Whether to include only weekends. Defaults to False.
+        excluded_site_ids: The campsite IDs to exclude. Defaults to ().
+        allowed_site_ids: The campsite IDs left by the query planner, or None to keep all. Defaults to None.
+        client: The AsyncRecreationClient.
+        fetch: Awaited with (park_id, month_date) to get a month of availability. Defaults to client.get_availability.
+
+    Returns:
+        tuple: The number of available sites, the maximum number of sites, and the available dates by campsite ID, park name
+    """
+    import asyncio
+
+    fetch = fetch or client.get_availability
+    with metrics.timer("campquest_stage_seconds", stage="fetch", park=str(park_id)):
+        api_data, park_name = await asyncio.gather(
+            asyncio.gather(*(fetch(park_id, month_date) for month_date in month_starts(start_date, end_date))),
+            client.get_park_name(park_id),
+        )
+    with metrics.timer("campquest_stage_seconds", stage="filter", park=str(park_id)):
+        park_information = _collapse_availability(
+            api_data, campsite_type, campsite_ids, excluded_site_ids, allowed_site_ids)
+    with metrics.timer("campquest_stage_seconds", stage="windows", park=str(park_id)):
+        current, maximum, availabilities_filtered = get_num_available_sites(
+            park_information, start_date, end_date, nights=nights, weekends_only=weekends_only,
+        )
+    return current, maximum, availabilities_filtered, park_name
+
+
+async def check_parks_async(
+    parks, start_date, end_date, campsite_type=None, campsite_ids=(), nights=None, weekends_only=False,
+    excluded_site_ids=(), cache=None, max_concurrency=8,
+):
+    """ Check recreation.gov parks concurrently, sharing one connection pool.
+
+    A park that fails does not stop the others, its error is returned in its place.
+
+    Args:
+        parks: The park IDs to check.
+        start_date: The start date.
+        end_date: The end date.
+        campsite_type: The campsite type. Defaults to None.
+        campsite_ids: The campsite IDs. Defaults to ().
+        nights: The number of nights. Defaults to None.
+        weekends_only: Whether to include only weekends. Defaults to False.
+        excluded_site_ids: The campsite IDs to exclude. Defaults to ().
+        cache: An AvailabilityCache the months are looked up in first. Defaults to None.
+        max_concurrency: The most requests in flight at once. Defaults to 8.
+
+    Returns:
+        dict: The check_park tuple, or the error if the check failed, by park ID, in the order of parks.
+    """
+    info_by_park_id = {
+        park_id: info
+        async for park_id, info in iter_parks_async(
+            parks, start_date, end_date, campsite_type, campsite_ids, nights=nights, weekends_only=weekends_only,
+            excluded_site_ids=excluded_site_ids, cache=cache, max_concurrency=max_concurrency,
+        )
+    }
+    return {park_id: info_by_park_id[park_id] for park_id in parks}
+
+
+async def iter_parks_async(
+    parks, start_date, end_date, campsite_type=None, campsite_ids=(), nights=None, weekends_only=False,
+    excluded_site_ids=(), cache=None, max_concurrency=8,
+):
+    """ check_parks_async, yielding each park as soon as it is checked instead of waiting for all of them.
+
+    Takes the arguments of check_parks_async. Every park starts at once and the requests are
+    queued in the order of parks, so the first result does not wait for the others. Closing the
+    generator cancels the parks left.
+
+    Yields:
+        tuple: The park ID and its check_park tuple, or the error if the check failed.
+    """
+    import asyncio
+
+    from camp.clients.async_recreation_client import AsyncRecreationClient
+
+    async with AsyncRecreationClient(max_concurrency) as client:
+        async def fetch(park_id, month_date):
+            return await cache.get_async(park_id, month_date, client.get_availability)
+
+        async def check(park_id):
+            try:
+                return park_id, await check_park_async(
+                    park_id, start_date, end_date, campsite_type, campsite_ids, nights=nights,
+                    weekends_only=weekends_only, excluded_site_ids=excluded_site_ids, client=client,
+                    fetch=fetch if cache is not None else None,
+                )
+            except Exception as e:
+                LOG.warning("Park %s failed: %s", park_id, e)
+                return park_id, e
+
+        tasks = [asyncio.ensure_future(check(park_id)) for park_id in parks]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield await done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def generate_human_output(
+    info_by_park_id, start_date, end_date, gen_campsite_info=False, site_index=None
+):
+    """ Generate human readable output. If gen_campsite_info is True, it will also display campsite ID and availability dates.
+
+    Args:
+        info_by_park_id: The information by park ID.
+        start_date: The start date.
+        end_date: The end date.
+        gen_campsite_info: Whether to display campsite ID and availability dates. Defaults to False. 
+        site_index: The local campsite metadata used to describe each site. Defaults to None.
+
+    Returns:
+        tuple: The human readable output and whether there are availabilities.
+    """
+    out = []
+    has_availabilities = False
+    for park_id, info in info_by_park_id.items():
+        current, maximum, available_dates_by_site_id, park_name = info
+        if current:
+            emoji = Emoji.SUCCESS.value
+            has_availabilities = True
+        else:
+            emoji = Emoji.FAILURE.value
+
+        out.append(
+            "{emoji} {park_name} ({park_id}): {current} site(s) available out of {maximum} site(s)".format(
+                emoji=emoji,
+                park_name=park_name,
+                park_id=park_id,
+                current=current,
+                maximum=maximum,
+            )
+        )
+
+        # Displays campsite ID and availability dates.
+        if gen_campsite_info and available_dates_by_site_id:
+            for site_id, dates in available_dates_by_site_id.items():
+                site = site_index.get(site_id) if site_index else None
+                out.append(
+                    "  * Site {site_id}{description} is available on the following dates:".format(
+                        site_id=site_id,
+                        description=" ({})".format(
+                            site.describe()) if site else "",
+                    )
+                )
+                for date in dates:
+                    out.append(
+                        "    * {start} -> {end}".format(
+                            start=date["start"], end=date["end"]
+                        )
+                    )
+
+    if has_availabilities:
+        out.insert(
+            0, "There are campsites available from {start} to {end} 😊".format(
+                start=start_date.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+                end=end_date.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+            ),
+        )
+    else:
+        out.insert(0, "There are no campsites available 😢")
+    return "\n".join(out), has_availabilities
+
+
+def generate_json_output(info_by_park_id, site_index=None, errors=None):
+    """ Generate JSON output.
+
+    Args:
+        info_by_park_id: The information by park ID. 
+        site_index: The local campsite metadata to attach to each available site. Defaults to None.
+        errors: The error of each park that could not be checked, by park ID. Defaults to None.
+
+    Returns:
+        tuple: The JSON output and whether there are availabilities.
+    """
+    availabilities_by_park_id = {}
+    has_availabilities = False
+    for park_id, info in info_by_park_id.items():
+        current, _, available_dates_by_site_id, park_name = info
+        if current:
+            has_availabilities = True
+            availabilities_by_park_id[park_id] = {
+                "park_name": park_name,
+                "availabilities": available_dates_by_site_id
+            }
+            if site_index:
+                availabilities_by_park_id[park_id]["sites"] = site_index.metadata_for(
+                    available_dates_by_site_id)
+    for park_id, error in (errors or {}).items():
+        availabilities_by_park_id[park_id] = {"error": str(error)}
+
+    return json.dumps(availabilities_by_park_id, indent=2), has_availabilities
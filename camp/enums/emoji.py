@@ -4,3 +4,5 @@ from enum import Enum
 class Emoji(Enum):
     SUCCESS = "✅"
     FAILURE = "❌"
+    SKIPPED = "⏭️"
+    STALE = "⏳"
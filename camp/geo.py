@@ -0,0 +1,109 @@
+from django.db.models import Q
+
+from camp.models import Facility
+from camp.utils import geohash
+
+CAMPGROUND_TYPE = "Campground"
+
+
+def _prefix_filter(prefixes):
+    # A range instead of __startswith: SQLite won't use the geohash index for
+    # the LIKE that startswith compiles to. "{" sorts right after "z", the
+    # last character of the geohash alphabet.
+    query = Q()
+    for prefix in prefixes:
+        query |= Q(geohash__gte=prefix) & Q(geohash__lt=prefix + "{")
+    return query
+
+
+def within_bbox(south, west, north, east, queryset=None):
+    """ Get the rows inside a bounding box using the geohash index.
+
+    Args:
+        south: The southern latitude of the box.
+        west: The western longitude of the box.
+        north: The northern latitude of the box.
+        east: The eastern longitude of the box.
+        queryset: The queryset to search. Defaults to all facilities.
+
+    Returns:
+        list: The rows inside the box.
+    """
+    if queryset is None:
+        queryset = Facility.objects.all()
+
+    prefixes = geohash.covering_prefixes(south, west, north, east)
+    candidates = queryset.filter(_prefix_filter(prefixes)).filter(
+        latitude__gte=south,
+        latitude__lte=north,
+        longitude__gte=west,
+        longitude__lte=east,
+    )
+    return list(candidates)
+
+
+def nearby(latitude, longitude, radius_miles, queryset=None):
+    """ Get the rows within a radius of a coordinate, closest first.
+
+    Args:
+        latitude: The latitude of the center.
+        longitude: The longitude of the center.
+        radius_miles: The search radius in miles.
+        queryset: The queryset to search. Defaults to all facilities.
+
+    Returns:
+        list: Tuples of (distance in miles, row) sorted by distance.
+    """
+    south, west, north, east = geohash.radius_bbox(
+        latitude, longitude, radius_miles)
+
+    results = []
+    for row in within_bbox(south, west, north, east, queryset=queryset):
+        distance = geohash.haversine_miles(
+            latitude, longitude, row.latitude, row.longitude)
+        if distance <= radius_miles:
+            results.append((distance, row))
+
+    results.sort(key=lambda x: x[0])
+    return results
+
+
+def campgrounds_queryset(reservable_only=True):
+    """ Get the facilities that can be passed to the availability scanner.
+
+    Args:
+        reservable_only: Whether to include only reservable facilities. Defaults to True.
+
+    Returns:
+        QuerySet: The campground facilities.
+    """
+    queryset = Facility.objects.filter(
+        type_description=CAMPGROUND_TYPE, enabled=True)
+    if reservable_only:
+        queryset = queryset.filter(reservable=True)
+    return queryset
+
+
+def nearby_campground_ids(latitude, longitude, radius_miles, reservable_only=True):
+    """ Get the ids of campgrounds within a radius, closest first.
+
+    The ids are in the form expected by run_campsite_check and cli.py --stdin.
+
+    Args:
+        latitude: The latitude of the center.
+        longitude: The longitude of the center.
+        radius_miles: The search radius in miles.
+        reservable_only: Whether to include only reservable facilities. Defaults to True.
+
+    Returns:
+        list: The facility ids sorted by distance.
+    """
+    return [
+        facility.facility_id
+        for _, facility in nearby(
+            latitude,
+            longitude,
+            radius_miles,
+            queryset=campgrounds_queryset(reservable_only),
+        )
+    ]
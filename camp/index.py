@@ -0,0 +1,457 @@
+""" An in-memory availability index and a local service answering queries from it.
+
+The service keeps the latest availability of every watched park as one
+bitmap of days per site, refreshes it in the background and answers
+searches from memory: the nights of a query become a mask, and a site has a
+stay when its bitmap has `nights` consecutive bits set under that mask. The
+CLI (--index-url) and the Django views (CAMPQUEST_INDEX_URL) query it over
+a local HTTP or Unix socket API instead of the upstream APIs.
+
+    GET /query?parks=1,2&start=2025-06-01&end=2025-06-05&nights=2
+        [&weekends_only=1&campsite_type=STANDARD+NONELECTRIC&campsite_ids=3,4&excluded_site_ids=5]
+    GET /status
+"""
+import http.client
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from camp import metrics
+from camp.engine import month_starts
+from camp.enums.date_format import DateFormat
+
+LOG = logging.getLogger(__name__)
+
+UNIX_PREFIX = "unix:"
+
+
+class NotIndexed(LookupError):
+    """ The index has no availability of the park for the requested dates. """
+
+
+class ParkAvailability:
+    """ The availability of one park. Bit i of a site's bitmap is set when night `base + i` is available.
+
+    Args:
+        park_id: The park ID.
+        park_name: The park name.
+        base: The ordinal of the first night covered.
+        days: The number of nights covered.
+        sites: (campsite ID, campsite type, bitmap) by campsite ID string, in upstream order.
+        refreshed_at: When the availability was fetched, a Unix timestamp.
+    """
+
+    __slots__ = ("park_id", "park_name", "base", "days", "sites", "weekends", "refreshed_at")
+
+    def __init__(self, park_id, park_name, base, days, sites, refreshed_at):
+        self.park_id = park_id
+        self.park_name = park_name
+        self.base = base
+        self.days = days
+        self.sites = sites
+        self.refreshed_at = refreshed_at
+        self.weekends = 0
+        for i in range(days):
+            if date.fromordinal(base + i).weekday() >= 5:
+                self.weekends |= 1 << i
+
+    @classmethod
+    def from_payloads(cls, park_id, park_name, start_date, end_date, payloads, refreshed_at=None):
+        """ Build the bitmaps from the monthly availability payloads covering start_date to end_date. """
+        base = start_date.toordinal()
+        days = (end_date - start_date).days
+        sites = {}
+        for payload in payloads:
+            for campsite_id, campsite_data in payload["campsites"].items():
+                site = sites.get(campsite_id)
+                bits = site[2] if site else 0
+                for day, value in campsite_data["availabilities"].items():
+                    if value != "Available":
+                        continue
+                    i = date.fromisoformat(day[:10]).toordinal() - base
+                    if 0 <= i < days:
+                        bits |= 1 << i
+                sites[campsite_id] = (int(campsite_id), campsite_data.get("campsite_type"), bits)
+        return cls(park_id, park_name, base, days, sites,
+                   time.time() if refreshed_at is None else refreshed_at)
+
+    def covers(self, start_date, end_date):
+        return self.base <= start_date.toordinal() and end_date.toordinal() <= self.base + self.days
+
+    def query(self, start_date, end_date, nights=None, weekends_only=False, campsite_type=None, campsite_ids=(),
+              excluded_site_ids=(), allowed_site_ids=None):
+        """ Find the stays of a search, like check_park does from the upstream payloads.
+
+        Returns:
+            tuple: The number of available sites, the maximum number of sites, the available dates by campsite ID
+            and the park name.
+        """
+        num_days = (end_date - start_date).days
+        if nights not in range(1, num_days + 1):
+            nights = num_days
+        first = start_date.toordinal() - self.base
+        mask = ((1 << num_days) - 1) << first
+        if weekends_only:
+            mask &= self.weekends
+
+        maximum = 0
+        num_available = 0
+        available_dates_by_campsite_id = {}
+        for campsite_id, (site_id, site_type, bits) in self.sites.items():
+            if campsite_id in excluded_site_ids:
+                continue
+            if allowed_site_ids is not None and campsite_id not in allowed_site_ids:
+                continue
+            maximum += 1
+            if (campsite_type and campsite_type != site_type) or (campsite_ids and site_id not in campsite_ids):
+                continue
+            bits &= mask
+            # Keep the bits that start a run of `nights` set bits.
+            starts = bits
+            for shift in range(1, nights):
+                starts &= bits >> shift
+            if not starts:
+                continue
+            num_available += 1
+            ranges = available_dates_by_campsite_id[site_id] = []
+            while starts:
+                low = starts & -starts
+                arrival = self.base + low.bit_length() - 1
+                ranges.append({"start": date.fromordinal(arrival).isoformat(),
+                               "end": date.fromordinal(arrival + nights).isoformat()})
+                starts ^= low
+        return num_available, maximum, available_dates_by_campsite_id, self.park_name
+
+
+class AvailabilityIndex:
+    """ The latest ParkAvailability of every park. Refreshes swap a park's entry, so queries never wait on them. """
+
+    def __init__(self):
+        self._parks = {}
+
+    def refresh(self, park_id, start_date, end_date, fetch=None):
+        """ Fetch the availability of a park from start_date to end_date and replace its entry. """
+        from camp.clients.recreation_client import RecreationClient
+
+        fetch = fetch or RecreationClient.get_availability
+        payloads = [fetch(park_id, month_date) for month_date in month_starts(start_date, end_date)]
+        park = ParkAvailability.from_payloads(
+            str(park_id), RecreationClient.get_park_name(park_id), start_date, end_date, payloads)
+        self._parks[str(park_id)] = park
+        return park
+
+    def get(self, park_id):
+        return self._parks.get(str(park_id))
+
+    def discard(self, park_id):
+        self._parks.pop(str(park_id), None)
+
+    def query(self, parks, start_date, end_date, **search):
+        """ Answer a search for some parks. `search` takes the keyword arguments of ParkAvailability.query.
+
+        Returns:
+            tuple: The check_park tuple by park ID, and the reason by park ID of the parks that were not answered.
+        """
+        info_by_park_id = {}
+        missing = {}
+        for park_id in parks:
+            park = self.get(park_id)
+            if park is None:
+                missing[park_id] = "not in the index"
+            elif not park.covers(start_date, end_date):
+                missing[park_id] = "indexed from {} to {} only".format(
+                    date.fromordinal(park.base), date.fromordinal(park.base + park.days))
+            else:
+                info_by_park_id[park_id] = park.query(start_date, end_date, **search)
+        return info_by_park_id, missing
+
+    def status(self):
+        return {
+            park_id: {
+                "park_name": park.park_name,
+                "start": date.fromordinal(park.base).isoformat(),
+                "end": date.fromordinal(park.base + park.days).isoformat(),
+                "sites": len(park.sites),
+                "refreshed_at": park.refreshed_at,
+            }
+            for park_id, park in list(self._parks.items())
+        }
+
+
+def horizons(searches):
+    """ Merge searches into the dates to index by park.
+
+    Args:
+        searches: (park IDs, start date, end date) tuples.
+
+    Returns:
+        dict: (start date, end date) by park ID string.
+    """
+    merged = {}
+    for parks, start_date, end_date in searches:
+        for park_id in parks:
+            previous = merged.get(str(park_id))
+            if previous:
+                start_date, end_date = min(previous[0], start_date), max(previous[1], end_date)
+            merged[str(park_id)] = (start_date, end_date)
+    return merged
+
+
+def watch_list_searches(path):
+    """ The recreation.gov searches of a watch list, as (park IDs, start date, end date) tuples. """
+    from camp.watch import load_watch_list
+
+    return [(watch.parks, watch.start_date, watch.end_date)
+            for watch in load_watch_list(path).watches if watch.source == "recreation"]
+
+
+class IndexService:
+    """ Keeps an AvailabilityIndex of the watched parks fresh on a background thread.
+
+    Args:
+        index: The AvailabilityIndex.
+        searches: Returns the watched (park IDs, start date, end date) tuples, called before every refresh.
+        interval: Seconds between refreshes. Defaults to 60.
+        fetch: Gets a month of availability, see get_park_information. Defaults to None.
+    """
+
+    def __init__(self, index, searches, interval=60.0, fetch=None):
+        self.index = index
+        self.searches = searches
+        self.interval = interval
+        self.fetch = fetch
+        self.wanted = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh_all(self):
+        """ Refresh every watched park. A park that fails keeps its previous availability. """
+        try:
+            wanted = horizons(self.searches())
+        except ValueError as e:
+            LOG.error("Keeping the previous parks, the watched searches are invalid: %s", e)
+            wanted = self.wanted
+        for park_id in set(self.wanted) - set(wanted):
+            self.index.discard(park_id)
+        self.wanted = wanted
+        for park_id, (start_date, end_date) in wanted.items():
+            try:
+                with metrics.timer("campquest_stage_seconds", stage="index_refresh", park=park_id):
+                    self.index.refresh(park_id, start_date, end_date, fetch=self.fetch)
+            except Exception as e:
+                metrics.inc("campquest_index_refresh_failures_total")
+                LOG.warning("Could not refresh park %s, keeping its previous availability: %s", park_id, e)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.refresh_all()
+            LOG.info("Refreshed %s park(s) in %.2fs", len(self.index.status()), time.monotonic() - started)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="index-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.strptime(value, DateFormat.INPUT_DATE_FORMAT.value).date()
+    except (TypeError, ValueError):
+        raise ValueError("{} must be a date [YYYY-MM-DD]".format(name))
+
+
+def _split(values):
+    return [part for value in values for part in value.split(",") if part]
+
+
+def parse_query(params):
+    """ Parse the parameters of /query, lists of strings by name as parse_qs returns them.
+
+    Returns:
+        tuple: The park IDs, the start and end dates, and the keyword arguments of ParkAvailability.query.
+    """
+    parks = _split(params.get("parks", []))
+    if not parks:
+        raise ValueError("parks is required")
+    start_date = _parse_date(params.get("start", [None])[0], "start")
+    end_date = _parse_date(params.get("end", [None])[0], "end")
+    if end_date <= start_date:
+        raise ValueError("end must be after start")
+    try:
+        nights = int(params["nights"][0]) if params.get("nights") else None
+        campsite_ids = [int(i) for i in _split(params.get("campsite_ids", []))]
+    except ValueError:
+        raise ValueError("nights and campsite_ids must be integers")
+    search = {
+        "nights": nights,
+        "weekends_only": params.get("weekends_only", ["0"])[0] in ("1", "true"),
+        "campsite_type": params.get("campsite_type", [None])[0],
+        "campsite_ids": campsite_ids,
+        "excluded_site_ids": set(_split(params.get("excluded_site_ids", []))),
+    }
+    return parks, start_date, end_date, search
+
+
+class IndexRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/status":
+            return self.send_json(200, {"parks": self.server.index.status()})
+        if url.path != "/query":
+            return self.send_json(404, {"error": "not found"})
+        try:
+            parks, start_date, end_date, search = parse_query(parse_qs(url.query))
+        except ValueError as e:
+            return self.send_json(400, {"error": str(e)})
+        with metrics.timer("campquest_index_query_seconds"):
+            info_by_park_id, missing = self.server.index.query(parks, start_date, end_date, **search)
+        self.send_json(200, {
+            "parks": {
+                park_id: {"available": info[0], "maximum": info[1], "sites": info[2], "park_name": info[3]}
+                for park_id, info in info_by_park_id.items()
+            },
+            "missing": missing,
+        })
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address.
+        return request, ("local", 0)
+
+
+def make_server(address, index):
+    """ Bind the query API to `address`, host:port (http:// optional) or unix:/path/to.sock.
+
+    Returns:
+        The server, run it with serve_forever.
+    """
+    if address.startswith(UNIX_PREFIX):
+        path = address[len(UNIX_PREFIX):]
+        if os.path.exists(path):
+            os.unlink(path)
+        server = UnixHTTPServer(path, IndexRequestHandler)
+    else:
+        netloc = urlparse(address if "//" in address else "//" + address).netloc
+        host, _, port = netloc.rpartition(":")
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), IndexRequestHandler)
+        server.daemon_threads = True
+    server.index = index
+    return server
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class IndexClient:
+    """ Queries an index service.
+
+    Args:
+        address: The address the service listens on, host:port (http:// optional) or unix:/path/to.sock.
+        timeout: Seconds to wait for an answer. Defaults to 5.
+    """
+
+    def __init__(self, address, timeout=5.0):
+        self.address = address
+        self.timeout = timeout
+
+    def _connection(self):
+        if self.address.startswith(UNIX_PREFIX):
+            return UnixHTTPConnection(self.address[len(UNIX_PREFIX):], self.timeout)
+        netloc = urlparse(self.address if "//" in self.address else "//" + self.address).netloc
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def get(self, path, params=None):
+        connection = self._connection()
+        try:
+            connection.request("GET", path + ("?" + urlencode(params) if params else ""))
+            response = connection.getresponse()
+            body = json.loads(response.read() or b"{}")
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise RuntimeError("Index service answered {}: {}".format(response.status, body.get("error")))
+        return body
+
+    def query(self, parks, start_date, end_date, nights=None, weekends_only=False, campsite_type=None,
+              campsite_ids=(), excluded_site_ids=()):
+        """ Search the indexed parks.
+
+        Returns:
+            tuple: The check_park tuple by park ID, keyed like `parks`, and the reason by park ID of the parks
+            the index could not answer.
+        """
+        params = {
+            "parks": ",".join(str(park_id) for park_id in parks),
+            "start": start_date.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+            "end": end_date.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+        }
+        if nights:
+            params["nights"] = nights
+        if weekends_only:
+            params["weekends_only"] = 1
+        if campsite_type:
+            params["campsite_type"] = campsite_type
+        if campsite_ids:
+            params["campsite_ids"] = ",".join(str(i) for i in campsite_ids)
+        if excluded_site_ids:
+            params["excluded_site_ids"] = ",".join(str(i) for i in excluded_site_ids)
+        with metrics.timer("campquest_http_request_seconds", endpoint="index"):
+            body = self.get("/query", params)
+
+        info_by_park_id = {}
+        missing = {}
+        for park_id in parks:
+            park = body["parks"].get(str(park_id))
+            if park is None:
+                missing[park_id] = body["missing"].get(str(park_id), "not in the index")
+                continue
+            sites = {int(site_id): dates for site_id, dates in park["sites"].items()}
+            info_by_park_id[park_id] = (park["available"], park["maximum"], sites, park["park_name"])
+        return info_by_park_id, missing
+
+    def results(self, parks, start_date, end_date, **search):
+        """ Yield (park ID, check_park tuple) like cli.check_parks, with a NotIndexed error for missing parks. """
+        info_by_park_id, missing = self.query(parks, start_date, end_date, **search)
+        for park_id in parks:
+            if park_id in missing:
+                yield park_id, NotIndexed(missing[park_id])
+            else:
+                yield park_id, info_by_park_id[park_id]
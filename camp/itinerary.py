@@ -0,0 +1,238 @@
+""" Stays that switch sites when no single site is free for every night.
+
+A park can have a free site every night of a trip without any one site
+being free for all of them. An itinerary covers the nights with a sequence
+of legs, one site per leg, and the best one has the fewest site changes.
+
+Covering consecutive nights with the fewest runs is interval covering, for
+which the greedy choice is optimal: on the first uncovered night, take the
+site whose run of free nights reaches furthest. With the furthest reach of
+each night precomputed over the whole availability matrix, an itinerary
+costs one lookup per leg, whatever the number of sites.
+"""
+import json
+import logging
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Tuple
+
+from camp import metrics
+from camp.engine import get_park_information
+from camp.enums.date_format import DateFormat
+from camp.enums.emoji import Emoji
+from camp.windows import run_lengths
+
+LOG = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Leg:
+    site_id: int
+    arrival: date
+    nights: int
+
+    @property
+    def departure(self):
+        return self.arrival + timedelta(days=self.nights)
+
+
+@dataclass(frozen=True)
+class Itinerary:
+    legs: Tuple[Leg, ...]
+
+    @property
+    def arrival(self):
+        return self.legs[0].arrival
+
+    @property
+    def departure(self):
+        return self.legs[-1].departure
+
+    @property
+    def nights(self):
+        return sum(leg.nights for leg in self.legs)
+
+    @property
+    def changes(self):
+        return len(self.legs) - 1
+
+    def as_dict(self):
+        return {
+            "arrival": self.arrival.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+            "departure": self.departure.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+            "changes": self.changes,
+            "legs": [{
+                "site_id": leg.site_id,
+                "start": leg.arrival.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+                "end": leg.departure.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+            } for leg in self.legs],
+        }
+
+
+def furthest_reach(runs_by_site, site_ids=None):
+    """ Find, for each night, the site whose run of free nights starting then is the longest.
+
+    Args:
+        runs_by_site: The run lengths, see camp.windows.run_lengths.
+        site_ids: The sites to consider, or None for all.
+
+    Returns:
+        dict: The (run length, campsite ID) by date ordinal. Ties go to the lowest campsite ID.
+    """
+    best = {}
+    for site_id in sorted(runs_by_site if site_ids is None else site_ids & runs_by_site.keys()):
+        for ordinal, length in runs_by_site[site_id].items():
+            if length > best.get(ordinal, (0,))[0]:
+                best[ordinal] = (length, site_id)
+    return best
+
+
+def plan_itinerary(reach, arrival, nights):
+    """ Cover nights from an arrival with the fewest legs.
+
+    Args:
+        reach: The furthest reach by date ordinal, see furthest_reach.
+        arrival: The date ordinal of the first night.
+        nights: The number of nights.
+
+    Returns:
+        Itinerary: The itinerary, or None if some night has no free site.
+    """
+    legs = []
+    night, end = arrival, arrival + nights
+    while night < end:
+        if night not in reach:
+            return None
+        length, site_id = reach[night]
+        length = min(length, end - night)
+        legs.append(Leg(site_id, date.fromordinal(night), length))
+        night += length
+    return Itinerary(tuple(legs))
+
+
+def find_itineraries(park_information, start_date, end_date, nights=None, site_groups=None, max_changes=None):
+    """ Find the itinerary with the fewest site changes for each possible arrival.
+
+    Args:
+        park_information: The available dates by campsite ID, see get_park_information.
+        start_date: The first possible night.
+        end_date: The last possible departure day.
+        nights: The number of nights. Defaults to every night of the range.
+        site_groups: Sets of campsite IDs an itinerary must stay within, e.g. one per loop. Defaults to one group of all sites.
+        max_changes: The most site changes to accept. Defaults to no limit.
+
+    Returns:
+        list: The Itineraries ranked by site changes, then arrival.
+    """
+    first, end = start_date.toordinal(), end_date.toordinal()
+    if not nights or nights > end - first:
+        nights = end - first
+    runs_by_site = run_lengths(park_information)
+    reaches = [furthest_reach(runs_by_site, group) for group in (site_groups or [None])]
+
+    itineraries = []
+    for arrival in range(first, end - nights + 1):
+        found = [plan_itinerary(reach, arrival, nights) for reach in reaches]
+        found = [itinerary for itinerary in found if itinerary is not None]
+        if not found:
+            continue
+        best = min(found, key=lambda itinerary: itinerary.changes)
+        if max_changes is None or best.changes <= max_changes:
+            itineraries.append(best)
+    itineraries.sort(key=lambda itinerary: (itinerary.changes, itinerary.arrival))
+    return itineraries
+
+
+def loop_groups(site_index, site_ids):
+    """ Group campsites by loop. Sites the index does not know form a group of their own.
+
+    Args:
+        site_index: The local campsite metadata.
+        site_ids: The campsite IDs.
+
+    Returns:
+        list: The sets of integer campsite IDs.
+    """
+    groups = {}
+    for site_id in site_ids:
+        site = site_index.get(site_id)
+        key = ("loop", site.loop) if site and site.loop else ("site", int(site_id))
+        groups.setdefault(key, set()).add(int(site_id))
+    return list(groups.values())
+
+
+def check_park_itineraries(
+    park_id, start_date, end_date, nights=None, campsite_type=None, campsite_ids=(), excluded_site_ids=(),
+    allowed_site_ids=None, fetch=None, site_index=None, same_loop=False, max_changes=None,
+):
+    """ Check a recreation.gov park for itineraries.
+
+    Args:
+        park_id: The park ID to check.
+        start_date: The start date.
+        end_date: The end date.
+        nights: The number of nights. Defaults to every night of the range.
+        campsite_type: The campsite type. Defaults to None.
+        campsite_ids: The campsite IDs. Defaults to ().
+        excluded_site_ids: The campsite IDs to exclude. Defaults to ().
+        allowed_site_ids: The campsite IDs left by the query planner, or None to keep all. Defaults to None.
+        fetch: Gets a month of availability, see get_park_information. Defaults to None.
+        site_index: The local campsite metadata, needed for same_loop. Defaults to None.
+        same_loop: Whether every leg must be in the same loop. Defaults to False.
+        max_changes: The most site changes to accept. Defaults to no limit.
+
+    Returns:
+        tuple: The Itineraries, the number of sites and the park name.
+    """
+    from camp.clients.recreation_client import RecreationClient
+
+    park_information = get_park_information(
+        park_id, start_date, end_date, campsite_type, campsite_ids, excluded_site_ids=excluded_site_ids,
+        allowed_site_ids=allowed_site_ids, fetch=fetch,
+    )
+    site_groups = loop_groups(site_index, park_information) if same_loop else None
+    with metrics.timer("campquest_stage_seconds", stage="itineraries", park=str(park_id)):
+        itineraries = find_itineraries(
+            park_information, start_date, end_date, nights=nights, site_groups=site_groups,
+            max_changes=max_changes,
+        )
+    LOG.info("Park %s: %s itinerary(ies) found", park_id, len(itineraries))
+    return itineraries, len(park_information), RecreationClient.get_park_name(park_id)
+
+
+def generate_itinerary_output(itineraries_by_park_id, json_output=False):
+    """ Format the itineraries of each park.
+
+    Args:
+        itineraries_by_park_id: The check_park_itineraries tuple by park ID.
+        json_output: Whether to output JSON. Defaults to False.
+
+    Returns:
+        tuple: The output and whether any itinerary was found.
+    """
+    has_itineraries = any(itineraries for itineraries, _, _ in itineraries_by_park_id.values())
+    if json_output:
+        return json.dumps({
+            park_id: {"park_name": park_name, "itineraries": [i.as_dict() for i in itineraries]}
+            for park_id, (itineraries, _, park_name) in itineraries_by_park_id.items() if itineraries
+        }, indent=2), has_itineraries
+
+    out = ["There are stays available 😊" if has_itineraries else "There are no stays available 😢"]
+    for park_id, (itineraries, maximum, park_name) in itineraries_by_park_id.items():
+        out.append("{emoji} {park_name} ({park_id}): {count} stay(s) across {maximum} site(s)".format(
+            emoji=Emoji.SUCCESS.value if itineraries else Emoji.FAILURE.value,
+            park_name=park_name, park_id=park_id, count=len(itineraries), maximum=maximum,
+        ))
+        for itinerary in itineraries:
+            out.append("  * {arrival} -> {departure}, {changes} site change(s):".format(
+                arrival=itinerary.arrival.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+                departure=itinerary.departure.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+                changes=itinerary.changes,
+            ))
+            for leg in itinerary.legs:
+                out.append("    * Site {site_id}: {start} -> {end}".format(
+                    site_id=leg.site_id,
+                    start=leg.arrival.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+                    end=leg.departure.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+                ))
+    return "\n".join(out), has_itineraries
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from camp.site_index import SiteIndex
+
+
+class Command(BaseCommand):
+    help = 'Export campsite metadata to a JSON site index for cli.py --site-index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Where to write the site index')
+        parser.add_argument('--facility', action='append', dest='facilities',
+                            help='Only export sites of this facility ID (repeatable)')
+
+    def handle(self, *args, **options):
+        index = SiteIndex.from_db(facility_ids=options['facilities'])
+        index.save(options['path'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {len(index)} campsites to {options['path']}."))
@@ -0,0 +1,96 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from camp import geo
+from camp.camping import run_campsite_check
+from camp.models import Facility
+from camp.utils import geohash
+
+
+class Command(BaseCommand):
+    help = 'Find campgrounds near a location and optionally check their availability'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lat', type=float, help='Latitude of the center')
+        parser.add_argument('--lon', type=float,
+                            help='Longitude of the center')
+        parser.add_argument('--near-facility',
+                            help='Use the location of this facility ID as the center')
+        parser.add_argument('--radius', type=float, default=50.0,
+                            help='Search radius in miles (default 50)')
+        parser.add_argument('--bbox', type=float, nargs=4,
+                            metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'),
+                            help='Search a bounding box instead of a radius')
+        parser.add_argument('--include-unreservable', action='store_true',
+                            help='Include campgrounds that cannot be reserved')
+        parser.add_argument('--ids-only', action='store_true',
+                            help='Print only facility IDs, e.g. to pipe into cli.py --stdin')
+        parser.add_argument('--start-date',
+                            help='Check availability from this date [YYYY-MM-DD]')
+        parser.add_argument('--end-date',
+                            help='Check availability until this date [YYYY-MM-DD]')
+        parser.add_argument('--nights', type=int,
+                            help='Number of consecutive nights')
+        parser.add_argument('--weekends-only', action='store_true',
+                            help='Include only weekends')
+
+    def handle(self, *args, **options):
+        queryset = geo.campgrounds_queryset(
+            reservable_only=not options['include_unreservable'])
+
+        if options['bbox']:
+            south, west, north, east = options['bbox']
+            center_lat, center_lon = (south + north) / 2, (west + east) / 2
+            results = sorted(
+                (
+                    (geohash.haversine_miles(
+                        center_lat, center_lon, f.latitude, f.longitude), f)
+                    for f in geo.within_bbox(south, west, north, east, queryset=queryset)
+                ),
+                key=lambda x: x[0],
+            )
+        else:
+            lat, lon = self._center(options)
+            results = geo.nearby(lat, lon, options['radius'], queryset=queryset)
+
+        if options['ids_only']:
+            for _, facility in results:
+                self.stdout.write(facility.facility_id)
+            return
+
+        for distance, facility in results:
+            self.stdout.write(
+                f"{facility.facility_id}\t{distance:6.1f} mi\t{facility.name}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Found {len(results)} campground(s)."))
+
+        if options['start_date'] and options['end_date'] and results:
+            start_date = datetime.strptime(options['start_date'], "%Y-%m-%d")
+            end_date = datetime.strptime(options['end_date'], "%Y-%m-%d")
+            output, _ = run_campsite_check(
+                [facility.facility_id for _, facility in results],
+                start_date,
+                end_date,
+                nights=options['nights'],
+                weekends_only=options['weekends_only'],
+            )
+            self.stdout.write(output)
+
+    def _center(self, options):
+        if options['near_facility']:
+            try:
+                facility = Facility.objects.get(
+                    facility_id=options['near_facility'])
+            except Facility.DoesNotExist:
+                raise CommandError(
+                    f"Facility {options['near_facility']} does not exist.")
+            if facility.latitude is None or facility.longitude is None:
+                raise CommandError(
+                    f"Facility {options['near_facility']} has no location.")
+            return facility.latitude, facility.longitude
+
+        if options['lat'] is None or options['lon'] is None:
+            raise CommandError(
+                "Provide --lat and --lon, --near-facility, or --bbox.")
+        return options['lat'], options['lon']
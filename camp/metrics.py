@@ -0,0 +1,288 @@
+""" In-process metrics for the availability pipeline.
+
+Counters, histograms and gauges are kept in one registry. It can be
+rendered as a human summary (cli.py --metrics), as a one line stats
+summary for continuous mode, or in the Prometheus text format (the
+/metrics/ view of the web app).
+"""
+import copy
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Latency buckets in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "campquest_http_requests_total": "Upstream HTTP requests by endpoint and status.",
+    "campquest_http_request_seconds": "Upstream HTTP latency by endpoint.",
+    "campquest_http_response_bytes_total": "Bytes downloaded from upstream by endpoint.",
+    "campquest_parse_seconds": "Time spent decoding upstream JSON by endpoint.",
+    "campquest_stage_seconds": "Time spent in each pipeline stage by park.",
+    "campquest_cache_requests_total": "Cache lookups by cache and result.",
+    "campquest_scheduler_lag_seconds": "How late the last continuous mode cycle started.",
+    "campquest_cycles_total": "Completed continuous mode cycles.",
+    "campquest_fetches_deduplicated_total": "Park month fetches saved by sharing them between searches.",
+    "campquest_hedged_requests_total": "Duplicate requests sent after the p95 latency, by endpoint and winner.",
+    "campquest_stale_parks_total": "Parks reported stale after missing the sweep deadline or timing out.",
+    "campquest_circuit_opened_total": "Circuit breakers opened, by kind (host or park).",
+    "campquest_budget_waits_total": "Times a request waited for the request budget.",
+    "campquest_index_refresh_failures_total": "Index service park refreshes that failed.",
+    "campquest_index_query_seconds": "Time the index service took to answer a query.",
+    "campquest_api_responses_total": "JSON API responses by status, 304 when the client's copy was fresh.",
+    "campquest_requests_skipped_total": "Requests not sent because of an open circuit or an unknown ID, by reason.",
+}
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(k, str(v).replace('"', '\\"')) for k, v in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """ Estimate a quantile from the bucket counts. """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.gauges = {}
+            self.histograms = {}
+            self.started_at = time.time()
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[_key(labels)] = series.get(_key(labels), 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges.setdefault(name, {})[_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(_key(labels))
+            if histogram is None:
+                histogram = series[_key(labels)] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self):
+        """ A picklable copy of the counters and histograms, e.g. to send back from a worker process. """
+        with self._lock:
+            return copy.deepcopy({"counters": self.counters, "histograms": self.histograms})
+
+    def merge(self, snapshot):
+        """ Add the counters and histograms of a snapshot, e.g. one taken in a worker process. """
+        with self._lock:
+            for name, series in snapshot["counters"].items():
+                merged = self.counters.setdefault(name, {})
+                for key, value in series.items():
+                    merged[key] = merged.get(key, 0) + value
+            for name, series in snapshot["histograms"].items():
+                merged = self.histograms.setdefault(name, {})
+                for key, histogram in series.items():
+                    total = merged.get(key)
+                    if total is None:
+                        merged[key] = histogram
+                        continue
+                    total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+                    total.sum += histogram.sum
+                    total.count += histogram.count
+                    total.max = max(total.max, histogram.max)
+
+    def quantile(self, name, q, **labels):
+        """ Estimate a quantile of one histogram series.
+
+        Returns:
+            tuple: The estimate and the number of observations, (None, 0) without any.
+        """
+        with self._lock:
+            histogram = self.histograms.get(name, {}).get(_key(labels))
+            if histogram is None or not histogram.count:
+                return None, 0
+            return histogram.quantile(q), histogram.count
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_cache(self, cache, hit):
+        self.inc("campquest_cache_requests_total", cache=cache,
+                 result="hit" if hit else "miss")
+
+    def counter_total(self, name, **match):
+        """ Sum a counter over the series whose labels include match. """
+        with self._lock:
+            return sum(
+                value for key, value in self.counters.get(name, {}).items()
+                if set(match.items()) <= set(key)
+            )
+
+    def cache_hit_ratios(self):
+        ratios = {}
+        with self._lock:
+            for key, value in self.counters.get("campquest_cache_requests_total", {}).items():
+                labels = dict(key)
+                hits, total = ratios.get(labels["cache"], (0, 0))
+                if labels["result"] == "hit":
+                    hits += value
+                ratios[labels["cache"]] = (hits, total + value)
+        return {cache: hits / total for cache, (hits, total) in ratios.items() if total}
+
+    def render_prometheus(self):
+        """ Render every metric in the Prometheus text exposition format. """
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+                for name, series in sorted(metrics.items()):
+                    lines.append("# HELP {} {}".format(name, HELP.get(name, name)))
+                    lines.append("# TYPE {} {}".format(name, kind))
+                    for key, value in sorted(series.items()):
+                        lines.append("{}{} {}".format(name, _format_labels(key), value))
+            for name, series in sorted(self.histograms.items()):
+                lines.append("# HELP {} {}".format(name, HELP.get(name, name)))
+                lines.append("# TYPE {} histogram".format(name))
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bucket, bucket_count in zip(histogram.buckets, histogram.counts):
+                        cumulative += bucket_count
+                        lines.append("{}_bucket{} {}".format(
+                            name, _format_labels(key, [("le", bucket)]), cumulative))
+                    lines.append("{}_bucket{} {}".format(
+                        name, _format_labels(key, [("le", "+Inf")]), histogram.count))
+                    lines.append("{}_sum{} {}".format(name, _format_labels(key), histogram.sum))
+                    lines.append("{}_count{} {}".format(name, _format_labels(key), histogram.count))
+        return "\n".join(lines) + "\n"
+
+    def _by_label(self, name, label):
+        """ Merge the histograms of a metric by one label. """
+        merged = {}
+        with self._lock:
+            for key, histogram in self.histograms.get(name, {}).items():
+                value = dict(key).get(label)
+                total = merged.setdefault(value, Histogram(histogram.buckets))
+                total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+                total.sum += histogram.sum
+                total.count += histogram.count
+                total.max = max(total.max, histogram.max)
+        return merged
+
+    def stats_line(self):
+        """ A one line summary for periodic logging. """
+        requests = self.counter_total("campquest_http_requests_total")
+        errors = requests - self.counter_total("campquest_http_requests_total", status="200") - \
+            self.counter_total("campquest_http_requests_total", status="304")
+        megabytes = self.counter_total("campquest_http_response_bytes_total") / 1e6
+        latency = Histogram()
+        for histogram in self._by_label("campquest_http_request_seconds", "endpoint").values():
+            latency.counts = [a + b for a, b in zip(latency.counts, histogram.counts)]
+            latency.count += histogram.count
+            latency.max = max(latency.max, histogram.max)
+        with self._lock:
+            lag = sum(self.gauges.get(
+                "campquest_scheduler_lag_seconds", {}).values())
+        caches = " ".join("{}={:.0%}".format(cache, ratio)
+                          for cache, ratio in sorted(self.cache_hit_ratios().items()))
+        return "requests={} errors={} downloaded={:.1f}MB p50={:.3f}s p95={:.3f}s lag={:.2f}s{}".format(
+            requests, errors, megabytes, latency.quantile(0.5), latency.quantile(0.95), lag,
+            " cache_hit " + caches if caches else "",
+        )
+
+    def summary(self):
+        """ A human readable summary of where the time went. """
+        out = ["CampQuest metrics ({:.1f}s)".format(time.time() - self.started_at)]
+
+        out.append("HTTP requests by endpoint:")
+        for endpoint, histogram in sorted(self._by_label("campquest_http_request_seconds", "endpoint").items()):
+            downloaded = self.counter_total(
+                "campquest_http_response_bytes_total", endpoint=endpoint)
+            failed = self.counter_total("campquest_http_requests_total", endpoint=endpoint) - \
+                self.counter_total("campquest_http_requests_total", endpoint=endpoint, status="200") - \
+                self.counter_total("campquest_http_requests_total", endpoint=endpoint, status="304")
+            out.append(
+                "  {:<20} n={:<5} failed={:<4} mean={:.3f}s p95={:.3f}s max={:.3f}s downloaded={:.1f}KB".format(
+                    endpoint, histogram.count, failed, histogram.sum / histogram.count,
+                    histogram.quantile(0.95), histogram.max, downloaded / 1e3,
+                ))
+
+        out.append("Time by stage:")
+        for name, label in (("campquest_parse_seconds", "endpoint"), ("campquest_stage_seconds", "stage")):
+            for value, histogram in sorted(self._by_label(name, label).items()):
+                out.append("  {:<20} n={:<5} total={:.3f}s mean={:.4f}s max={:.4f}s".format(
+                    "parse " + value if name == "campquest_parse_seconds" else value,
+                    histogram.count, histogram.sum, histogram.sum / histogram.count, histogram.max,
+                ))
+
+        slowest = []
+        with self._lock:
+            for key, histogram in self.histograms.get("campquest_stage_seconds", {}).items():
+                labels = dict(key)
+                if labels.get("stage") == "check_park":
+                    slowest.append((histogram.sum, labels.get("park")))
+        if slowest:
+            out.append("Slowest parks:")
+            for seconds, park in sorted(slowest, reverse=True)[:5]:
+                out.append("  {:<20} {:.3f}s".format(park, seconds))
+
+        ratios = self.cache_hit_ratios()
+        if ratios:
+            out.append("Cache hit ratios:")
+            for cache, ratio in sorted(ratios.items()):
+                out.append("  {:<20} {:.1%}".format(cache, ratio))
+
+        lag = self.gauges.get("campquest_scheduler_lag_seconds")
+        if lag:
+            out.append("Scheduler lag: {:.2f}s".format(sum(lag.values())))
+
+        return "\n".join(out)
+
+
+REGISTRY = Registry()
+
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+set_gauge = REGISTRY.set_gauge
+timer = REGISTRY.timer
+record_cache = REGISTRY.record_cache
+quantile = REGISTRY.quantile
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+from camp.utils import geohash
+
+
+def populate_geohash(apps, schema_editor):
+    for model_name in ("RecreationArea", "Facility", "Campsite"):
+        model = apps.get_model("camp", model_name)
+        rows = model.objects.exclude(latitude=None).exclude(longitude=None)
+        batch = []
+        for row in rows.iterator(chunk_size=2000):
+            row.geohash = geohash.encode(row.latitude, row.longitude)
+            batch.append(row)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ["geohash"])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ["geohash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("camp", "0008_campsite")]
+
+    operations = [
+        migrations.AddField(
+            model_name="campsite",
+            name="geohash",
+            field=models.CharField(
+                blank=True, db_index=True, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name="facility",
+            name="geohash",
+            field=models.CharField(
+                blank=True, db_index=True, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name="recreationarea",
+            name="geohash",
+            field=models.CharField(
+                blank=True, db_index=True, max_length=12, null=True),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,30 @@
 from django.db import models
 
+from camp.utils import geohash
 
-class RecreationArea(models.Model):
+
+class GeoIndexedModel(models.Model):
+    """ Keeps a geohash of the latitude/longitude so area searches can use an
+    indexed prefix lookup instead of scanning the whole table.
+    """
+    geohash = models.CharField(
+        max_length=12, blank=True, null=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def update_geohash(self):
+        if self.latitude is None or self.longitude is None:
+            self.geohash = None
+        else:
+            self.geohash = geohash.encode(self.latitude, self.longitude)
+
+    def save(self, *args, **kwargs):
+        self.update_geohash()
+        super().save(*args, **kwargs)
+
+
+class RecreationArea(GeoIndexedModel):
     rec_area_id = models.CharField(max_length=100, primary_key=True)
     org_rec_area_id = models.CharField(max_length=100, blank=True, null=True)
     parent_org_id = models.CharField(max_length=100, blank=True, null=True)
@@ -17,7 +40,7 @@ class RecreationArea(models.Model):
     last_updated_date = models.DateField()
 
 
-class Facility(models.Model):
+class Facility(GeoIndexedModel):
     facility_id = models.CharField(max_length=100, primary_key=True)
     parent_org_id = models.CharField(max_length=100, blank=True, null=True)
     parent_rec_area = models.ForeignKey(
@@ -41,7 +64,7 @@ class RecAreaFacilityLink(models.Model):
     facility_id = models.ForeignKey(Facility, on_delete=models.CASCADE)
 
 
-class Campsite(models.Model):
+class Campsite(GeoIndexedModel):
     campsite_id = models.CharField(max_length=100, primary_key=True)
     facility = models.ForeignKey(
         Facility, on_delete=models.CASCADE, related_name='campsites')
@@ -0,0 +1,90 @@
+""" The notifier plugin interface.
+
+A notifier is chosen with a spec string, "name" or "name:target":
+
+    pushover                      Pushover, credentials from PUSHOVER_USER_KEY/PUSHOVER_API_TOKEN
+    webhook:https://host/hook     POST a JSON body to a URL
+    smtp:me@example.com,you@x.org  Email, server settings from CAMPQUEST_SMTP_*
+    file:hits.log                 Append to a file
+    stdout                        Print
+
+Other backends can be added with register().
+"""
+import importlib
+
+# name -> (module:class, whether the spec needs a target)
+NOTIFIERS = {
+    "pushover": ("camp.notifiers.pushover:PushoverNotifier", False),
+    "webhook": ("camp.notifiers.webhook:WebhookNotifier", True),
+    "smtp": ("camp.notifiers.smtp:SmtpNotifier", True),
+    "file": ("camp.notifiers.file:FileNotifier", True),
+    "stdout": ("camp.notifiers.file:StdoutNotifier", False),
+}
+
+
+class Notifier:
+    """ Delivers a message somewhere. Instances are used from worker threads. """
+
+    name = None
+
+    def __init__(self, target=None):
+        self.target = target
+
+    def send(self, message, title):
+        """ Deliver a message.
+
+        Args:
+            message: The message.
+            title: The title or subject.
+
+        Returns:
+            bool: True if the message was delivered, False if it was skipped.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __repr__(self):
+        return "{}({})".format(self.name, self.target or "")
+
+
+def register(name, path, requires_target=False):
+    """ Add a notifier backend.
+
+    Args:
+        name: The name used in specs.
+        path: The class as "module:Class", imported when first used.
+        requires_target: Whether specs must name a target. Defaults to False.
+    """
+    NOTIFIERS[name] = (path, requires_target)
+
+
+def check_spec(spec):
+    """ Validate a spec without importing the backend.
+
+    Returns:
+        tuple: The name and the target, or None.
+    """
+    name, _, target = str(spec).partition(":")
+    if name not in NOTIFIERS:
+        raise ValueError("Unknown notifier {!r}, choose from {}".format(
+            name, ", ".join(sorted(NOTIFIERS))))
+    if NOTIFIERS[name][1] and not target:
+        raise ValueError("The {} notifier needs a target, e.g. {}:...".format(name, name))
+    return name, target or None
+
+
+def get_notifier(spec):
+    """ Build the notifier of a spec, importing its backend.
+
+    Args:
+        spec: The spec, e.g. "pushover" or "webhook:https://example.com/hook".
+
+    Returns:
+        Notifier: The notifier.
+    """
+    name, target = check_spec(spec)
+    module_name, class_name = NOTIFIERS[name][0].split(":")
+    cls = getattr(importlib.import_module(module_name), class_name)
+    return cls(target)
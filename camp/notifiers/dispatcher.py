@@ -0,0 +1,88 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from camp.notifiers.base import get_notifier
+
+LOG = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """ Delivers notifications off the polling loop.
+
+    submit() only queues the message. A coalescing thread merges messages
+    submitted within `window` seconds of the first one into one, so a burst
+    of openings costs one notification, and hands it to every notifier on a
+    worker pool, so a slow backend never delays the searches or the other
+    backends.
+    """
+
+    def __init__(self, notifiers, window=2.0, title="CampQuest", workers=4):
+        self.notifiers = [get_notifier(n) if isinstance(n, str) else n for n in notifiers]
+        self.window = window
+        self.title = title
+        self.sent = Counter()
+        self.failed = Counter()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notifier")
+        self._thread = threading.Thread(target=self._run, name="notifier-coalescer", daemon=True)
+        self._thread.start()
+
+    def submit(self, message, title=None):
+        """ Queue a message, returns immediately. """
+        self._queue.put((message, title))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            stop = False
+            while True:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._dispatch(batch)
+            if stop:
+                return
+
+    def _dispatch(self, batch):
+        if len(batch) == 1:
+            message, title = batch[0]
+            title = title or self.title
+        else:
+            message = "\n\n".join(message for message, _ in batch)
+            title = "{} ({} updates)".format(self.title, len(batch))
+        for notifier in self.notifiers:
+            self._pool.submit(self._deliver, notifier, message, title, len(batch))
+
+    def _deliver(self, notifier, message, title, merged):
+        try:
+            delivered = notifier.send(message, title)
+        except Exception:
+            LOG.exception("Notifier %r failed", notifier)
+            delivered = False
+        with self._lock:
+            (self.sent if delivered else self.failed)[notifier.name] += 1
+        if delivered:
+            LOG.info("Notification sent with %r, %s message(s) merged", notifier, merged)
+
+    def close(self, timeout=None):
+        """ Deliver what is queued, then stop the workers and close the notifiers. """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._pool.shutdown(wait=True)
+        for notifier in self.notifiers:
+            notifier.close()
@@ -0,0 +1,37 @@
+import sys
+import threading
+from datetime import datetime
+
+from camp.notifiers.base import Notifier
+
+
+class FileNotifier(Notifier):
+    """ Appends each message to a file, with a timestamped title line. """
+
+    name = "file"
+
+    def __init__(self, target):
+        super().__init__(target)
+        self._lock = threading.Lock()
+
+    def format(self, message, title):
+        return "[{}] {}\n{}\n\n".format(
+            datetime.now().isoformat(timespec="seconds"), title, message)
+
+    def send(self, message, title):
+        with self._lock, open(self.target, "a", encoding="utf-8") as f:
+            f.write(self.format(message, title))
+        return True
+
+
+class StdoutNotifier(FileNotifier):
+    name = "stdout"
+
+    def __init__(self, target=None):
+        super().__init__(target)
+
+    def send(self, message, title):
+        with self._lock:
+            sys.stdout.write(self.format(message, title))
+            sys.stdout.flush()
+        return True
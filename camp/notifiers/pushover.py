@@ -0,0 +1,160 @@
+""" Pushover, credentials from PUSHOVER_USER_KEY and PUSHOVER_API_TOKEN (or .env). """
+import http.client
+import logging
+import os
+import threading
+import time
+import urllib.parse
+
+from dotenv import load_dotenv
+
+from camp.notifiers.base import Notifier
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.pushover.net"
+MESSAGES_PATH = "/1/messages.json"
+# Pushover rejects longer messages.
+MAX_MESSAGE_LENGTH = 1024
+
+_credentials = None
+
+
+def fit_message(message, limit=MAX_MESSAGE_LENGTH):
+    """Fit a message in Pushover's limit without silently dropping updates.
+
+    The dispatcher joins coalesced updates with blank lines. Whole updates
+    are kept while they fit and the rest are counted in a last
+    "+N more updates" line; an update longer than the limit on its own is cut.
+    """
+    if len(message) <= limit:
+        return message
+    updates = message.split("\n\n")
+
+    def more(dropped):
+        return "+{} more update{}".format(dropped, "" if dropped == 1 else "s")
+
+    for kept in range(len(updates) - 1, 0, -1):
+        fitted = "\n\n".join(updates[:kept] + [more(len(updates) - kept)])
+        if len(fitted) <= limit:
+            return fitted
+    tail = "\n\n" + more(len(updates) - 1) if len(updates) > 1 else ""
+    return updates[0][:limit - len(tail) - 3] + "..." + tail
+
+
+def get_credentials():
+    """Read user_key and api_token from the environment, loading .env on first use."""
+    global _credentials
+    if _credentials is None:
+        load_dotenv()
+        _credentials = (os.getenv("PUSHOVER_USER_KEY"),
+                        os.getenv("PUSHOVER_API_TOKEN"))
+    user_key, api_token = _credentials
+    if not api_token or not user_key:
+        LOG.error(
+            "PUSHOVER_USER_KEY and PUSHOVER_API_TOKEN environment variables must be set.")
+        raise ValueError(
+            "PUSHOVER_USER_KEY and PUSHOVER_API_TOKEN environment variables must be set.")
+    return user_key, api_token
+
+
+class PushoverClient:
+    """Sends messages over one kept-alive connection and tracks the app quota.
+
+    Every response to /1/messages.json carries the X-Limit-App-* headers, so
+    the remaining quota is known without polling limits.json.
+    """
+
+    def __init__(self, base_url=None, timeout=10):
+        # Point the client at another server, e.g. a local test server.
+        self.base_url = (base_url or os.environ.get(
+            "CAMPQUEST_PUSHOVER_URL", DEFAULT_BASE_URL)).rstrip("/")
+        self.timeout = timeout
+        self.quota = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        url = urllib.parse.urlsplit(self.base_url)
+        if url.scheme == "http":
+            return http.client.HTTPConnection(url.netloc, timeout=self.timeout)
+        return http.client.HTTPSConnection(url.netloc, timeout=self.timeout)
+
+    def _post(self, body):
+        if self._conn is None:
+            self._conn = self._connect()
+        self._conn.request(
+            "POST", MESSAGES_PATH, body,
+            {"Content-type": "application/x-www-form-urlencoded"}
+        )
+        response = self._conn.getresponse()
+        response.read()
+        if response.will_close:
+            self.close()
+        return response
+
+    def send(self, message, title="CampQuest Notification"):
+        """Send a message, reconnecting once if the kept-alive connection was dropped.
+
+        Returns:
+            tuple: The HTTP status and reason.
+        """
+        user_key, api_token = get_credentials()
+        body = urllib.parse.urlencode({
+            "token": api_token,
+            "user": user_key,
+            "message": fit_message(message),
+            "title": title,
+        })
+        with self._lock:
+            try:
+                response = self._post(body)
+            except (http.client.HTTPException, OSError):
+                self.close()
+                response = self._post(body)
+        self._update_quota(response)
+        if response.status != 200:
+            LOG.error("Pushover returned %s %s", response.status, response.reason)
+        return response.status, response.reason
+
+    def _update_quota(self, response):
+        limit = response.getheader("X-Limit-App-Limit")
+        remaining = response.getheader("X-Limit-App-Remaining")
+        reset = response.getheader("X-Limit-App-Reset")
+        if remaining is not None:
+            self.quota = {
+                "limit": int(limit) if limit else None,
+                "remaining": int(remaining),
+                "reset": int(reset) if reset else None,
+            }
+
+    def quota_exhausted(self):
+        return (self.quota is not None and self.quota["remaining"] <= 0
+                and (self.quota["reset"] or 0) > time.time())
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class PushoverNotifier(Notifier):
+    """ Sends with a PushoverClient, skipping messages once the quota is used up. """
+
+    name = "pushover"
+
+    def __init__(self, target=None, client=None):
+        super().__init__(target)
+        self.client = client or PushoverClient(target)
+
+    def send(self, message, title):
+        if self.client.quota_exhausted():
+            LOG.warning("Pushover quota used up until %s, dropping: %s",
+                        self.client.quota["reset"], title)
+            return False
+        status, reason = self.client.send(message, title)
+        LOG.info("Pushover answered %s %s, quota: %s", status, reason, self.client.quota)
+        return status == 200
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,42 @@
+import os
+import smtplib
+from email.message import EmailMessage
+
+from camp.notifiers.base import Notifier
+
+
+class SmtpNotifier(Notifier):
+    """ Emails each message to a comma separated list of addresses.
+
+    The server comes from CAMPQUEST_SMTP_HOST (default localhost),
+    CAMPQUEST_SMTP_PORT (default 25), CAMPQUEST_SMTP_USER,
+    CAMPQUEST_SMTP_PASSWORD, CAMPQUEST_SMTP_FROM and CAMPQUEST_SMTP_STARTTLS.
+    Try it with a local debug server, e.g. `python -m aiosmtpd -n -l localhost:1025`.
+    """
+
+    name = "smtp"
+
+    def __init__(self, target, host=None, port=None, timeout=10):
+        super().__init__(target)
+        self.recipients = [address.strip() for address in target.split(",") if address.strip()]
+        self.host = host or os.environ.get("CAMPQUEST_SMTP_HOST", "localhost")
+        self.port = int(port or os.environ.get("CAMPQUEST_SMTP_PORT", 25))
+        self.user = os.environ.get("CAMPQUEST_SMTP_USER")
+        self.password = os.environ.get("CAMPQUEST_SMTP_PASSWORD")
+        self.sender = os.environ.get("CAMPQUEST_SMTP_FROM", "campquest@localhost")
+        self.starttls = os.environ.get("CAMPQUEST_SMTP_STARTTLS", "").lower() in ("1", "true", "yes")
+        self.timeout = timeout
+
+    def send(self, message, title):
+        email = EmailMessage()
+        email["Subject"] = title
+        email["From"] = self.sender
+        email["To"] = ", ".join(self.recipients)
+        email.set_content(message)
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password or "")
+            smtp.send_message(email)
+        return True
@@ -0,0 +1,30 @@
+import requests
+
+from camp.notifiers.base import Notifier
+
+
+class WebhookNotifier(Notifier):
+    """ POSTs {"title", "message", "source"} as JSON to a URL.
+
+    Works with anything that accepts a JSON webhook, e.g. a chat integration
+    or a home automation endpoint.
+    """
+
+    name = "webhook"
+
+    def __init__(self, target, timeout=10):
+        super().__init__(target)
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send(self, message, title):
+        resp = self.session.post(
+            self.target,
+            json={"title": title, "message": message, "source": "campquest"},
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        return True
+
+    def close(self):
+        self.session.close()
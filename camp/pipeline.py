@@ -0,0 +1,250 @@
+""" A staged search: fetch, then decode and evaluate, then output.
+
+check_park does everything in turn for one park, so the CPU idles while a
+response is on the way and the network idles while a payload is parsed.
+The pipeline overlaps the stages across parks:
+
+- fetch: threads download the raw month payloads and the park name,
+- evaluate: a process pool decodes the JSON and finds the windows, so big
+  sweeps use every core; the workers get raw JSON and send back the
+  metrics they recorded,
+- output: the caller iterates the results as they complete.
+
+The stages are connected by bounded queues. A fetcher blocks when the
+evaluate stage is behind, and nothing new is evaluated while the caller has
+not consumed enough results, so memory stays flat however many parks are
+swept.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from camp import metrics
+from camp.clients import breaker
+from camp.engine import _collapse_availability, get_num_available_sites, month_starts
+
+LOG = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def evaluate_park(payloads, search, allowed_site_ids=None):
+    """ Decode the month payloads of a park and find the available windows.
+
+    Runs in the evaluate stage, possibly in another process, so it only
+    takes picklable arguments.
+
+    Args:
+        payloads: The month payloads, raw JSON bytes or already decoded.
+        search: The search parameters, see Pipeline.
+        allowed_site_ids: The campsite IDs left by the query planner, or None to keep all. Defaults to None.
+
+    Returns:
+        tuple: The number of available sites, the maximum number of sites and the available dates by campsite ID.
+    """
+    with metrics.timer("campquest_parse_seconds", endpoint="availability"):
+        api_data = [json.loads(p) if isinstance(p, (bytes, str)) else p for p in payloads]
+    with metrics.timer("campquest_stage_seconds", stage="filter"):
+        park_information = _collapse_availability(
+            api_data, search["campsite_type"], search["campsite_ids"], search["excluded_site_ids"], allowed_site_ids)
+    with metrics.timer("campquest_stage_seconds", stage="windows"):
+        return get_num_available_sites(
+            park_information, search["start_date"], search["end_date"], nights=search["nights"],
+            weekends_only=search["weekends_only"],
+        )
+
+
+def evaluate_park_in_process(payloads, search, allowed_site_ids=None):
+    """ evaluate_park in a worker process, returning the metrics it recorded for the parent to merge.
+
+    Returns:
+        tuple: The evaluate_park tuple and a metrics snapshot.
+    """
+    # A pool process runs many parks, each sends back only its own metrics.
+    metrics.REGISTRY.reset()
+    return evaluate_park(payloads, search, allowed_site_ids), metrics.REGISTRY.snapshot()
+
+
+class Pipeline:
+    """ Checks many recreation.gov parks with the fetch, evaluate and output stages overlapped.
+
+    Args:
+        start_date: The start date.
+        end_date: The end date.
+        campsite_type: The campsite type. Defaults to None.
+        campsite_ids: The campsite IDs. Defaults to ().
+        nights: The number of nights. Defaults to None.
+        weekends_only: Whether to include only weekends. Defaults to False.
+        excluded_site_ids: The campsite IDs to exclude. Defaults to ().
+        fetch: Called with (park_id, month_date) to get a month payload, raw or decoded. Decoded payloads are encoded
+            again for the evaluate processes. Defaults to RecreationClient.get_availability_raw.
+        fetch_workers: The number of fetch threads. Defaults to 8.
+        cpu_workers: The number of evaluate processes, 0 evaluates on a thread of this process. Defaults to the number of cores.
+        queue_size: How many fetched parks may wait for the evaluate stage. Defaults to twice the evaluate workers.
+    """
+
+    def __init__(
+        self, start_date, end_date, campsite_type=None, campsite_ids=(), nights=None, weekends_only=False,
+        excluded_site_ids=(), fetch=None, fetch_workers=8, cpu_workers=None, queue_size=None,
+    ):
+        self.search = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "campsite_type": campsite_type,
+            "campsite_ids": tuple(campsite_ids),
+            "nights": nights,
+            "weekends_only": weekends_only,
+            "excluded_site_ids": list(excluded_site_ids),
+        }
+        self.months = month_starts(start_date, end_date)
+        self.fetch = fetch
+        self.fetch_workers = fetch_workers
+        if cpu_workers is None:
+            cpu_workers = os.cpu_count() or 1
+        self.in_processes = bool(cpu_workers)
+        if cpu_workers:
+            # Forking a process that runs threads can copy a held lock, spawn starts clean.
+            self.executor = ProcessPoolExecutor(cpu_workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            self.executor = ThreadPoolExecutor(1, thread_name_prefix="pipeline-evaluate")
+        self.queue_size = queue_size or 2 * max(cpu_workers, 1)
+
+    def _fetch_park(self, park_id):
+        from camp.clients.recreation_client import RecreationClient
+
+        fetch = self.fetch or RecreationClient.get_availability_raw
+        with metrics.timer("campquest_stage_seconds", stage="fetch", park=str(park_id)):
+            payloads = [fetch(park_id, month_date) for month_date in self.months]
+            if self.in_processes:
+                # The pool gets raw JSON: bytes pickle in one copy, a decoded month is rebuilt object by object.
+                # A fetch answering from a cache, e.g. AvailabilityCache.get, hands back decoded payloads.
+                payloads = [p if isinstance(p, (bytes, str)) else json.dumps(p, separators=(",", ":")).encode()
+                            for p in payloads]
+        return payloads, RecreationClient.get_park_name(park_id)
+
+    def run(self, parks, allowed_site_ids_by_park=None, keep_going=False):
+        """ Check parks, yielding each result as soon as it is ready.
+
+        A failed park raises when its result comes up, after the other
+        stages were stopped. A park that timed out, missed the sweep
+        deadline or has an open circuit is yielded with its error instead,
+        and so is every failed park with keep_going.
+
+        Args:
+            parks: The park IDs.
+            allowed_site_ids_by_park: The campsite IDs left by the query planner by park ID. Defaults to None.
+            keep_going: Whether to yield the error of a failed park rather than raise it. Defaults to False.
+
+        Yields:
+            tuple: The park ID and the check_park tuple, or the error if the park was skipped.
+        """
+        allowed_site_ids_by_park = allowed_site_ids_by_park or {}
+        jobs = queue.Queue()
+        for park_id in parks:
+            jobs.put(park_id)
+        fetched = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue()
+        # Parks evaluated or evaluating but not yet taken by the caller.
+        in_flight = threading.BoundedSemaphore(self.queue_size)
+        stop = threading.Event()
+        fetchers = max(min(self.fetch_workers, len(parks)), 1)
+
+        def put(q, item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def fetcher():
+            while not stop.is_set():
+                try:
+                    park_id = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    put(fetched, (park_id, self._fetch_park(park_id), None))
+                except Exception as e:
+                    put(fetched, (park_id, None, e))
+            put(fetched, _DONE)
+
+        def submitter():
+            done = 0
+            pending = set()
+            lock = threading.Lock()
+
+            def finished(future, park_id, park_name):
+                try:
+                    result = future.result()
+                    if self.in_processes:
+                        result, worker_metrics = result
+                        metrics.REGISTRY.merge(worker_metrics)
+                    current, maximum, availabilities = result
+                    results.put((park_id, (current, maximum, availabilities, park_name), None))
+                except Exception as e:
+                    results.put((park_id, None, e))
+                with lock:
+                    pending.discard(future)
+
+            while done < fetchers:
+                try:
+                    item = fetched.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        return
+                    continue
+                if item is _DONE:
+                    done += 1
+                    continue
+                # Every result holds a slot until the caller takes it.
+                while not in_flight.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                park_id, fetched_park, error = item
+                if error is not None:
+                    results.put((park_id, None, error))
+                    continue
+                payloads, park_name = fetched_park
+                future = self.executor.submit(
+                    evaluate_park_in_process if self.in_processes else evaluate_park,
+                    payloads, self.search, allowed_site_ids_by_park.get(park_id))
+                with lock:
+                    pending.add(future)
+                future.add_done_callback(
+                    lambda future, park_id=park_id, park_name=park_name: finished(future, park_id, park_name))
+            while not stop.is_set():
+                with lock:
+                    if not pending:
+                        break
+                stop.wait(0.01)
+            results.put(_DONE)
+
+        threads = [threading.Thread(target=fetcher, name="pipeline-fetch", daemon=True) for _ in range(fetchers)]
+        threads.append(threading.Thread(target=submitter, name="pipeline-submit", daemon=True))
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                in_flight.release()
+                park_id, info, error = item
+                if error is not None:
+                    if not (keep_going or breaker.is_skipped(error)):
+                        raise error
+                    # Timed out, past the sweep deadline or failing, the caller reports it and moves on.
+                    LOG.info("Park %s skipped: %s", park_id, error)
+                    info = error
+                yield park_id, info
+        finally:
+            # The threads see the flag within a tenth of a second and exit.
+            stop.set()
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
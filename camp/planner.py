@@ -0,0 +1,147 @@
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from camp import metrics
+from camp.engine import month_starts
+
+LOG = logging.getLogger(__name__)
+
+
+@dataclass
+class ParkPlan:
+    park_id: int
+    # Sites worth processing after the fetch, None when the park is not in the site index or no filter narrowed it.
+    allowed_site_ids: Optional[Set[str]] = None
+    pruned_reason: Optional[str] = None
+
+    @property
+    def pruned(self) -> bool:
+        return self.pruned_reason is not None
+
+
+def plan_park(
+    park_id, site_index, campsite_type=None, campsite_ids=(), excluded_site_ids=(), accessible_only=False,
+):
+    """ Decide from the local site index whether a park is worth fetching.
+
+    Args:
+        park_id: The park ID.
+        site_index: The local campsite metadata, or None.
+        campsite_type: The campsite type. Defaults to None.
+        campsite_ids: The campsite IDs to search for. Defaults to ().
+        excluded_site_ids: The campsite IDs to exclude. Defaults to ().
+        accessible_only: Whether to include only accessible sites. Defaults to False.
+
+    Returns:
+        ParkPlan: The plan, with the reason if the park can be skipped.
+    """
+    if site_index is None or not site_index.has_facility(park_id):
+        return ParkPlan(park_id)
+
+    indexed_sites = set(site_index.for_facility(park_id))
+    sites = set(indexed_sites)
+
+    if campsite_ids:
+        sites &= {str(i) for i in campsite_ids}
+        if not sites:
+            return ParkPlan(park_id, set(), "none of the requested campsite IDs are in this park")
+
+    if campsite_type:
+        sites &= site_index.filter_sites(park_id, campsite_type=campsite_type)
+        if not sites:
+            return ParkPlan(park_id, set(), "no {} sites".format(campsite_type))
+
+    if accessible_only:
+        sites &= site_index.filter_sites(park_id, accessible_only=True)
+        if not sites:
+            return ParkPlan(park_id, set(), "no accessible sites")
+
+    if excluded_site_ids:
+        sites -= {str(i) for i in excluded_site_ids}
+        if not sites:
+            return ParkPlan(park_id, set(), "every matching site is excluded")
+
+    # Without a filter that narrowed the sites, live sites missing from a stale
+    # index are kept. Accessibility is only known from the index, so it always restricts.
+    if sites == indexed_sites and not accessible_only:
+        return ParkPlan(park_id)
+    return ParkPlan(park_id, sites)
+
+
+def plan_parks(parks, site_index, **filters) -> Tuple[List[ParkPlan], Dict[int, str]]:
+    """ Plan a list of parks, splitting the ones to fetch from the pruned ones.
+
+    Args:
+        parks: The park IDs.
+        site_index: The local campsite metadata, or None.
+        **filters: The filters accepted by plan_park.
+
+    Returns:
+        tuple: The plans of the parks to fetch, and the pruning reason by park ID.
+    """
+    to_fetch = []
+    pruned = {}
+    for park_id in parks:
+        plan = plan_park(park_id, site_index, **filters)
+        if plan.pruned:
+            LOG.info("Skipping park %s: %s", park_id, plan.pruned_reason)
+            pruned[park_id] = plan.pruned_reason
+        else:
+            to_fetch.append(plan)
+    return to_fetch, pruned
+
+
+class FetchPlan:
+    """ The (park, month) payloads needed by every search of a cycle.
+
+    Searches add the parks and date ranges they cover, fetch_all requests
+    each distinct (park, month) once, and get serves the shared payloads as
+    the fetch argument of check_park. Upstream requests grow with the number
+    of distinct parks and months, not with the number of searches.
+    """
+
+    def __init__(self, fetch):
+        self.fetch = fetch
+        self.months = defaultdict(set)
+        self.payloads = {}
+        self.failed = {}
+        self.requested = 0
+
+    @staticmethod
+    def _key(park_id, month_date):
+        return str(park_id), month_date.year, month_date.month
+
+    def add(self, park_id, start_date, end_date):
+        """ Add the months a search of one park needs. """
+        for month_date in month_starts(start_date, end_date):
+            self.requested += 1
+            self.months[str(park_id)].add(month_date)
+
+    def __len__(self):
+        return sum(len(months) for months in self.months.values())
+
+    def fetch_all(self):
+        """ Fetch every planned (park, month) once. A failed park is not retried by its searches this cycle. """
+        planned = len(self)
+        if self.requested > planned:
+            metrics.inc("campquest_fetches_deduplicated_total", self.requested - planned)
+        LOG.info("Fetch plan: %s park month(s) for %s requested", planned, self.requested)
+        for park_id, months in sorted(self.months.items()):
+            for month_date in sorted(months):
+                try:
+                    self.payloads[self._key(park_id, month_date)] = self.fetch(park_id, month_date)
+                except Exception as e:
+                    LOG.warning("Prefetch of park %s for %s failed: %s",
+                                park_id, month_date.strftime("%Y-%m"), e)
+                    self.failed[park_id] = e
+                    break
+
+    def get(self, park_id, month_date):
+        if str(park_id) in self.failed:
+            raise self.failed[str(park_id)]
+        payload = self.payloads.get(self._key(park_id, month_date))
+        if payload is None:
+            payload = self.payloads[self._key(park_id, month_date)] = self.fetch(park_id, month_date)
+        return payload
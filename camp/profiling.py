@@ -0,0 +1,149 @@
+""" Profiling for cli.py --profile.
+
+A search runs under cProfile while a sampling thread records the main
+thread's stack every few milliseconds. The report splits the time into
+network wait (frames inside socket, ssl, select or the HTTP libraries) and
+CPU time, lists the hottest functions, and can write a .pstats file or a
+collapsed-stack file for flamegraph tools.
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+# Modules whose frames mean the process is waiting on the network.
+NETWORK_MODULES = ("socket", "ssl", "select", "http/client",
+                   "urllib3", "requests", "asyncio")
+# Names of the C functions behind them, as cProfile reports built-ins.
+NETWORK_BUILTINS = ("_socket", "_ssl", "select")
+
+
+def _is_network(filename, name=""):
+    path = filename.replace("\\", "/")
+    if any("/{}".format(module) in path for module in NETWORK_MODULES):
+        return True
+    return filename == "~" and any(builtin in name for builtin in NETWORK_BUILTINS)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return "{}:{}".format(os.path.basename(code.co_filename), code.co_name)
+
+
+class StackSampler(threading.Thread):
+    """ Samples the stack of one thread at a fixed interval. """
+
+    def __init__(self, thread_id, interval=0.005):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.network_samples = 0
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            network = False
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                network = network or _is_network(frame.f_code.co_filename)
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            self.network_samples += network
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write_collapsed(self, path):
+        """ Write the samples as collapsed stacks (flamegraph.pl, speedscope). """
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, samples in self.stacks.most_common():
+                f.write("{} {}\n".format(stack, samples))
+
+
+class ProfileReport:
+    def __init__(self, profile, sampler, wall_seconds, cpu_seconds):
+        self.profile = profile
+        self.sampler = sampler
+        self.wall_seconds = wall_seconds
+        self.cpu_seconds = cpu_seconds
+
+    @property
+    def network_seconds(self):
+        if self.sampler.samples:
+            return self.wall_seconds * self.sampler.network_samples / self.sampler.samples
+        return max(self.wall_seconds - self.cpu_seconds, 0.0)
+
+    def top_functions(self, limit=15):
+        """ Get the functions with the most own time, split by network and CPU.
+
+        Args:
+            limit: The number of functions per group. Defaults to 15.
+
+        Returns:
+            dict: Lists of (own seconds, cumulative seconds, calls, function) under "network" and "cpu".
+        """
+        stats = pstats.Stats(self.profile)
+        groups = {"network": [], "cpu": []}
+        for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+            label = "{}:{}({})".format(os.path.basename(filename), line, name)
+            group = "network" if _is_network(filename, name) else "cpu"
+            groups[group].append((own, cumulative, calls, label))
+        for group in groups.values():
+            group.sort(reverse=True)
+            del group[limit:]
+        return groups
+
+    def render(self, limit=15):
+        out = io.StringIO()
+        out.write("Profile: {:.2f}s wall, {:.2f}s CPU, ~{:.2f}s network wait ({} stack samples)\n".format(
+            self.wall_seconds, self.cpu_seconds, self.network_seconds, self.sampler.samples))
+        for group, title in (("network", "Network wait"), ("cpu", "CPU")):
+            out.write("\n{} - top functions by own time:\n".format(title))
+            out.write("  {:>9} {:>9} {:>8}  {}\n".format("own s", "cum s", "calls", "function"))
+            for own, cumulative, calls, label in self.top_functions(limit)[group]:
+                out.write("  {:>9.3f} {:>9.3f} {:>8}  {}\n".format(own, cumulative, calls, label))
+        return out.getvalue()
+
+    def write(self, path):
+        """ Write the profile, as collapsed stacks for .folded/.collapsed/.txt, else as .pstats. """
+        if os.path.splitext(path)[1] in (".folded", ".collapsed", ".txt"):
+            self.sampler.write_collapsed(path)
+        else:
+            self.profile.dump_stats(path)
+
+
+def profile_call(func, *args, interval=0.005, **kwargs):
+    """ Run a function under cProfile and the stack sampler.
+
+    Args:
+        func: The function to run.
+        *args: The positional arguments.
+        interval: Seconds between stack samples. Defaults to 0.005.
+        **kwargs: The keyword arguments.
+
+    Returns:
+        tuple: The return value of func and the ProfileReport.
+    """
+    profile = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident(), interval)
+    sampler.start()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        result = profile.runcall(func, *args, **kwargs)
+    finally:
+        wall_seconds = time.perf_counter() - wall_start
+        cpu_seconds = time.process_time() - cpu_start
+        sampler.stop()
+    return result, ProfileReport(profile, sampler, wall_seconds, cpu_seconds)
@@ -0,0 +1,227 @@
+""" Sharded polling: several workers split one search's parks.
+
+Workers share a SQLite file in WAL mode, no other service is needed:
+
+- each worker heartbeats into the workers table,
+- the parks are split over the live workers by consistent hashing, so a
+  worker joining or dying only moves its share of the parks,
+- a worker leases a park while checking it, so two workers never poll the
+  same park while the ring changes; the lease is released once the result
+  is published, and the leases of a dead worker expire,
+- results are published per park and merged into one view.
+
+Run the same search with the same --shard-db on every worker, e.g. one per
+egress IP, and read the merged view with --show-shards.
+"""
+import bisect
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+
+from camp.state import fingerprint
+
+LOG = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workers (
+    scope TEXT NOT NULL,
+    worker_id TEXT NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    started_at REAL NOT NULL,
+    PRIMARY KEY (scope, worker_id)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    scope TEXT NOT NULL,
+    park_id TEXT NOT NULL,
+    worker_id TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (scope, park_id)
+);
+CREATE TABLE IF NOT EXISTS results (
+    scope TEXT NOT NULL,
+    park_id TEXT NOT NULL,
+    worker_id TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    fingerprint TEXT NOT NULL,
+    info TEXT NOT NULL,
+    PRIMARY KEY (scope, park_id)
+);
+"""
+
+
+def default_worker_id():
+    return "{}-{}".format(socket.gethostname(), os.getpid())
+
+
+def _hash(value):
+    return int(hashlib.md5(str(value).encode()).hexdigest()[:16], 16)
+
+
+class HashRing:
+    """ Consistent hashing of park IDs onto workers. """
+
+    def __init__(self, workers, replicas=64):
+        self.ring = sorted(
+            (_hash("{}#{}".format(worker, i)), worker)
+            for worker in workers for i in range(replicas)
+        )
+        self.keys = [key for key, _ in self.ring]
+
+    def owner(self, park_id):
+        if not self.ring:
+            return None
+        index = bisect.bisect(self.keys, _hash(park_id)) % len(self.ring)
+        return self.ring[index][1]
+
+
+def connect(path):
+    db = sqlite3.connect(path, timeout=30, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA busy_timeout=30000")
+    db.executescript(SCHEMA)
+    return db
+
+
+def _decode_info(info):
+    current, maximum, availabilities, park_name = json.loads(info)
+    return current, maximum, {int(site): dates for site, dates in availabilities.items()}, park_name
+
+
+class ShardWorker:
+    """ One worker of a sharded search.
+
+    Args:
+        path: The shared SQLite file.
+        scope: The search, see camp.state.search_scope. Workers only coordinate within a scope.
+        parks: Every park ID of the search.
+        check: Called with a park ID, returns the check_park tuple.
+        worker_id: The name of this worker. Defaults to host-pid.
+        lease_seconds: How long a lease and a heartbeat stay valid. Defaults to 60.
+        clock: The wall clock. Defaults to time.time.
+    """
+
+    def __init__(self, path, scope, parks, check, worker_id=None, lease_seconds=60, clock=time.time):
+        self.db = connect(path)
+        self.scope = scope
+        self.parks = list(parks)
+        self.check = check
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self.started_at = clock()
+
+    def heartbeat(self):
+        self.db.execute(
+            "INSERT OR REPLACE INTO workers (scope, worker_id, heartbeat_at, started_at) VALUES (?, ?, ?, ?)",
+            (self.scope, self.worker_id, self.clock(), self.started_at),
+        )
+
+    def live_workers(self):
+        rows = self.db.execute(
+            "SELECT worker_id FROM workers WHERE scope = ? AND heartbeat_at >= ?",
+            (self.scope, self.clock() - self.lease_seconds),
+        ).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def owned_parks(self):
+        ring = HashRing(self.live_workers())
+        return [park_id for park_id in self.parks if ring.owner(park_id) == self.worker_id]
+
+    def acquire(self, park_id):
+        """ Take or renew the lease of a park, unless another worker holds a valid one. """
+        now = self.clock()
+        cursor = self.db.execute(
+            "INSERT INTO leases (scope, park_id, worker_id, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (scope, park_id) DO UPDATE SET worker_id = excluded.worker_id, "
+            "expires_at = excluded.expires_at "
+            "WHERE leases.worker_id = excluded.worker_id OR leases.expires_at < ?",
+            (self.scope, str(park_id), self.worker_id, now + self.lease_seconds, now),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, park_id):
+        """ Give up the lease of a park, so its next owner on the ring need not wait for it to expire. """
+        self.db.execute(
+            "DELETE FROM leases WHERE scope = ? AND park_id = ? AND worker_id = ?",
+            (self.scope, str(park_id), self.worker_id),
+        )
+
+    def publish(self, park_id, info):
+        """ Store the result of a park.
+
+        Returns:
+            bool: True if the availability changed since the last result of any worker.
+        """
+        current, maximum, availabilities, park_name = info
+        new = fingerprint(availabilities)
+        rows = self.db.execute(
+            "SELECT fingerprint FROM results WHERE scope = ? AND park_id = ?", (self.scope, str(park_id)),
+        ).fetchall()
+        self.db.execute(
+            "INSERT OR REPLACE INTO results (scope, park_id, worker_id, checked_at, fingerprint, info) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (self.scope, str(park_id), self.worker_id, self.clock(), new,
+             json.dumps([current, maximum, availabilities, park_name])),
+        )
+        return not rows or rows[0][0] != new
+
+    def run_cycle(self):
+        """ Heartbeat, then check every park this worker owns and can lease.
+
+        Returns:
+            list: (park ID, check_park tuple, changed) for each checked park.
+        """
+        self.heartbeat()
+        checked = []
+        for park_id in self.owned_parks():
+            if not self.acquire(park_id):
+                LOG.info("Park %s is still leased by another worker", park_id)
+                continue
+            try:
+                info = self.check(park_id)
+                checked.append((park_id, info, self.publish(park_id, info)))
+            except Exception:
+                LOG.exception("Checking park %s failed", park_id)
+                continue
+            finally:
+                self.release(park_id)
+            # Long cycles keep the heartbeat fresh.
+            self.heartbeat()
+        return checked
+
+    def stop(self):
+        """ Leave the ring and release the leases, so the other workers take over at once. """
+        self.db.execute("DELETE FROM workers WHERE scope = ? AND worker_id = ?", (self.scope, self.worker_id))
+        self.db.execute("DELETE FROM leases WHERE scope = ? AND worker_id = ?", (self.scope, self.worker_id))
+        self.db.close()
+
+
+def merged_view(path, scope, lease_seconds=60, clock=time.time):
+    """ Read the latest result of every park of a sharded search.
+
+    Returns:
+        tuple: The check_park tuples by park ID, the checking worker and time by park ID, and the live workers.
+    """
+    db = connect(path)
+    try:
+        rows = db.execute(
+            "SELECT park_id, worker_id, checked_at, info FROM results WHERE scope = ? ORDER BY park_id",
+            (scope,),
+        ).fetchall()
+        workers = db.execute(
+            "SELECT worker_id FROM workers WHERE scope = ? AND heartbeat_at >= ? ORDER BY worker_id",
+            (scope, clock() - lease_seconds),
+        ).fetchall()
+    finally:
+        db.close()
+    info_by_park_id = {}
+    checked_by = {}
+    for park_id, worker_id, checked_at, info in rows:
+        key = int(park_id) if park_id.isdigit() else park_id
+        info_by_park_id[key] = _decode_info(info)
+        checked_by[key] = (worker_id, checked_at)
+    return info_by_park_id, checked_by, [row[0] for row in workers]
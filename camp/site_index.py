@@ -0,0 +1,142 @@
+import json
+import logging
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Optional, Set
+
+LOG = logging.getLogger(__name__)
+
+
+@dataclass
+class SiteMetadata:
+    campsite_id: str
+    facility_id: str
+    name: str
+    campsite_type: str
+    loop: Optional[str] = None
+    accessible: bool = False
+
+    def describe(self) -> str:
+        parts = [self.name]
+        if self.loop:
+            parts.append(f"Loop {self.loop}")
+        if self.campsite_type:
+            parts.append(self.campsite_type)
+        if self.accessible:
+            parts.append("accessible")
+        return ", ".join(p for p in parts if p)
+
+    def to_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+class SiteIndex:
+    """ In-memory campsite metadata keyed by facility (park) and campsite ID.
+
+    It is built from the local Campsite table with one query, or loaded from a
+    JSON export so the CLI can use it without Django.
+    """
+
+    FIELDS = ("campsite_id", "facility_id", "name",
+              "campsite_type", "loop", "accessible")
+
+    def __init__(self, sites: Iterable[SiteMetadata] = ()):
+        self._by_site: Dict[str, SiteMetadata] = {}
+        self._by_facility: Dict[str, Dict[str, SiteMetadata]] = {}
+        for site in sites:
+            self.add(site)
+
+    def __len__(self) -> int:
+        return len(self._by_site)
+
+    def add(self, site: SiteMetadata) -> None:
+        self._by_site[site.campsite_id] = site
+        self._by_facility.setdefault(site.facility_id, {})[
+            site.campsite_id] = site
+
+    def get(self, campsite_id) -> Optional[SiteMetadata]:
+        return self._by_site.get(str(campsite_id))
+
+    def has_facility(self, facility_id) -> bool:
+        return str(facility_id) in self._by_facility
+
+    def for_facility(self, facility_id) -> Dict[str, SiteMetadata]:
+        return self._by_facility.get(str(facility_id), {})
+
+    def filter_sites(
+        self, facility_id, campsite_type=None, accessible_only=False
+    ) -> Optional[Set[str]]:
+        """ Get the campsite IDs of a facility that match the filters.
+
+        Args:
+            facility_id: The facility (park) ID.
+            campsite_type: The campsite type to keep. Defaults to None.
+            accessible_only: Whether to keep only accessible sites. Defaults to False.
+
+        Returns:
+            set: The matching campsite IDs, or None if the facility is not in the index or no filter is given.
+        """
+        if not self.has_facility(facility_id) or not (campsite_type or accessible_only):
+            return None
+        return {
+            site_id
+            for site_id, site in self.for_facility(facility_id).items()
+            if (not campsite_type or site.campsite_type == campsite_type)
+            and (not accessible_only or site.accessible)
+        }
+
+    def metadata_for(self, campsite_ids) -> Dict[str, Dict[str, object]]:
+        """ Get the metadata of the given campsites as plain dictionaries.
+
+        Args:
+            campsite_ids: The campsite IDs to look up.
+
+        Returns:
+            dict: The metadata by campsite ID, for the sites that are in the index.
+        """
+        found = {}
+        for campsite_id in campsite_ids:
+            site = self.get(campsite_id)
+            if site:
+                found[str(campsite_id)] = site.to_dict()
+        return found
+
+    @classmethod
+    def from_db(cls, facility_ids=None, campsite_ids=None) -> "SiteIndex":
+        """ Load the index from the Campsite table with a single query.
+
+        Args:
+            facility_ids: Only load sites of these facilities. Defaults to None.
+            campsite_ids: Only load these sites. Defaults to None.
+
+        Returns:
+            SiteIndex: The loaded index.
+        """
+        from camp.models import Campsite
+
+        queryset = Campsite.objects.all()
+        if facility_ids is not None:
+            queryset = queryset.filter(
+                facility_id__in=[str(i) for i in facility_ids])
+        if campsite_ids is not None:
+            queryset = queryset.filter(
+                campsite_id__in=[str(i) for i in campsite_ids])
+
+        rows = queryset.values_list(
+            "campsite_id", "facility_id", "name", "campsite_type", "loop", "accessible"
+        )
+        return cls(SiteMetadata(*row) for row in rows)
+
+    @classmethod
+    def load(cls, path) -> "SiteIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(
+            SiteMetadata(**{field: row.get(field) for field in cls.FIELDS})
+            for row in data
+        )
+        LOG.info("Loaded %s campsites from site index %s", len(index), path)
+        return index
+
+    def save(self, path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([site.to_dict() for site in self._by_site.values()], f)
@@ -0,0 +1,131 @@
+""" A local checkpoint of what a long running search has learned.
+
+Continuous mode and the watch daemon write their progress to a small
+SQLite file, so a restarted process resumes where it stopped:
+
+- which parks of a search are still without availability,
+- when the next check is due,
+- what availability was last reported for each park, so the same result
+  is not notified twice,
+- the last payload of each park month with its ETag/Last-Modified, so a
+  fresh payload is reused and a stale one is revalidated with a
+  conditional request.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    scope TEXT PRIMARY KEY,
+    remaining TEXT NOT NULL,
+    next_due REAL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen (
+    scope TEXT NOT NULL,
+    park_id TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (scope, park_id)
+);
+CREATE TABLE IF NOT EXISTS months (
+    park_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    payload BLOB NOT NULL,
+    PRIMARY KEY (park_id, month)
+);
+"""
+
+
+def fingerprint(value):
+    """ A short stable hash of a JSON serialisable value. """
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def search_scope(**search):
+    """ Name a search by its parameters, so a changed search does not resume an old one. """
+    return fingerprint(search)
+
+
+class StateStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def load_search(self, scope):
+        """ Get the saved progress of a search.
+
+        Returns:
+            tuple: The remaining park IDs as strings and the wall clock time the next check is due, or None.
+        """
+        rows = self._execute("SELECT remaining, next_due FROM searches WHERE scope = ?", (scope,))
+        if not rows:
+            return None
+        remaining, next_due = rows[0]
+        return set(json.loads(remaining)), next_due
+
+    def save_search(self, scope, remaining, next_due=None):
+        self._execute(
+            "INSERT OR REPLACE INTO searches (scope, remaining, next_due, updated_at) VALUES (?, ?, ?, ?)",
+            (scope, json.dumps(sorted(str(p) for p in remaining)), next_due, time.time()),
+        )
+
+    def seen(self, scope, park_id):
+        """ Get the fingerprint of the availability last reported for a park. """
+        rows = self._execute(
+            "SELECT fingerprint FROM seen WHERE scope = ? AND park_id = ?", (scope, str(park_id)))
+        return rows[0][0] if rows else None
+
+    def mark_seen(self, scope, park_id, value):
+        self._execute(
+            "INSERT OR REPLACE INTO seen (scope, park_id, fingerprint, updated_at) VALUES (?, ?, ?, ?)",
+            (scope, str(park_id), value, time.time()),
+        )
+
+    def load_month(self, park_id, month_date):
+        """ Get the last payload of a park month.
+
+        Returns:
+            tuple: The wall clock time it was fetched, the payload, the ETag and Last-Modified, or None.
+        """
+        rows = self._execute(
+            "SELECT fetched_at, payload, etag, last_modified FROM months WHERE park_id = ? AND month = ?",
+            (str(park_id), month_date.strftime("%Y-%m")),
+        )
+        if not rows:
+            return None
+        fetched_at, payload, etag, last_modified = rows[0]
+        return fetched_at, json.loads(zlib.decompress(payload)), etag, last_modified
+
+    def save_month(self, park_id, month_date, payload, etag=None, last_modified=None, fetched_at=None):
+        self._execute(
+            "INSERT OR REPLACE INTO months (park_id, month, fetched_at, etag, last_modified, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (str(park_id), month_date.strftime("%Y-%m"), fetched_at or time.time(), etag, last_modified,
+             zlib.compress(json.dumps(payload, separators=(",", ":")).encode())),
+        )
+
+    def touch_month(self, park_id, month_date, fetched_at=None):
+        """ Mark a stored payload as fresh after a 304. """
+        self._execute(
+            "UPDATE months SET fetched_at = ? WHERE park_id = ? AND month = ?",
+            (fetched_at or time.time(), str(park_id), month_date.strftime("%Y-%m")),
+        )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,67 @@
+import os
+import unittest
+
+from benchmarks import mock_server
+from camp.clients import reservecalifornia_client
+from camp.clients.breaker import BREAKERS
+from camp.clients.recreation_client import RecreationClient
+
+_django_ready = False
+
+
+class FakeClock:
+    """ A clock for the `clock` and `sleep` arguments: it only moves when slept or set. """
+
+    def __init__(self, now=0.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class MockUpstreamTestCase(unittest.TestCase):
+    """ Runs each test against a fresh benchmarks/mock_server.py, with both clients pointed at it.
+
+    Subclasses set MOCK_CONFIG to the MockConfig fields of their server.
+    """
+
+    MOCK_CONFIG = {}
+
+    def setUp(self):
+        self.server = mock_server.start(mock_server.MockConfig(**self.MOCK_CONFIG))
+        RecreationClient.set_base_url(self.server.url)
+        reservecalifornia_client.set_base_url(self.server.url)
+
+    def tearDown(self):
+        BREAKERS.reset()
+        RecreationClient.set_base_url(None)
+        reservecalifornia_client.set_base_url(None)
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def setup_django():
+    """ Configure Django with the test settings when the tests run outside manage.py test, e.g. under pytest.
+
+    Under manage.py test the runner has already set up the test environment and database.
+    """
+    global _django_ready
+    if _django_ready:
+        return
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "campsitefinder.test_settings")
+
+    import django
+    from django.core.management import call_command
+    from django.test.utils import _TestState, setup_test_environment
+
+    django.setup()
+    if not hasattr(_TestState, "saved_data"):
+        setup_test_environment()
+        call_command("migrate", verbosity=0)
+    _django_ready = True
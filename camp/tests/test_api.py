@@ -0,0 +1,114 @@
+import datetime
+import json
+import unittest
+from unittest import mock
+
+from django.test import TestCase
+
+from camp.tests.helpers import MockUpstreamTestCase, setup_django
+
+
+def setUpModule():
+    setup_django()
+
+
+class TestCatalogApi(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from camp.models import RecreationArea
+
+        for i in range(5):
+            RecreationArea.objects.create(
+                rec_area_id=str(i), name="Area {}".format(i), last_updated_date=datetime.date(2025, 1, i + 1))
+
+    def testParks_Paginates(self):
+        response = self.client.get("/api/parks/", {"page": 2, "page_size": 2})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["count"], body["page"], body["num_pages"]), (5, 2, 3))
+        self.assertEqual([park["id"] for park in body["results"]], ["2", "3"])
+
+    def testParks_KeepsTheRequestedFields(self):
+        body = self.client.get("/api/parks/", {"fields": "id,name", "page_size": 1}).json()
+        self.assertEqual(body["results"], [{"id": "0", "name": "Area 0"}])
+
+        response = self.client.get("/api/parks/", {"fields": "id,nope"})
+        self.assertEqual(response.status_code, 400)
+
+    def testParks_NotModifiedForTheSameETag(self):
+        response = self.client.get("/api/parks/")
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+        etag = response["ETag"]
+
+        response = self.client.get("/api/parks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def testParks_BadPageIsABadRequest(self):
+        for page in ("x", "9"):
+            response = self.client.get("/api/parks/", {"page": page, "page_size": 2})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("page must be", response.json()["error"])
+
+    def testParks_OnlyAnswersGet(self):
+        self.assertEqual(self.client.post("/api/parks/").status_code, 405)
+
+
+class TestAvailabilityApi(MockUpstreamTestCase, TestCase):
+    MOCK_CONFIG = dict(sites=10)
+
+    def get(self, parks, headers=None, **params):
+        return self.client.get("/api/availability/", dict(
+            params, parks=parks, start="2025-06-01", end="2025-06-05", nights=2), headers=headers)
+
+    def testAvailability_PaginatesTheParks(self):
+        response = self.get("232447,232449,232450", page=2, page_size=2, fields="park_id,available")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["count"], body["num_pages"]), (3, 2))
+        self.assertEqual(len(body["results"]), 1)
+        self.assertEqual(set(body["results"][0]), {"park_id", "available"})
+        self.assertEqual(body["results"][0]["park_id"], "232450")
+
+    def testAvailability_NotModifiedForTheSameETag(self):
+        from camp import api
+
+        etag = self.get("232447")["ETag"]
+        # The 304 is answered from the cached months, the search is not evaluated again.
+        with mock.patch.object(api, "check_parks_async") as check_parks_async:
+            response = self.get("232447", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        check_parks_async.assert_not_called()
+
+        # Another query of the same months is another page.
+        self.assertEqual(self.get("232447", headers={"If-None-Match": etag}, weekends_only=1).status_code, 200)
+
+    def testAvailability_PrunesExpiredMonths(self):
+        from camp import api
+
+        api.AVAILABILITY_CACHE.entries[("1", 2025, 1)] = (api.AVAILABILITY_CACHE.clock() - 3600, {})
+        self.get("232447")
+        self.assertNotIn(("1", 2025, 1), api.AVAILABILITY_CACHE.entries)
+
+    def testAvailability_ReportsAFailingParkInItsPlace(self):
+        response = self.get("abc,232447")
+        self.assertEqual(response.status_code, 200)
+        failed, checked = json.loads(response.content)["results"]
+        self.assertEqual(failed["park_id"], "abc")
+        self.assertTrue(failed["error"])
+        self.assertIsNone(failed["available"])
+        self.assertEqual(checked["park_id"], "232447")
+        self.assertIsNone(checked["error"])
+        self.assertEqual(response["Cache-Control"], "public, max-age=0")
+
+    def testAvailability_MissingParksIsABadRequest(self):
+        response = self.client.get("/api/availability/", {"start": "2025-06-01", "end": "2025-06-05"})
+        self.assertEqual(response.status_code, 400)
+
+    def testAvailability_OnlyAnswersGet(self):
+        self.assertEqual(self.client.post("/api/availability/").status_code, 405)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from benchmarks import run
+
+
+class TestBenchmarks(unittest.TestCase):
+    def testRun_CoversPipelineOffline(self):
+        with redirect_stdout(io.StringIO()):
+            results = run.main(
+                ["--sites", "20", "--months", "2", "--repeat", "1", "--no-startup"])
+
+        names = {name.split("/")[1] for name in results["benchmarks"]}
+        self.assertEqual(names, {
+            "get_park_information",
+            "get_num_available_sites",
+            "find_itineraries",
+            "consecutive_nights",
+            "generate_human_output",
+            "generate_json_output",
+            "check_park",
+            "check_park_reserve_california",
+        })
+        self.assertEqual(results["meta"]["scenarios"]["synthetic_20x2"]["sites"], 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import threading
+import unittest
+from datetime import datetime
+
+import requests
+
+from camp.clients import latency
+from camp.clients.breaker import BREAKERS, CLOSED, HALF_OPEN, OPEN, Breakers, CircuitOpen
+from camp.clients.recreation_client import RecreationClient
+from camp.tests.helpers import FakeClock, MockUpstreamTestCase
+
+
+class TestBreakers(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breakers = Breakers(threshold=2, reset_after=10, unknown_ttl=100, clock=self.clock)
+
+    def testHost_OpensOnOutageAndProbesOnceAfterTheReset(self):
+        for _ in range(2):
+            self.breakers.before("host")
+            self.breakers.after("host", status=503)
+        with self.assertRaises(CircuitOpen):
+            self.breakers.before("host")
+
+        self.clock.now = 11
+        self.breakers.before("host")
+        self.assertEqual(self.breakers.states(), {("host", "host"): HALF_OPEN})
+        # Only one probe at a time.
+        with self.assertRaises(CircuitOpen):
+            self.breakers.before("host")
+        self.breakers.after("host", status=503)
+
+        # Failed again: open twice as long.
+        self.clock.now = 22
+        with self.assertRaises(CircuitOpen):
+            self.breakers.before("host")
+        self.clock.now = 32
+        self.breakers.before("host")
+        self.breakers.after("host", status=200)
+        self.assertEqual(self.breakers.states(), {})
+
+    def testPark_ClientErrorsOnlyOpenThePark(self):
+        for _ in range(2):
+            self.breakers.before("host", 7)
+            self.breakers.after("host", 7, status=400)
+        with self.assertRaises(CircuitOpen):
+            self.breakers.before("host", 7)
+        self.breakers.before("host", 8)
+        self.breakers.before("other", 7)
+        self.assertEqual(self.breakers.states(), {("park", "host/7"): OPEN})
+
+    def testUnknownPark_IsSkippedUntilTheTtl(self):
+        self.breakers.before("host", 7)
+        self.breakers.after("host", 7, status=404)
+        with self.assertRaises(CircuitOpen):
+            self.breakers.before("host", 7)
+        self.clock.now = 101
+        self.breakers.before("host", 7)
+        self.breakers.after("host", 7, status=200)
+        self.assertNotIn(("park", "host/7"), self.breakers.states())
+
+    def testUnknownKey_IsRememberedUntilTheTtl(self):
+        self.assertFalse(self.breakers.is_unknown(("rc_search", "nowhere")))
+        self.breakers.mark_unknown(("rc_search", "nowhere"))
+        self.assertTrue(self.breakers.is_unknown(("rc_search", "nowhere")))
+        self.clock.now = 101
+        self.assertFalse(self.breakers.is_unknown(("rc_search", "nowhere")))
+
+    def testPark_RateLimitingOnlyBacksOffTheHost(self):
+        for _ in range(2):
+            self.breakers.before("host", 7)
+            self.breakers.after("host", 7, status=429)
+        self.assertEqual(self.breakers.states(), {("host", "host"): OPEN})
+
+        self.clock.now = 11
+        self.breakers.before("host", 7)
+        self.breakers.after("host", 7, status=200)
+        self.assertEqual(self.breakers.states(), {})
+
+    def testError_PastTheDeadlineIsNotAFailure(self):
+        try:
+            latency.set_deadline(-1)
+            for _ in range(2):
+                self.breakers.before("host", 7)
+                self.breakers.error("host", 7)
+            self.assertEqual(self.breakers.states(), {})
+
+            latency.set_deadline(None)
+            for _ in range(2):
+                self.breakers.before("host", 7)
+                self.breakers.error("host", 7)
+            self.assertEqual(self.breakers.states()[("host", "host")], OPEN)
+        finally:
+            latency.set_deadline(None)
+
+    def testCancel_ReleasesTheProbe(self):
+        for _ in range(2):
+            self.breakers.after("host", status=None)
+        self.clock.now = 11
+        self.breakers.before("host")
+        self.breakers.cancel("host")
+        self.breakers.before("host")
+        self.assertEqual(self.breakers.states()[("host", "host")], HALF_OPEN)
+        self.assertNotEqual(self.breakers.states()[("host", "host")], CLOSED)
+
+
+class TestClientBreaker(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=5, error_rate=1.0)
+
+    def testOutage_StopsSendingRequests(self):
+        for park_id in range(1, 11):
+            with self.assertRaises(RuntimeError):
+                RecreationClient.get_availability(park_id, datetime(2025, 6, 1))
+        # The host breaker opened after 3 failures, the rest failed without a request.
+        self.assertEqual(self.server.stats["by_endpoint"]["availability"], 3)
+
+
+class TestClientBreakerDeadline(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=5, latency_ms=1000)
+
+    def tearDown(self):
+        latency.set_deadline(None)
+        super().tearDown()
+
+    def testRequestsCutShortByTheDeadline_DoNotOpenTheHost(self):
+        errors = []
+
+        def check(park_id):
+            try:
+                RecreationClient.get_availability(park_id, datetime(2025, 6, 1))
+            except requests.Timeout as e:
+                errors.append(e)
+
+        latency.set_deadline(0.2)
+        threads = [threading.Thread(target=check, args=(park_id,)) for park_id in range(1, 5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(BREAKERS.states(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+
+from click.testing import CliRunner
+
+import cli as cli
+from camp import burst
+from camp.clients import latency
+from camp.tests.helpers import FakeClock, MockUpstreamTestCase
+
+
+class TestBurst(unittest.TestCase):
+    def testParseRelease(self):
+        self.assertEqual(burst.parse_release("2025-01-15T10:00:00+00:00"), 1736935200.0)
+        self.assertEqual(burst.parse_release("2025-01-15 10:00"), datetime(2025, 1, 15, 10).timestamp())
+        with self.assertRaisesRegex(ValueError, "Invalid release time"):
+            burst.parse_release("10am")
+
+    def testSchedule_AlignsToTheReleaseThenSlowsDown(self):
+        schedule = burst.BurstSchedule(1000.0, window=10, interval=2, normal_interval=5)
+        self.assertEqual(schedule.next_poll(900.0), 1000.0)
+        self.assertFalse(schedule.in_burst(999.9))
+        self.assertTrue(schedule.in_burst(1000.0))
+        # A slow poll skips to the next slot of the grid.
+        self.assertEqual(schedule.next_poll(1000.3), 1002.0)
+        self.assertEqual(schedule.next_poll(1004.5), 1006.0)
+        self.assertEqual(schedule.next_poll(1010.0), 1015.0)
+
+    def testSleepUntil_WakesAtTheInstant(self):
+        clock = FakeClock(100.0)
+        burst.sleep_until(102.5, clock, clock.sleep)
+        self.assertEqual(clock.now, 102.5)
+        self.assertEqual(clock.sleeps, [1.0, 1.0, 0.5])
+
+    def testRequestBudget_WaitsWhenSpent(self):
+        clock = FakeClock()
+        budget = latency.RequestBudget(60, burst=2, clock=clock, sleep=clock.sleep)
+        budget.take()
+        budget.take()
+        self.assertEqual(clock.now, 0.0)
+        self.assertFalse(budget.try_take())
+        budget.take()
+        self.assertEqual(clock.now, 1.0)
+
+
+class TestBurstCli(MockUpstreamTestCase):
+    PARK_ID = "94601"
+    MOCK_CONFIG = dict(sites=5, available_ratio=0.0)
+
+    def testMain_PollsFromTheReleaseUntilSitesAppear(self):
+        release_at = time.time() + 1
+
+        def release():
+            self.server.recreation.available_ratio = 1.0
+
+        timer = threading.Timer(1.6, release)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        result = CliRunner().invoke(cli.main, [
+            "--start-date", "2025-06-01", "--end-date", "2025-06-05", "--parks", self.PARK_ID,
+            "--base-url", self.server.url, "--release-at", datetime.fromtimestamp(release_at).isoformat(),
+            "--burst-interval", "0.25",
+        ])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("There are campsites available", result.output)
+        self.assertLess(time.time() - release_at, 3)
+        # The name was resolved once, before the release, and availability polled every 0.25s.
+        self.assertEqual(self.server.stats["by_endpoint"]["campground"], 1)
+        self.assertGreaterEqual(self.server.stats["by_endpoint"]["availability"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
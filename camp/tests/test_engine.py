@@ -0,0 +1,80 @@
+import asyncio
+import json
+import unittest
+from datetime import datetime
+
+import cli as cli
+from camp import camping, engine
+from camp.cache import AvailabilityCache
+from camp.tests.helpers import MockUpstreamTestCase
+
+
+class TestEngine(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=10)
+
+    def testCliAndWebShareTheEngine(self):
+        for name in engine.__all__:
+            self.assertIs(getattr(cli, name), getattr(engine, name))
+        self.assertIs(camping.check_park, engine.check_park)
+
+    def testRunCampsiteCheck_MatchesCliOutput(self):
+        start_date, end_date = datetime(2025, 6, 1), datetime(2025, 6, 15)
+        # The web form posts park IDs as strings and campsite IDs as numbers.
+        output, has_availabilities, info_by_park_id = camping.run_campsite_check(
+            ["232447"], start_date, end_date, campsite_ids=(324470001,), nights=1,
+            show_campsite_info=True,
+        )
+        self.assertTrue(has_availabilities)
+        self.assertEqual(list(info_by_park_id["232447"][2]), [324470001])
+
+        expected, _ = cli.generate_human_output(
+            {"232447": cli.check_park("232447", start_date, end_date, None, (324470001,), nights=1)},
+            start_date, end_date, True,
+        )
+        self.assertEqual(output, expected)
+
+    def testRunCampsiteCheckAsync_MatchesTheSyncSearch(self):
+        start_date, end_date = datetime(2025, 6, 20), datetime(2025, 7, 5)
+        parks = ["232447", "232449", "232450"]
+        expected = camping.run_campsite_check(parks, start_date, end_date, nights=2, show_campsite_info=True)
+        requests_before = self.server.stats["requests"]
+        cache = AvailabilityCache(60)
+        actual = asyncio.run(camping.run_campsite_check_async(
+            parks, start_date, end_date, nights=2, show_campsite_info=True, cache=cache))
+        self.assertEqual(actual, expected)
+        # Two months for each park, the names were already looked up.
+        self.assertEqual(self.server.stats["requests"] - requests_before, 6)
+
+        asyncio.run(camping.run_campsite_check_async(parks, start_date, end_date, cache=cache))
+        self.assertEqual(self.server.stats["requests"] - requests_before, 6)
+
+    def testIterParksAsync_YieldsEachParkOrItsError(self):
+        start_date, end_date = datetime(2025, 6, 1), datetime(2025, 6, 10)
+
+        async def collect():
+            return [result async for result in engine.iter_parks_async(
+                ["232447", "no-such-park", "232449"], start_date, end_date, nights=2)]
+
+        results = dict(asyncio.run(collect()))
+        self.assertEqual(set(results), {"232447", "232449", "no-such-park"})
+        self.assertIsInstance(results["no-such-park"], Exception)
+        for park_id in ("232447", "232449"):
+            self.assertEqual(results[park_id], engine.check_park(park_id, start_date, end_date, None, nights=2))
+
+    def testRunCampsiteCheckAsync_SkipsAFailingPark(self):
+        start_date, end_date = datetime(2025, 6, 1), datetime(2025, 6, 10)
+        output, has_availabilities, info_by_park_id = asyncio.run(camping.run_campsite_check_async(
+            ["232447", "no-such-park"], start_date, end_date, nights=2, show_campsite_info=True))
+        self.assertTrue(has_availabilities)
+        self.assertEqual(list(info_by_park_id), ["232447"])
+        self.assertIn("Park no-such-park skipped", output)
+
+        output, has_availabilities = asyncio.run(camping.run_campsite_check_async(
+            ["232447", "no-such-park"], start_date, end_date, nights=2, json_output=True))
+        parks = json.loads(output)
+        self.assertIn("availabilities", parks["232447"])
+        self.assertTrue(parks["no-such-park"]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import datetime
+import unittest
+
+from django.test import TestCase
+
+from camp.tests.helpers import setup_django
+
+
+def setUpModule():
+    setup_django()
+
+
+class TestGeo(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from camp.models import Facility
+
+        for facility_id, latitude, longitude in [
+            ("1", 37.74, -119.57),  # Yosemite Valley
+            ("2", 37.87, -119.35),  # Tuolumne Meadows
+            ("3", 37.77, -122.42),  # San Francisco
+        ]:
+            Facility.objects.create(
+                facility_id=facility_id,
+                name="Facility {}".format(facility_id),
+                type_description="Campground",
+                latitude=latitude,
+                longitude=longitude,
+                reservable=True,
+                last_updated_date=datetime.date(2025, 1, 1),
+            )
+
+    def testNearby_ClosestFirstWithinRadius(self):
+        from camp import geo
+
+        ids = geo.nearby_campground_ids(37.74, -119.57, 30)
+        self.assertEqual(ids, ["1", "2"])
+
+    def testPrefixFilter_SearchesTheGeohashIndex(self):
+        from camp import geo
+        from camp.models import Facility
+        from camp.utils import geohash
+
+        south, west, north, east = geohash.radius_bbox(37.74, -119.57, 30)
+        prefixes = geohash.covering_prefixes(south, west, north, east)
+        plan = Facility.objects.filter(geo._prefix_filter(prefixes)).explain()
+
+        self.assertIn("USING INDEX", plan)
+        self.assertNotIn("SCAN", plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+
+from camp.utils import geohash
+
+
+class TestGeohash(unittest.TestCase):
+    def testEncode_KnownValue(self):
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+
+    def testCoveringPrefixes_ContainPointsInsideBox(self):
+        south, west, north, east = geohash.radius_bbox(37.74, -119.57, 100)
+        prefixes = geohash.covering_prefixes(south, west, north, east)
+        self.assertLessEqual(len(prefixes), 32)
+        for lat, lon in [(south, west), (north, east), (37.74, -119.57),
+                         (south + 0.01, east - 0.01), (north - 0.01, west + 0.01)]:
+            point = geohash.encode(lat, lon)
+            self.assertTrue(any(point.startswith(p) for p in prefixes))
+
+    def testHaversine_YosemiteToSanFrancisco(self):
+        distance = geohash.haversine_miles(37.74, -119.57, 37.77, -122.42)
+        self.assertAlmostEqual(distance, 155, delta=3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+from click.testing import CliRunner
+
+import cli as cli
+from benchmarks import fixtures
+from camp.engine import _collapse_availability, check_park, get_num_available_sites
+from camp.index import AvailabilityIndex, IndexClient, IndexService, ParkAvailability, make_server
+from camp.tests.helpers import MockUpstreamTestCase
+
+SEASON = (datetime(2025, 6, 1), datetime(2025, 8, 1))
+
+
+class TestParkAvailability(unittest.TestCase):
+    def setUp(self):
+        self.payloads = [fixtures.recreation_month(7, month, sites=40, available_ratio=0.6) for month in
+                         (datetime(2025, 6, 1), datetime(2025, 7, 1))]
+        self.park = ParkAvailability.from_payloads("7", "Park", *SEASON, self.payloads)
+
+    def assertMatchesEngine(self, start_date, end_date, nights=None, weekends_only=False, campsite_type=None,
+                            campsite_ids=(), excluded_site_ids=()):
+        park_information = _collapse_availability(
+            self.payloads, campsite_type, campsite_ids, excluded_site_ids, None)
+        expected = get_num_available_sites(park_information, start_date, end_date, nights, weekends_only)
+        actual = self.park.query(start_date, end_date, nights, weekends_only, campsite_type, campsite_ids,
+                                 excluded_site_ids)
+        self.assertEqual(actual[:2], expected[:2])
+        self.assertEqual(actual[2], dict(expected[2]))
+
+    def testQuery_MatchesTheEngine(self):
+        self.assertMatchesEngine(datetime(2025, 6, 1), datetime(2025, 6, 5))
+        self.assertMatchesEngine(datetime(2025, 6, 25), datetime(2025, 7, 10), nights=2)
+        self.assertMatchesEngine(datetime(2025, 6, 1), datetime(2025, 8, 1), nights=2, weekends_only=True)
+        self.assertMatchesEngine(datetime(2025, 7, 1), datetime(2025, 7, 20), nights=3,
+                                 campsite_type="RV ELECTRIC", excluded_site_ids=["70001"])
+        self.assertMatchesEngine(datetime(2025, 6, 1), datetime(2025, 6, 30), nights=1,
+                                 campsite_ids=[70002, 70003])
+
+    def testIndex_ReportsParksItCannotAnswer(self):
+        index = AvailabilityIndex()
+        index._parks["7"] = self.park
+        info, missing = index.query(["7", "8"], datetime(2025, 7, 30), datetime(2025, 8, 3))
+        self.assertEqual(info, {})
+        self.assertEqual(missing, {"7": "indexed from 2025-06-01 to 2025-08-01 only", "8": "not in the index"})
+
+
+class TestIndexService(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=10, available_ratio=0.5)
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = AvailabilityIndex()
+        self.service = IndexService(self.index, lambda: [((1, 2), *SEASON)])
+        self.service.refresh_all()
+        self.address = "unix:" + os.path.join(self.tmp.name, "index.sock")
+        self.index_server = make_server(self.address, self.index)
+        threading.Thread(target=self.index_server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.index_server.shutdown()
+        self.index_server.server_close()
+        super().tearDown()
+        self.tmp.cleanup()
+
+    def testClient_AnswersLikeCheckPark(self):
+        start_date, end_date = datetime(2025, 6, 10), datetime(2025, 6, 20)
+        info, missing = IndexClient(self.address).query([1, 2, 3], start_date, end_date, nights=2)
+        self.assertEqual(missing, {3: "not in the index"})
+        for park_id in (1, 2):
+            expected = check_park(park_id, start_date, end_date, None, nights=2)
+            self.assertEqual(info[park_id], expected[:2] + (dict(expected[2]),) + expected[3:])
+
+    def testCli_QueriesTheIndexNotUpstream(self):
+        requests_before = self.server.stats["requests"]
+        result = CliRunner().invoke(cli.main, [
+            "--start-date", "2025-06-10", "--end-date", "2025-06-12", "--parks", "1", "--parks", "3",
+            "--index-url", self.address,
+        ])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Synthetic Campground 1 (1)", result.output)
+        self.assertIn("Park 3 skipped: not in the index", result.output)
+        self.assertEqual(self.server.stats["requests"], requests_before)
+
+
+if __name__ == "__main__":
+    unittest.main()
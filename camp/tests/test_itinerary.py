@@ -0,0 +1,86 @@
+import json
+import time
+import unittest
+from datetime import datetime
+
+from click.testing import CliRunner
+
+import cli as cli
+from camp.itinerary import find_itineraries, loop_groups
+from camp.site_index import SiteIndex, SiteMetadata
+from camp.tests.helpers import MockUpstreamTestCase
+
+
+def nights(*days):
+    return ["2025-06-{:02d}T00:00:00Z".format(day) for day in days]
+
+
+class TestItinerary(unittest.TestCase):
+    def setUp(self):
+        # No site is free for all of the 1st to the 5th.
+        self.park_information = {
+            "1": nights(1, 2),
+            "2": nights(2, 3, 4),
+            "3": nights(3),
+            "4": nights(4, 5),
+        }
+
+    def summary(self, itinerary):
+        return [(leg.site_id, leg.arrival.day, leg.nights) for leg in itinerary.legs]
+
+    def testFindItineraries_UsesTheFewestSiteChanges(self):
+        itineraries = find_itineraries(self.park_information, datetime(2025, 6, 1), datetime(2025, 6, 6))
+        self.assertEqual(len(itineraries), 1)
+        self.assertEqual(self.summary(itineraries[0]), [(1, 1, 2), (2, 3, 2), (4, 5, 1)])
+        self.assertEqual(itineraries[0].changes, 2)
+
+    def testFindItineraries_RanksByChangesThenArrival(self):
+        itineraries = find_itineraries(
+            self.park_information, datetime(2025, 6, 1), datetime(2025, 6, 6), nights=2, max_changes=1)
+        self.assertEqual([(i.arrival.day, i.changes) for i in itineraries], [(1, 0), (2, 0), (3, 0), (4, 0)])
+
+    def testFindItineraries_StaysWithinASiteGroup(self):
+        index = SiteIndex([
+            SiteMetadata("1", "9", "001", None, "A", False),
+            SiteMetadata("2", "9", "002", None, "B", False),
+            SiteMetadata("3", "9", "003", None, "A", False),
+        ])
+        groups = loop_groups(index, ["1", "2", "3"])
+        information = {"1": nights(1), "2": nights(2), "3": nights(2)}
+        itineraries = find_itineraries(information, datetime(2025, 6, 1), datetime(2025, 6, 3), site_groups=groups)
+        self.assertEqual(self.summary(itineraries[0]), [(1, 1, 1), (3, 2, 1)])
+
+    def testFindItineraries_IsFastOnLargeCampgrounds(self):
+        # 500 sites, every site free on alternating nights for a month.
+        information = {
+            str(site): nights(*range(1 + site % 2, 31, 2)) for site in range(500)
+        }
+        started = time.perf_counter()
+        itineraries = find_itineraries(information, datetime(2025, 6, 1), datetime(2025, 7, 1), nights=7)
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(itineraries[0].changes, 6)
+
+
+class TestItineraryCli(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=5, available_ratio=1.0)
+
+    def testMain_PrintsItineraries(self):
+        result = CliRunner().invoke(cli.main, [
+            "--start-date", "2025-06-01", "--end-date", "2025-06-05", "--parks", "1", "--itinerary",
+            "--json-output", "--base-url", self.server.url,
+        ])
+        self.assertEqual(result.exit_code, 0, result.output)
+        itineraries = json.loads(result.output[result.output.index("{"):])["1"]["itineraries"]
+        self.assertEqual(itineraries[0]["arrival"], "2025-06-01")
+        self.assertEqual(itineraries[0]["departure"], "2025-06-05")
+
+    def testMain_SameLoopRequiresSiteIndex(self):
+        result = CliRunner().invoke(cli.main, [
+            "--start-date", "2025-06-01", "--end-date", "2025-06-05", "--parks", "1", "--itinerary", "--same-loop",
+        ])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn("--same-loop requires --site-index", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+from click.testing import CliRunner
+
+import cli as cli
+from camp import metrics
+from camp.clients import latency
+from camp.tests.helpers import MockUpstreamTestCase
+
+
+class TestLatency(unittest.TestCase):
+    def tearDown(self):
+        latency.configure()
+        latency.set_deadline(None)
+
+    def testRequestTimeout_ShrinksWithTheDeadline(self):
+        self.assertEqual(latency.request_timeout(), (latency.CONNECT_TIMEOUT, latency.READ_TIMEOUT))
+        latency.set_deadline(1.0)
+        connect, read = latency.request_timeout()
+        self.assertLessEqual(read, 1.0)
+        latency.set_deadline(-1)
+        with self.assertRaises(latency.DeadlineExceeded):
+            latency.request_timeout()
+        self.assertTrue(latency.is_stale(latency.DeadlineExceeded()))
+        self.assertTrue(latency.is_stale(requests.ReadTimeout()))
+        self.assertFalse(latency.is_stale(RuntimeError()))
+
+    def testHedged_FirstAnswerWins(self):
+        endpoint = "test_hedge"
+        for _ in range(latency.HEDGE_MIN_SAMPLES):
+            metrics.observe("campquest_http_request_seconds", 0.01, endpoint=endpoint)
+        latency.configure(hedge=True)
+        calls = []
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                calls.append(None)
+                attempt = len(calls)
+            # The original stalls, the hedge answers at once.
+            time.sleep(2 if attempt == 1 else 0)
+            return attempt
+
+        # Earn a hedge from the budget.
+        for _ in range(10):
+            latency.hedged(lambda: None, endpoint)
+        started = time.perf_counter()
+        self.assertEqual(latency.hedged(call, endpoint), 2)
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(metrics.REGISTRY.counter_total(
+            "campquest_hedged_requests_total", endpoint=endpoint, winner="hedge"), 1)
+
+    def testHedged_ShareIsCountedOverTheLatestRequests(self):
+        with mock.patch.object(latency, "_recent", latency.deque()), mock.patch.object(latency, "_recent_hedges", 0):
+            for _ in range(latency.HEDGE_WINDOW):
+                latency._count_request()
+            taken = 0
+            while latency._take_hedge():
+                taken += 1
+            self.assertGreater(taken, 0)
+            self.assertLessEqual(taken, (latency.HEDGE_WINDOW - taken) * latency.HEDGE_RATIO + 1)
+            # Once the window moves past them, the old requests no longer earn hedges.
+            for _ in range(latency.HEDGE_WINDOW):
+                latency._count_request()
+            self.assertEqual(latency._recent_hedges, 0)
+            self.assertEqual(len(latency._recent), latency.HEDGE_WINDOW)
+
+    def testHedgedAsync_FirstAnswerWinsAndTheOtherIsCancelled(self):
+        endpoint = "test_hedge_async"
+        for _ in range(latency.HEDGE_MIN_SAMPLES):
+            metrics.observe("campquest_http_request_seconds", 0.01, endpoint=endpoint)
+        latency.configure(hedge=True)
+        attempts = []
+
+        async def call():
+            attempts.append(asyncio.current_task())
+            # The original stalls, the hedge answers at once.
+            await asyncio.sleep(2 if len(attempts) == 1 else 0)
+            return len(attempts)
+
+        async def search():
+            for _ in range(10):
+                await latency.hedged_async(lambda: asyncio.sleep(0), endpoint)
+            result = await latency.hedged_async(call, endpoint)
+            await asyncio.sleep(0)
+            return result
+
+        started = time.perf_counter()
+        self.assertEqual(asyncio.run(search()), 2)
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertTrue(attempts[0].cancelled())
+        self.assertEqual(metrics.REGISTRY.counter_total(
+            "campquest_hedged_requests_total", endpoint=endpoint, winner="hedge"), 1)
+
+
+class TestDeadlineCli(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=5, latency_ms=400)
+
+    def testMain_ReportsParksMissingTheDeadlineAsStale(self):
+        args = ["--start-date", "2025-06-01", "--end-date", "2025-06-05", "--base-url", self.server.url,
+                "--deadline", "1"]
+        for park_id in range(1, 6):
+            args += ["--parks", str(park_id)]
+        started = time.perf_counter()
+        result = CliRunner().invoke(cli.main, args)
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertLess(time.perf_counter() - started, 3)
+        self.assertIn("is stale", result.output)
+
+    def testMain_TimedOutParkIsStale(self):
+        result = CliRunner().invoke(cli.main, [
+            "--start-date", "2025-06-01", "--end-date", "2025-06-05", "--parks", "1",
+            "--base-url", self.server.url, "--request-timeout", "0.1",
+        ])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Park 1 is stale", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from camp.metrics import Registry
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+        for seconds in (0.02, 0.04, 0.3):
+            self.registry.observe("campquest_http_request_seconds", seconds, endpoint="availability")
+            self.registry.inc("campquest_http_requests_total", endpoint="availability", status="200")
+        self.registry.inc("campquest_http_requests_total", endpoint="availability", status="429")
+        self.registry.record_cache("park_name", True)
+        self.registry.record_cache("park_name", False)
+
+    def testRenderPrometheus_HistogramIsCumulative(self):
+        text = self.registry.render_prometheus()
+        self.assertIn("# TYPE campquest_http_request_seconds histogram", text)
+        self.assertIn('campquest_http_request_seconds_bucket{endpoint="availability",le="0.05"} 2', text)
+        self.assertIn('campquest_http_request_seconds_bucket{endpoint="availability",le="+Inf"} 3', text)
+        self.assertIn('campquest_http_requests_total{endpoint="availability",status="429"} 1', text)
+
+    def testStatsLine(self):
+        line = self.registry.stats_line()
+        self.assertIn("requests=4 errors=1", line)
+        self.assertIn("park_name=50%", line)
+
+
+if __name__ == "__main__":
+    unittest.main()
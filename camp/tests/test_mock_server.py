@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import cli as cli
+from benchmarks import record
+from benchmarks.fixtures import Recording, ReserveCaliforniaReplay
+from camp.clients import reservecalifornia_client
+from camp.clients.recreation_client import RecreationClient
+from camp.tests.helpers import MockUpstreamTestCase
+
+
+class TestMockServer(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=10)
+
+    def testCheckPark_AgainstMockServer(self):
+        current, maximum, _, park_name = cli.check_park(
+            232447, datetime(2025, 6, 1), datetime(2025, 7, 15), None, nights=1)
+        self.assertEqual(maximum, 10)
+        self.assertGreater(current, 0)
+        self.assertEqual(park_name, "Synthetic Campground 232447")
+        self.assertEqual(self.server.stats["by_endpoint"], {
+                         "availability": 2, "campground": 1})
+
+        _, _, _, park_name = cli.check_park(
+            615, datetime(2025, 6, 1), datetime(2025, 7, 15), None, source="reserve_california")
+        self.assertEqual(park_name, "Synthetic State Park 615")
+
+    def testRecord_ReplaysReserveCalifornia(self):
+        start_date, end_date = datetime(2025, 6, 1), datetime(2025, 7, 15)
+        recording = record.record(615, start_date, end_date, source="reserve_california")
+        self.assertEqual(recording.meta["source"], "reserve_california")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "reserve_california_615.json")
+            recording.save(path)
+            recording = Recording.load(path)
+
+        live = cli.check_park(615, start_date, end_date, None, source="reserve_california")
+        # The synthetic fallback has a single unit, the recorded grid has the mock's 10.
+        replay = ReserveCaliforniaReplay(recording, units=1)
+        with mock.patch.object(reservecalifornia_client, "make_post_request", replay):
+            replayed = cli.check_park(615, start_date, end_date, None, source="reserve_california")
+        self.assertEqual(replayed, live)
+        self.assertEqual(replay.calls, 1)
+
+    def testErrorsAndThrottling(self):
+        self.server.config.throttle_rate = 1.0
+        with self.assertRaises(RuntimeError):
+            RecreationClient.get_park_name(232447)
+        self.assertEqual(self.server.stats["throttled"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
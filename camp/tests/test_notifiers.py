@@ -0,0 +1,178 @@
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs
+
+from camp.notifiers import pushover
+from camp.notifiers.base import Notifier, check_spec, get_notifier
+from camp.notifiers.dispatcher import NotificationDispatcher
+
+
+class FakeHttpHandler(BaseHTTPRequestHandler):
+    """ Answers like Pushover on /1/messages.json and records webhook posts. """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        self.server.connections.add(self.client_address)
+        if self.path == "/hook":
+            self.server.messages.append(json.loads(body))
+        else:
+            self.server.messages.append({k: v[0] for k, v in parse_qs(body).items()})
+        self.server.remaining -= 1
+        payload = b'{"status":1}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("X-Limit-App-Limit", "10000")
+        self.send_header("X-Limit-App-Remaining", str(self.server.remaining))
+        self.send_header("X-Limit-App-Reset", str(int(time.time()) + 3600))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeSmtpHandler(socketserver.StreamRequestHandler):
+    """ Just enough SMTP for smtplib.send_message. """
+
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        self.reply("220 localhost")
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif command == "DATA":
+                self.reply("354 go ahead")
+                lines = []
+                for data in iter(self.rfile.readline, b".\r\n"):
+                    lines.append(data.decode())
+                self.server.messages.append("".join(lines))
+                self.reply("250 queued")
+            elif command == "QUIT" or not line:
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+class SlowNotifier(Notifier):
+    name = "slow"
+
+    def send(self, message, title):
+        time.sleep(0.5)
+        return True
+
+
+class TestNotifiers(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeHttpHandler)
+        self.server.daemon_threads = True
+        self.server.messages = []
+        self.server.connections = set()
+        self.server.remaining = 2
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        patcher = mock.patch.object(pushover, "_credentials", ("user", "token"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def testCheckSpec(self):
+        self.assertEqual(check_spec("webhook:https://example.com/hook"),
+                         ("webhook", "https://example.com/hook"))
+        self.assertEqual(check_spec("pushover"), ("pushover", None))
+        with self.assertRaisesRegex(ValueError, "needs a target"):
+            check_spec("smtp")
+        with self.assertRaisesRegex(ValueError, "Unknown notifier"):
+            check_spec("twitter")
+
+    def testPushoverClient_ReusesConnectionAndTracksQuota(self):
+        client = pushover.PushoverClient(self.url)
+        self.assertEqual(client.send("one"), (200, "OK"))
+        self.assertEqual(client.send("two"), (200, "OK"))
+        client.close()
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(client.quota["limit"], 10000)
+        self.assertTrue(client.quota_exhausted())
+
+    def testPushover_FitsLongMessagesWithoutDroppingUpdates(self):
+        updates = ["Park {} is open\n".format(i) + "x" * 200 for i in range(10)]
+        message = pushover.fit_message("\n\n".join(updates))
+        self.assertLessEqual(len(message), pushover.MAX_MESSAGE_LENGTH)
+        self.assertTrue(message.startswith("\n\n".join(updates[:4])))
+        self.assertTrue(message.endswith("\n\n+6 more updates"))
+
+        message = pushover.fit_message("y" * 2000 + "\n\nPark B is open")
+        self.assertEqual(len(message), pushover.MAX_MESSAGE_LENGTH)
+        self.assertTrue(message.endswith("...\n\n+1 more update"))
+        self.assertEqual(pushover.fit_message("Park A is open"), "Park A is open")
+
+    def testDispatcher_CoalescesBurstAndStopsAtQuota(self):
+        dispatcher = NotificationDispatcher(
+            [pushover.PushoverNotifier(self.url)], window=0.2)
+        for park in ("A", "B", "C"):
+            dispatcher.submit("Park {} is open".format(park))
+        time.sleep(0.5)
+        dispatcher.submit("Park D is open")
+        time.sleep(0.5)
+        dispatcher.submit("Park E is open")
+        dispatcher.close()
+
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertEqual(self.server.messages[0]["title"], "CampQuest (3 updates)")
+        self.assertEqual(self.server.messages[0]["message"],
+                         "Park A is open\n\nPark B is open\n\nPark C is open")
+        # The quota ran out with the second message, the third is dropped locally.
+        self.assertEqual(dispatcher.sent["pushover"], 2)
+        self.assertEqual(dispatcher.failed["pushover"], 1)
+
+    def testDispatcher_SlowNotifierDoesNotBlock(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "hits.log")
+            dispatcher = NotificationDispatcher(
+                [SlowNotifier(), "file:" + path, "webhook:{}/hook".format(self.url)], window=0)
+            start = time.monotonic()
+            dispatcher.submit("Park A is open", "CampQuest: june")
+            self.assertLess(time.monotonic() - start, 0.1)
+            time.sleep(0.2)
+            with open(path, encoding="utf-8") as f:
+                self.assertIn("CampQuest: june\nPark A is open", f.read())
+            self.assertEqual(self.server.messages, [
+                {"title": "CampQuest: june", "message": "Park A is open", "source": "campquest"}])
+            dispatcher.close()
+        self.assertEqual(dispatcher.sent, {"slow": 1, "file": 1, "webhook": 1})
+
+    def testSmtpNotifier_AgainstLocalServer(self):
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeSmtpHandler)
+        server.daemon_threads = True
+        server.messages = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            with mock.patch.dict(os.environ, {"CAMPQUEST_SMTP_HOST": "127.0.0.1",
+                                              "CAMPQUEST_SMTP_PORT": str(server.server_address[1])}):
+                notifier = get_notifier("smtp:me@example.com, you@example.com")
+            self.assertTrue(notifier.send("Park A is open", "CampQuest"))
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn("Subject: CampQuest", server.messages[0])
+        self.assertIn("To: me@example.com, you@example.com", server.messages[0])
+        self.assertIn("Park A is open", server.messages[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
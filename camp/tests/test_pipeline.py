@@ -0,0 +1,86 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+
+from click.testing import CliRunner
+
+import cli as cli
+from camp import metrics
+from camp.cache import AvailabilityCache
+from camp.clients.recreation_client import RecreationClient
+from camp.engine import check_park
+from camp.pipeline import Pipeline
+from camp.tests.helpers import MockUpstreamTestCase
+
+START, END = datetime(2025, 6, 1), datetime(2025, 7, 10)
+
+
+class TestPipeline(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=20, available_ratio=0.5)
+
+    def check(self, cpu_workers):
+        pipeline = Pipeline(START, END, nights=2, cpu_workers=cpu_workers, fetch_workers=3)
+        try:
+            return dict(pipeline.run([1, 2, 3, 4]))
+        finally:
+            pipeline.close()
+
+    def testRun_MatchesCheckPark(self):
+        expected = {park_id: check_park(park_id, START, END, None, nights=2) for park_id in (1, 2, 3, 4)}
+        self.assertEqual(self.check(cpu_workers=0), expected)
+        self.assertEqual(self.check(cpu_workers=1), expected)
+
+    def testRun_EncodesCachedPayloadsAndMergesWorkerMetrics(self):
+        expected = {park_id: check_park(park_id, START, END, None, nights=2) for park_id in (1, 2)}
+        metrics.REGISTRY.reset()
+        # AvailabilityCache.get hands back decoded months, the evaluate processes still get raw JSON.
+        pipeline = Pipeline(START, END, nights=2, fetch=AvailabilityCache(60).get, cpu_workers=1, fetch_workers=2)
+        try:
+            self.assertEqual(dict(pipeline.run([1, 2])), expected)
+            payloads, _ = pipeline._fetch_park(1)
+            self.assertIsInstance(payloads[0], bytes)
+        finally:
+            pipeline.close()
+        _, evaluated = metrics.quantile("campquest_stage_seconds", 0.5, stage="windows")
+        self.assertEqual(evaluated, 2)
+
+    def testRun_FetchersWaitForASlowConsumer(self):
+        fetched = []
+        lock = threading.Lock()
+
+        def fetch(park_id, month_date):
+            with lock:
+                fetched.append(park_id)
+            return RecreationClient.get_availability_raw(park_id, month_date)
+
+        pipeline = Pipeline(START, END, fetch=fetch, cpu_workers=0, fetch_workers=2, queue_size=1)
+        results = pipeline.run(list(range(1, 31)))
+        next(results)
+        time.sleep(0.5)
+        # One park taken, one evaluated, one waiting for a slot, one queued and one held by each fetcher.
+        self.assertLessEqual(len(set(fetched)), 6)
+        self.assertEqual(len(list(results)), 29)
+        pipeline.close()
+
+    def testRun_RaisesAFailedPark(self):
+        def fetch(park_id, month_date):
+            raise RuntimeError("failedRequest")
+
+        pipeline = Pipeline(START, END, fetch=fetch, cpu_workers=0)
+        with self.assertRaises(RuntimeError):
+            list(pipeline.run([1, 2]))
+        pipeline.close()
+
+    def testMain_PipelineOutputsEveryPark(self):
+        result = CliRunner().invoke(cli.main, [
+            "--start-date", "2025-06-01", "--end-date", "2025-06-05", "--parks", "1", "--parks", "2",
+            "--base-url", self.server.url, "--pipeline", "--cpu-workers", "0",
+        ])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("(1)", result.output)
+        self.assertIn("(2)", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
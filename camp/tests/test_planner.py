@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from click.testing import CliRunner
+
+import cli as cli
+from camp.planner import FetchPlan, plan_park, plan_parks
+from camp.site_index import SiteIndex, SiteMetadata
+
+
+class TestPlanner(unittest.TestCase):
+    def setUp(self):
+        self.index = SiteIndex([
+            SiteMetadata("1000", "1", "001", "STANDARD NONELECTRIC", "A", False),
+            SiteMetadata("1001", "1", "002", "RV ELECTRIC", "B", True),
+            SiteMetadata("2000", "2", "001", "RV ELECTRIC", "A", False),
+        ])
+
+    def testPlanPark_UnknownParkIsFetched(self):
+        plan = plan_park(3, self.index, campsite_type="STANDARD NONELECTRIC")
+        self.assertFalse(plan.pruned)
+        self.assertIsNone(plan.allowed_site_ids)
+
+    def testPlanPark_NarrowsSitesByFilters(self):
+        plan = plan_park(1, self.index, campsite_type="RV ELECTRIC")
+        self.assertEqual(plan.allowed_site_ids, {"1001"})
+
+    def testPlanPark_NoRestrictionWithoutANarrowingFilter(self):
+        self.assertIsNone(plan_park(1, self.index).allowed_site_ids)
+        self.assertIsNone(plan_park(1, self.index, excluded_site_ids=["9999"]).allowed_site_ids)
+        self.assertIsNone(plan_park(2, self.index, campsite_type="RV ELECTRIC").allowed_site_ids)
+        # Accessibility is only known from the index, it restricts even without narrowing.
+        self.assertEqual(plan_park(1, self.index, accessible_only=True).allowed_site_ids, {"1001"})
+
+    def testPlanParks_ReportsReasons(self):
+        to_fetch, pruned = plan_parks(
+            [1, 2], self.index, campsite_type="STANDARD NONELECTRIC")
+        self.assertEqual([p.park_id for p in to_fetch], [1])
+        self.assertEqual(pruned, {2: "no STANDARD NONELECTRIC sites"})
+
+        _, pruned = plan_parks([1], self.index, excluded_site_ids=["1000", "1001"])
+        self.assertEqual(pruned, {1: "every matching site is excluded"})
+
+        _, pruned = plan_parks([2], self.index, campsite_ids=(1000,))
+        self.assertIn("requested campsite IDs", pruned[2])
+
+    def testMain_PrunedParksMakeNoRequests(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sites.json")
+            self.index.save(path)
+            result = CliRunner().invoke(cli.main, [
+                "--start-date", "2025-01-30", "--end-date", "2025-01-31",
+                "--parks", "2", "--campsite-type", "STANDARD NONELECTRIC",
+                "--site-index", path,
+            ])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Park 2 skipped: no STANDARD NONELECTRIC sites", result.output)
+
+    def testFetchPlan_FetchesEachParkMonthOnce(self):
+        calls = []
+        plan = FetchPlan(lambda park_id, month_date: calls.append(
+            (park_id, month_date.month)) or {"campsites": {}})
+        plan.add(1, datetime(2025, 6, 1), datetime(2025, 6, 15))
+        plan.add(1, datetime(2025, 6, 10), datetime(2025, 7, 10))
+        plan.add(2, datetime(2025, 6, 10), datetime(2025, 6, 12))
+        plan.fetch_all()
+        self.assertEqual(plan.requested, 4)
+        self.assertEqual(calls, [("1", 6), ("1", 7), ("2", 6)])
+
+        plan.get(1, datetime(2025, 6, 1))
+        plan.get("2", datetime(2025, 6, 1))
+        self.assertEqual(len(calls), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
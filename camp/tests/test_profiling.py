@@ -0,0 +1,30 @@
+import os
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+import cli as cli
+from camp.tests.helpers import MockUpstreamTestCase
+
+
+class TestProfiling(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=20, latency_ms=20)
+
+    def testProfile_ReportsNetworkAndCpuAndWritesFiles(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            folded = os.path.join(tmp, "sweep.folded")
+            result = CliRunner().invoke(cli.main, [
+                "--start-date", "2025-06-01", "--end-date", "2025-07-15",
+                "--parks", "1", "--base-url", self.server.url,
+                "--profile", "--profile-output", folded,
+            ])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("Network wait - top functions by own time:", result.output)
+            self.assertIn("CPU - top functions by own time:", result.output)
+            with open(folded, encoding="utf-8") as f:
+                self.assertIn("cli.py:main", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
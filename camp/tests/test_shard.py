@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+import cli as cli
+from camp.shard import HashRing, ShardWorker
+from camp.tests.helpers import FakeClock, MockUpstreamTestCase
+
+
+class TestShard(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "shard.sqlite")
+        self.clock = FakeClock(1000.0)
+        self.parks = list(range(1, 41))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def worker(self, worker_id, checked):
+        def check(park_id):
+            checked.append(park_id)
+            return 1, 1, {park_id * 10: [{"start": "2025-06-01"}]}, "Park {}".format(park_id)
+        return ShardWorker(self.path, "scope", self.parks, check, worker_id=worker_id, clock=self.clock)
+
+    def testRing_MovesOnlyTheParksOfALeavingWorker(self):
+        before = HashRing(["a", "b", "c"])
+        after = HashRing(["a", "b"])
+        for park_id in self.parks:
+            if before.owner(park_id) != "c":
+                self.assertEqual(after.owner(park_id), before.owner(park_id))
+        self.assertEqual(len({before.owner(park_id) for park_id in self.parks}), 3)
+
+    def testWorkers_SplitParksAndTakeOverFromADeadWorker(self):
+        checked_a, checked_b = [], []
+        a, b = self.worker("a", checked_a), self.worker("b", checked_b)
+        a.heartbeat()
+        b.heartbeat()
+        a.run_cycle()
+        b.run_cycle()
+        self.assertEqual(sorted(checked_a + checked_b), self.parks)
+        self.assertTrue(checked_a and checked_b)
+
+        # b stops heartbeating: once its leases expire a owns every park.
+        self.clock.now += 61
+        checked_a.clear()
+        a.run_cycle()
+        self.assertEqual(sorted(checked_a), self.parks)
+        a.stop()
+        b.db.close()
+
+    def testLease_IsExclusiveUntilItExpires(self):
+        a, b = self.worker("a", []), self.worker("b", [])
+        self.assertTrue(a.acquire(7))
+        self.assertTrue(a.acquire(7))
+        self.assertFalse(b.acquire(7))
+        self.clock.now += 61
+        self.assertTrue(b.acquire(7))
+        a.db.close()
+        b.db.close()
+
+    def testLease_IsReleasedOnceTheResultIsPublished(self):
+        checked_a = []
+        a, b = self.worker("a", checked_a), self.worker("b", [])
+        a.run_cycle()
+        self.assertEqual(sorted(checked_a), self.parks)
+        # b joins right away: the parks moving to it are not held by a's leases.
+        self.assertTrue(all(b.acquire(park_id) for park_id in self.parks))
+        a.db.close()
+        b.db.close()
+
+    def testPublish_ReportsOnlyChanges(self):
+        a, b = self.worker("a", []), self.worker("b", [])
+        info = (1, 1, {70: [{"start": "2025-06-01"}]}, "Park 7")
+        self.assertTrue(a.publish(7, info))
+        self.assertFalse(b.publish(7, info))
+        a.db.close()
+        b.db.close()
+
+
+class TestShardCli(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=5, available_ratio=0.9)
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "shard.sqlite")
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmp.cleanup()
+
+    def testMain_WorkersMergeIntoOneView(self):
+        args = [
+            "--start-date", "2025-06-01", "--end-date", "2025-06-05", "--parks", "1", "--parks", "2",
+            "--parks", "3", "--base-url", self.server.url, "--shard-db", self.path,
+        ]
+        for worker_id in ("a", "b"):
+            result = CliRunner().invoke(cli.main, args + ["--worker-id", worker_id])
+            self.assertEqual(result.exit_code, 0, result.output)
+
+        result = CliRunner().invoke(cli.main, args + ["--show-shards", "--json-output"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        for park_id in ("1", "2", "3"):
+            self.assertIn('"{}"'.format(park_id), result.output)
+
+        # A worker leaves the ring when it exits, the last one checked every park.
+        result = CliRunner().invoke(cli.main, args + ["--show-shards"])
+        self.assertIn("Live workers: none", result.output)
+        self.assertEqual(result.output.count("checked by b"), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+import cli as cli
+from camp.site_index import SiteIndex, SiteMetadata
+from camp.tests.helpers import MockUpstreamTestCase
+from cli import TypeConverter
+
+
+class TestSiteIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SiteIndex([
+            SiteMetadata("1000", "1", "001", "STANDARD NONELECTRIC", "A", True),
+            SiteMetadata("1001", "1", "002", "RV ELECTRIC", "B", False),
+        ])
+
+    def testFilterSites_ByTypeAndAccessibility(self):
+        self.assertEqual(self.index.filter_sites(
+            1, campsite_type="STANDARD NONELECTRIC"), {"1000"})
+        self.assertEqual(self.index.filter_sites(
+            1, accessible_only=True), {"1000"})
+        self.assertIsNone(self.index.filter_sites(2))
+        self.assertIsNone(self.index.filter_sites(1))
+
+    def testGenerateOutputToHuman_DescribesIndexedSites(self):
+        info_by_park_id = {
+            1: (2, 3, {
+                1000: [{"start": "2022-06-22", "end": "2022-06-23"}],
+                1002: [{"start": "2022-06-22", "end": "2022-06-23"}],
+            }, "SOME PARK")
+        }
+        output, _ = cli.generate_human_output(
+            info_by_park_id,
+            TypeConverter.date("2022-06-01"),
+            TypeConverter.date("2022-07-01"),
+            True,
+            site_index=self.index,
+        )
+        self.assertIn(
+            "  * Site 1000 (001, Loop A, STANDARD NONELECTRIC, accessible) is available", output)
+        self.assertIn("  * Site 1002 is available", output)
+
+
+class TestSiteIndexCli(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=3, available_ratio=1.0)
+
+    def testMain_KeepsUnindexedSitesWithoutFilters(self):
+        # A stale export that only knows one of the park's three sites.
+        index = SiteIndex([SiteMetadata("324470000", "232447", "001", "STANDARD NONELECTRIC", "A", True)])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sites.json")
+            index.save(path)
+            result = CliRunner().invoke(cli.main, [
+                "--start-date", "2025-06-01", "--end-date", "2025-06-03", "--parks", "232447",
+                "--site-index", path, "--json-output", "--base-url", self.server.url,
+            ])
+        self.assertEqual(result.exit_code, 0, result.output)
+        park = json.loads(result.output[result.output.index("{"):])["232447"]
+        self.assertEqual(sorted(park["availabilities"]), ["324470000", "324470001", "324470002"])
+        self.assertEqual(list(park["sites"]), ["324470000"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Imported on demand, importing the CLI must not load them.
+LAZY_MODULES = (
+    "requests", "user_agent", "dotenv", "notifier", "camp.notifiers.dispatcher", "dateutil", "rich_click",
+    "camp.clients.recreation_client", "camp.clients.reservecalifornia_client",
+    "camp.clients.async_recreation_client", "httpx",
+    "camp.profiling",
+)
+
+
+class TestStartup(unittest.TestCase):
+    def run_python(self, code, cwd):
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+        output = subprocess.check_output(
+            [sys.executable, "-c", code], cwd=cwd, env=env, text=True)
+        return json.loads(output)
+
+    def testImportCli_LoadsNoLazyModulesAndOpensNoLogFile(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            loaded = self.run_python(
+                "import json, sys, cli; print(json.dumps(sorted(sys.modules)))", tmp)
+            self.assertEqual(
+                [name for name in LAZY_MODULES if name in loaded], [])
+            self.assertFalse(os.path.exists(
+                os.path.join(tmp, "campquest.log")))
+
+    def testConfigureLogging_AttachesOneHandlerAndWritesOnFirstRecord(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            counts = self.run_python(
+                "import json, logging\n"
+                "from camp.utils.log import configure_logging\n"
+                "import os\n"
+                "configure_logging(); configure_logging(logging.DEBUG)\n"
+                "before = os.path.exists('campquest.log')\n"
+                "logging.getLogger('camp.clients.recreation_client').info('hello')\n"
+                "print(json.dumps([len(logging.getLogger('camp').handlers), before]))",
+                tmp)
+            self.assertEqual(counts, [1, False])
+            with open(os.path.join(tmp, "campquest.log"), encoding="utf-8") as f:
+                self.assertIn("INFO - hello", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
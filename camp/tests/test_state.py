@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from click.testing import CliRunner
+
+import cli as cli
+from camp.cache import AvailabilityCache
+from camp.state import StateStore
+from camp.tests.helpers import MockUpstreamTestCase
+
+
+class TestState(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=5, available_ratio=0.9)
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state.sqlite")
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmp.cleanup()
+
+    def testStore_RoundTrips(self):
+        store = StateStore(self.path)
+        store.save_search("scope", {1, "2"}, 123.0)
+        store.mark_seen("scope", 1, "abc")
+        store.save_month(1, datetime(2025, 6, 1), {"campsites": {}}, '"etag"', None, fetched_at=5.0)
+        store.close()
+
+        store = StateStore(self.path)
+        self.assertEqual(store.load_search("scope"), ({"1", "2"}, 123.0))
+        self.assertEqual(store.seen("scope", "1"), "abc")
+        self.assertIsNone(store.seen("other", "1"))
+        self.assertEqual(store.load_month(1, datetime(2025, 6, 9)), (5.0, {"campsites": {}}, '"etag"', None))
+        store.close()
+
+    def testCache_RevalidatesStalePayloads(self):
+        store = StateStore(self.path)
+        cache = AvailabilityCache(0, store=store)
+        first = cache.get(1, datetime(2025, 6, 1))
+        second = cache.get(1, datetime(2025, 6, 1))
+        store.close()
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.stats["by_endpoint"]["availability"], 2)
+        self.assertEqual(self.server.stats["not_modified"], 1)
+
+    def testMain_RestartDoesNotRepeatRequestsOrNotifications(self):
+        hits = os.path.join(self.tmp.name, "hits.log")
+        args = [
+            "--start-date", "2025-06-01", "--end-date", "2025-06-05",
+            "--parks", "1", "--parks", "2", "--base-url", self.server.url,
+            "--notifier", "file:" + hits, "--state-file", self.path,
+        ]
+        for _ in range(2):
+            result = CliRunner().invoke(cli.main, args)
+            self.assertEqual(result.exit_code, 0, result.output)
+
+        # The second run reuses the stored payloads and knows both parks were reported.
+        self.assertEqual(self.server.stats["by_endpoint"]["availability"], 2)
+        with open(hits, encoding="utf-8") as f:
+            self.assertEqual(f.read().count("CampQuest (2 updates)"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from unittest import mock
+
+from django.test import TestCase
+
+from camp.tests.helpers import setup_django
+
+
+def setUpModule():
+    setup_django()
+
+
+class TestStreamCamp(TestCase):
+    async def testStream_PassesTheFiltersToTheSearch(self):
+        searches = []
+
+        async def iter_parks_async(parks, start_date, end_date, **search):
+            searches.append(search)
+            yield parks[0], (1, 10, {}, "Park")
+
+        with mock.patch("camp.views.iter_parks_async", iter_parks_async):
+            response = await self.async_client.get("/camp/stream/", {
+                "start_date": "2025-06-01", "end_date": "2025-06-05", "parks": "232447", "nights": "2",
+                "campsite_type": "STANDARD NONELECTRIC", "campsite_ids": "1,2", "excluded_site_ids": "3",
+            })
+            body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn("event: summary", body)
+        self.assertEqual(searches, [{
+            "weekends_only": False, "nights": 2, "campsite_type": "STANDARD NONELECTRIC",
+            "campsite_ids": (1, 2), "excluded_site_ids": ("3",),
+        }])
+
+        response = await self.async_client.get("/camp/stream/", {
+            "start_date": "2025-06-01", "end_date": "2025-06-05", "parks": "232447", "nights": "two"})
+        self.assertEqual(response.status_code, 400)
+
+    def testSelectCamp_StreamsTheFiltersToo(self):
+        form = {"start_date": "2025-06-01", "end_date": "2025-06-05", "parks": "232447", "nights": "2"}
+        response = self.client.post("/camp/", dict(form, stream="true"))
+        self.assertIn("nights=2", response.context["stream_url"])
+
+        with mock.patch("camp.views.run_campsite_check_async", return_value=("", False)) as check:
+            self.client.post("/camp/", form)
+        self.assertEqual(check.call_args.kwargs["nights"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
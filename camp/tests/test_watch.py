@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from camp.tests.helpers import FakeClock, MockUpstreamTestCase
+from camp.watch import WatchDaemon, load_watch_list
+
+WATCH_LIST_YAML = """
+interval: 30
+watches:
+  - name: june
+    parks: [232447]
+    start_date: 2025-06-01
+    end_date: 2025-06-15
+    nights: 1
+  - name: june-weekends
+    parks: 232447
+    start_date: 2025-06-01
+    end_date: 2025-06-20
+    weekends_only: true
+    interval: 120
+"""
+
+WATCH_LIST_TOML = """
+interval = 30
+
+[[watches]]
+name = "june"
+parks = [232447]
+start_date = 2025-06-01
+end_date = "2025-06-15"
+"""
+
+
+class TestWatch(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=10, available_ratio=0.0)
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmp.cleanup()
+
+    def write(self, name, text, mtime_ns=None):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        if mtime_ns:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        return path
+
+    def testLoadWatchList_YamlAndToml(self):
+        watch_list = load_watch_list(self.write("watch.yaml", WATCH_LIST_YAML))
+        self.assertEqual(watch_list.interval, 30)
+        self.assertEqual([w.name for w in watch_list.watches], ["june", "june-weekends"])
+        self.assertEqual(watch_list.watches[1].parks, (232447,))
+        self.assertEqual(watch_list.watches[1].start_date, datetime(2025, 6, 1))
+
+        watch = load_watch_list(self.write("watch.toml", WATCH_LIST_TOML)).watches[0]
+        self.assertEqual(watch.end_date, datetime(2025, 6, 15))
+
+        with self.assertRaisesRegex(ValueError, "end_date is required"):
+            load_watch_list(self.write("bad.yaml", "watches:\n  - parks: [1]\n    start_date: 2025-06-01\n"))
+
+    def testDaemon_SharesFetchesAndReloads(self):
+        clock = FakeClock(1000.0)
+        path = self.write("watch.yaml", WATCH_LIST_YAML, mtime_ns=1)
+        output = []
+        daemon = WatchDaemon(path, clock=clock, sleep=clock.sleep, out=output.append)
+
+        # Both watches poll the same park and month, it is fetched once.
+        daemon.run_cycle()
+        self.assertEqual(self.server.stats["by_endpoint"], {"availability": 1, "campground": 1})
+        self.assertEqual(daemon.next_due, {"june": 1030.0, "june-weekends": 1120.0})
+
+        clock.now = 1030.0
+        daemon.run_cycle()
+        self.assertEqual(self.server.stats["by_endpoint"]["availability"], 2)
+
+        # A broken edit keeps the previous watches.
+        self.write("watch.yaml", "watches: [", mtime_ns=2)
+        daemon.run_cycle()
+        self.assertEqual(len(daemon.watch_list.watches), 2)
+
+        self.server.recreation.available_ratio = 1.0
+        self.write("watch.yaml", WATCH_LIST_YAML.replace("nights: 1", "nights: 2"), mtime_ns=3)
+        clock.now = 1100.0
+        daemon.run_cycle()
+        self.assertEqual(len(output), 1)
+        self.assertTrue(output[0].startswith("[june]\nThere are campsites available"))
+        self.assertEqual(daemon.remaining["june"], set())
+
+    def testDaemon_RefetchesForAWatchShorterThanTheList(self):
+        clock = FakeClock(1000.0)
+        path = self.write("watch.yaml", WATCH_LIST_YAML.replace("interval: 30\n", "interval: 300\n", 1).replace(
+            "    nights: 1\n", "    nights: 1\n    interval: 10\n"))
+        daemon = WatchDaemon(path, clock=clock, sleep=clock.sleep, out=lambda _: None)
+
+        daemon.run_cycle()
+        self.assertEqual(daemon.cache.ttl, 10)
+        self.assertEqual(self.server.stats["by_endpoint"]["availability"], 1)
+
+        clock.now = 1010.0
+        daemon.run_cycle()
+        self.assertEqual(self.server.stats["by_endpoint"]["availability"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
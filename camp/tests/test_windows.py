@@ -0,0 +1,66 @@
+import json
+import unittest
+from datetime import date
+
+from click.testing import CliRunner
+
+import cli as cli
+from camp.tests.helpers import MockUpstreamTestCase
+from camp.windows import FlexibleQuery, find_windows, parse_blackouts, parse_weekdays
+
+
+def nights(*days):
+    return ["2025-06-{:02d}T00:00:00Z".format(day) for day in days]
+
+
+class TestWindows(unittest.TestCase):
+    def testCandidates_RespectArrivalDaysBlackoutsAndSeasonEnd(self):
+        query = FlexibleQuery(
+            date(2025, 6, 1), date(2025, 6, 16), min_nights=2, max_nights=3,
+            arrival_weekdays=parse_weekdays(["fri,sat"]), blackout_dates=parse_blackouts(["2025-06-08"]),
+        )
+        windows = [(date.fromordinal(a).isoformat(), n) for a, n in query.candidates()]
+        # Fri 6th can only stay 2 nights before the 8th, Sat 14th only until the season ends on the 16th.
+        self.assertEqual(windows, [
+            ("2025-06-06", 2), ("2025-06-13", 2), ("2025-06-13", 3), ("2025-06-14", 2),
+        ])
+
+    def testFindWindows_MatchesRunsPerSiteRankedByArrival(self):
+        park_information = {"1": nights(6, 7, 8), "2": nights(7, 8), "3": nights(13, 14)}
+        query = FlexibleQuery(date(2025, 6, 1), date(2025, 6, 30), min_nights=2, max_nights=3)
+        windows = [(w.arrival.day, w.nights, w.site_ids) for w in find_windows(park_information, query)]
+        self.assertEqual(windows, [(6, 2, (1,)), (6, 3, (1,)), (7, 2, (1, 2)), (13, 2, (3,))])
+
+    def testQuery_RejectsInvalidConstraints(self):
+        with self.assertRaises(ValueError):
+            FlexibleQuery(date(2025, 6, 1), date(2025, 6, 30), min_nights=3, max_nights=2)
+        with self.assertRaises(ValueError):
+            parse_weekdays(["someday"])
+
+
+class TestFlexibleCli(MockUpstreamTestCase):
+    MOCK_CONFIG = dict(sites=5, available_ratio=1.0)
+
+    def testMain_FetchesEachMonthOnceForTheWholeSeason(self):
+        result = CliRunner().invoke(cli.main, [
+            "--start-date", "2025-06-01", "--end-date", "2025-09-01", "--parks", "1", "--flexible",
+            "--min-nights", "2", "--arrival-day", "fri", "--json-output", "--base-url", self.server.url,
+        ])
+        self.assertEqual(result.exit_code, 0, result.output)
+        # June to September, one request per month.
+        self.assertEqual(self.server.stats["by_endpoint"]["availability"], 4)
+        windows = json.loads(result.output[result.output.index("{"):])["1"]["windows"]
+        arrivals = [w["arrival"] for w in windows]
+        self.assertEqual(arrivals, sorted(arrivals))
+        self.assertEqual(arrivals[0], "2025-06-06")
+
+    def testMain_RequiresFlexibleForItsOptions(self):
+        result = CliRunner().invoke(cli.main, [
+            "--start-date", "2025-06-01", "--end-date", "2025-06-05", "--parks", "1", "--max-nights", "3",
+        ])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn("require --flexible", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
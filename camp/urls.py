@@ -1,12 +1,19 @@
 from django.urls import path
 
-from .views import select_camp, show_parks, show_campsites, show_facilities, show_campsites
+from . import api
+from .views import select_camp, stream_camp, show_parks, show_campsites, show_facilities, show_campsites, metrics
 
 urlpatterns = [
     path('camp/', select_camp, name='select_camp'),
+    path('camp/stream/', stream_camp, name='stream_camp'),
     path('parks/', show_parks, name='show_parks'),
     path('parks/<str:recarea_id>/facilities/',
          show_facilities, name='show_facilities'),
     path('campsites/<str:facility_id>/', show_campsites, name='show_campsites'),
+    path('metrics/', metrics, name='metrics'),
+    path('api/parks/', api.parks, name='api_parks'),
+    path('api/parks/<str:recarea_id>/facilities/', api.facilities, name='api_facilities'),
+    path('api/facilities/<str:facility_id>/campsites/', api.campsites, name='api_campsites'),
+    path('api/availability/', api.availability, name='api_availability'),
 
 ]
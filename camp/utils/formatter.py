@@ -21,3 +21,12 @@ def site_date_to_human_date(date_string):
     return format_date(
         date_object, format_string=DateFormat.INPUT_DATE_FORMAT.value
     )
+
+
+def truncate(text, limit=1000):
+    """
+    Shortens long output before it is logged, keeping the start of it.
+    """
+    if len(text) <= limit:
+        return text
+    return "{}... [{} more characters]".format(text[:limit], len(text) - limit)
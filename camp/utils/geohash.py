@@ -0,0 +1,139 @@
+import math
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Precision stored on the models. A 9 character geohash is a ~5m x 5m cell.
+INDEX_PRECISION = 9
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LAT = 69.0
+
+
+def encode(latitude, longitude, precision=INDEX_PRECISION):
+    """ Encode a coordinate as a geohash string.
+
+    Args:
+        latitude: The latitude in degrees.
+        longitude: The longitude in degrees.
+        precision: The number of characters in the geohash. Defaults to INDEX_PRECISION.
+
+    Returns:
+        str: The geohash.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bit, ch, even = 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            ch |= 1 << (4 - bit)
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        if bit < 4:
+            bit += 1
+        else:
+            chars.append(BASE32[ch])
+            bit, ch = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """ Get the size of a geohash cell in degrees.
+
+    Args:
+        precision: The number of characters in the geohash.
+
+    Returns:
+        tuple: The cell height (latitude) and width (longitude) in degrees.
+    """
+    bits = precision * 5
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def covering_prefixes(south, west, north, east, max_cells=32):
+    """ Get the geohash prefixes that together cover a bounding box.
+
+    The precision is chosen as the finest one that needs at most max_cells
+    prefixes, so a query turns into a handful of indexed prefix lookups.
+
+    Args:
+        south: The southern latitude of the box.
+        west: The western longitude of the box.
+        north: The northern latitude of the box.
+        east: The eastern longitude of the box.
+        max_cells: The maximum number of prefixes to return. Defaults to 32.
+
+    Returns:
+        set: The covering geohash prefixes. An empty string covers the world.
+    """
+    south, north = max(south, -90.0), min(north, 90.0)
+    west, east = max(west, -180.0), min(east, 180.0)
+
+    for precision in range(INDEX_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(north / height) - math.floor(south / height) + 1
+        cols = math.floor(east / width) - math.floor(west / width) + 1
+        if rows * cols > max_cells:
+            continue
+
+        prefixes = set()
+        for row in range(rows):
+            lat = min(south + row * height, north)
+            for col in range(cols):
+                lon = min(west + col * width, east)
+                prefixes.add(encode(lat, lon, precision))
+            prefixes.add(encode(lat, east, precision))
+        for col in range(cols):
+            prefixes.add(encode(north, min(west + col * width, east), precision))
+        prefixes.add(encode(north, east, precision))
+        return prefixes
+
+    return {""}
+
+
+def radius_bbox(latitude, longitude, radius_miles):
+    """ Get the bounding box around a circle.
+
+    Args:
+        latitude: The latitude of the center.
+        longitude: The longitude of the center.
+        radius_miles: The radius in miles.
+
+    Returns:
+        tuple: The south, west, north and east edges of the box.
+    """
+    d_lat = radius_miles / MILES_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6:
+        d_lon = 180.0
+    else:
+        d_lon = min(radius_miles / (MILES_PER_DEGREE_LAT * cos_lat), 180.0)
+    return latitude - d_lat, longitude - d_lon, latitude + d_lat, longitude + d_lon
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    """ Get the great-circle distance between two coordinates.
+
+    Args:
+        lat1: The latitude of the first point.
+        lon1: The longitude of the first point.
+        lat2: The latitude of the second point.
+        lon2: The longitude of the second point.
+
+    Returns:
+        float: The distance in miles.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
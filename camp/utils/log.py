@@ -0,0 +1,27 @@
+import logging
+
+LOG_FILE = "campquest.log"
+LOG_FORMAT = "%(asctime)s - %(process)s - %(levelname)s - %(message)s"
+
+# Loggers of the CLI, the notifier and everything under camp/.
+APP_LOGGERS = ("camp", "cli", "__main__", "notifier")
+
+_handler = None
+
+
+def configure_logging(level=logging.INFO, path=LOG_FILE):
+    """
+    Sends the application loggers to the log file. Modules only create their
+    loggers, the entry point calls this once; later calls only change the level.
+    The file is opened on the first record, so runs that log nothing never touch it.
+    """
+    global _handler
+    if _handler is None:
+        _handler = logging.FileHandler(path, encoding="utf-8", delay=True)
+        _handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        for name in APP_LOGGERS:
+            logging.getLogger(name).addHandler(_handler)
+
+    for name in APP_LOGGERS:
+        logging.getLogger(name).setLevel(level)
+    return _handler
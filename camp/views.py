@@ -1,22 +1,25 @@
-from django.shortcuts import render
+import asyncio
+import json
+import logging
+import time
 from datetime import datetime
-from camp.camping import run_campsite_check
-from django.http import JsonResponse
-from camp.models import RecreationArea, Facility, RecAreaFacilityLink, Campsite
+from urllib.parse import urlencode
 
-# Utility to convert model instances to dictionaries for easier use in templates
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.urls import reverse
 
+from camp import metrics as campquest_metrics
+from camp.camping import run_campsite_check_async
+from camp.engine import iter_parks_async
+from camp.models import Campsite, Facility, RecreationArea
+from camp.site_index import SiteIndex
 
-class bcolors:
-    HEADER = '\033[95m'
-    OKBLUE = '\033[94m'
-    OKCYAN = '\033[96m'
-    OKGREEN = '\033[92m'
-    WARNING = '\033[93m'
-    FAIL = '\033[91m'
-    ENDC = '\033[0m'
-    BOLD = '\033[1m'
-    UNDERLINE = '\033[4m'
+LOG = logging.getLogger(__name__)
+
+# Utility to convert model instances to dictionaries for easier use in templates
 
 
 def recarea_to_dict(recarea):
@@ -38,7 +41,44 @@ def facility_to_dict(facility):
     }
 
 
-def select_camp(request):
+def park_to_dict(park_id, park_info, site_index):
+    park_data = {
+        'park_id': park_id,
+        'available_sites': park_info[0],
+        'total_sites': park_info[1],
+        'sites': [],
+        'park_name': park_info[3]
+    }
+    for site_id, dates in park_info[2].items():
+        site = site_index.get(site_id)
+        site_data = {
+            'site_id': site_id,
+            'dates': dates,
+            'name': site.name if site else None,
+            'loop': site.loop if site else None,
+            'campsite_type': site.campsite_type if site else None,
+            'accessible': site.accessible if site else False,
+        }
+        park_data['sites'].append(site_data)
+    return park_data
+
+
+def search_filters(params):
+    # The optional filters of a search, from the form or the stream query: a ValueError if a number is invalid
+    def ids(name):
+        return tuple(v.strip() for v in params.get(name, "").split(',') if v.strip())
+
+    nights = params.get("nights")
+    return {
+        'nights': int(nights) if nights else None,
+        'campsite_type': params.get("campsite_type") or None,
+        'campsite_ids': tuple(int(v) for v in ids("campsite_ids")),
+        # Compared with the campsite IDs of the payloads, which are strings, like the exclusion file of the CLI
+        'excluded_site_ids': ids("excluded_site_ids"),
+    }
+
+
+async def select_camp(request):
     if request.method == "POST":
         # Process the form data
         start_date_str = request.POST.get("start_date")
@@ -57,40 +97,62 @@ def select_camp(request):
         # Get the Weekends Only checkbox value
         weekends_only = request.POST.get("weekends_only") == "true"
 
+        # Nights, campsite type and campsite IDs apply to both the streamed and the rendered result
+        filters = search_filters(request.POST)
+
+        # The form asks for streamed results: render the page at once, the parks arrive over server-sent events
+        if request.POST.get("stream") == "true":
+            query = urlencode({
+                'start_date': start_date_str,
+                'end_date': end_date_str,
+                'parks': ','.join(parks),
+                'show_campsite_info': 'true' if show_campsite_info else '',
+                'weekends_only': 'true' if weekends_only else '',
+                'nights': filters['nights'] or '',
+                'campsite_type': filters['campsite_type'] or '',
+                'campsite_ids': ','.join(map(str, filters['campsite_ids'])),
+                'excluded_site_ids': ','.join(map(str, filters['excluded_site_ids'])),
+            })
+            return render(request, 'camp/camp_result.html', {
+                'start_date': start_date_str,
+                'end_date': end_date_str,
+                'parks': parks,
+                'show_campsite_info': show_campsite_info,
+                'weekends_only': weekends_only,
+                'stream_url': reverse('stream_camp') + '?' + query,
+                'title': 'Camp Reservation Result'
+            })
+
+        # Load the local metadata of every site in the requested parks with one query
+        site_index = await sync_to_async(SiteIndex.from_db)(facility_ids=parks)
+
         # Pass the 'show_campsite_info' value as "true" if checked
         if show_campsite_info:
-            output, has_availabilities, raw_campsite_info = run_campsite_check(
+            output, has_availabilities, raw_campsite_info = await run_campsite_check_async(
                 parks,
                 start_date,
                 end_date,
                 show_campsite_info=show_campsite_info,
-                weekends_only=weekends_only
+                weekends_only=weekends_only,
+                site_index=site_index,
+                index_url=settings.CAMPQUEST_INDEX_URL,
+                **filters,
             )
 
             # Convert raw_campsite_info to a list of dictionaries for easier iteration in the template
-            campsite_info = []
-            for park_id, park_info in raw_campsite_info.items():
-                park_data = {
-                    'park_id': park_id,
-                    'available_sites': park_info[0],
-                    'total_sites': park_info[1],
-                    'sites': [],
-                    'park_name': park_info[3]
-                }
-                for site_id, dates in park_info[2].items():
-                    site_data = {
-                        'site_id': site_id,
-                        'dates': dates
-                    }
-                    park_data['sites'].append(site_data)
-                campsite_info.append(park_data)
+            campsite_info = [
+                park_to_dict(park_id, park_info, site_index) for park_id, park_info in raw_campsite_info.items()
+            ]
         else:
-            output, has_availabilities = run_campsite_check(
+            output, has_availabilities = await run_campsite_check_async(
                 parks,
                 start_date,
                 end_date,
                 show_campsite_info=show_campsite_info,
-                weekends_only=weekends_only
+                weekends_only=weekends_only,
+                site_index=site_index,
+                index_url=settings.CAMPQUEST_INDEX_URL,
+                **filters,
             )
             campsite_info = None
 
@@ -107,8 +169,7 @@ def select_camp(request):
             'title': 'Camp Reservation Result'
         }
 
-        # Print the output
-        print(bcolors.OKGREEN + "Output: " + output + bcolors.ENDC)
+        LOG.debug("Output: %s", output)
 
         # Return the rendered template with the context data
         return render(request, 'camp/camp_result.html', context)
@@ -117,6 +178,76 @@ def select_camp(request):
     return render(request, 'camp/select_camp.html', {'title': 'Select Camp'})
 
 
+def server_sent_event(event, data):
+    return "event: {}\ndata: {}\n\n".format(event, json.dumps(data))
+
+
+async def stream_camp(request):
+    # Server-sent events for the result page: a "park" event per park as soon as it is checked,
+    # in the order they complete, then a "summary" event
+    try:
+        start_date = datetime.strptime(request.GET.get("start_date", ""), "%Y-%m-%d")
+        end_date = datetime.strptime(request.GET.get("end_date", ""), "%Y-%m-%d")
+    except ValueError:
+        return JsonResponse({'error': 'start_date and end_date must be dates [YYYY-MM-DD]'}, status=400)
+    parks = [p.strip() for p in request.GET.get("parks", "").split(',') if p.strip()]
+    if not parks:
+        return JsonResponse({'error': 'parks is required'}, status=400)
+    show_campsite_info = request.GET.get("show_campsite_info") == "true"
+    weekends_only = request.GET.get("weekends_only") == "true"
+    try:
+        filters = search_filters(request.GET)
+    except ValueError:
+        return JsonResponse({'error': 'nights and campsite_ids must be integers'}, status=400)
+
+    async def checked_parks():
+        remaining = parks
+        if settings.CAMPQUEST_INDEX_URL:
+            from camp.index import IndexClient
+
+            # Parks the index service answers from memory come first, the others are checked upstream
+            indexed, _ = await asyncio.to_thread(
+                IndexClient(settings.CAMPQUEST_INDEX_URL).query, parks, start_date, end_date,
+                weekends_only=weekends_only, **filters,
+            )
+            for park_id, park_info in indexed.items():
+                yield park_id, park_info
+            remaining = [park_id for park_id in parks if park_id not in indexed]
+        async for park_id, park_info in iter_parks_async(
+                remaining, start_date, end_date, weekends_only=weekends_only, **filters):
+            yield park_id, park_info
+
+    async def events():
+        started = time.monotonic()
+        site_index = await sync_to_async(SiteIndex.from_db)(facility_ids=parks)
+        available_parks = 0
+        failed_parks = 0
+        async for park_id, park_info in checked_parks():
+            if isinstance(park_info, Exception):
+                failed_parks += 1
+                yield server_sent_event('park_error', {'park_id': park_id, 'error': str(park_info)})
+                continue
+            park_data = park_to_dict(park_id, park_info, site_index)
+            if not show_campsite_info:
+                park_data['sites'] = []
+            if park_data['available_sites']:
+                available_parks += 1
+            yield server_sent_event('park', park_data)
+        yield server_sent_event('summary', {
+            'parks': len(parks),
+            'available_parks': available_parks,
+            'failed_parks': failed_parks,
+            'has_availabilities': available_parks > 0,
+            'seconds': round(time.monotonic() - started, 2),
+        })
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep proxies such as nginx from buffering the events
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 def show_parks(request):
     search_query = request.GET.get('q', '').lower()
     recareas = RecreationArea.objects.filter(name__icontains=search_query)
@@ -175,3 +306,11 @@ def show_campsites(request, facility_id):
         return JsonResponse({'error': 'Facility not found'}, status=404)
     except Campsite.DoesNotExist:
         return JsonResponse({'error': 'Campsite not found'}, status=404)
+
+
+def metrics(request):
+    # Prometheus text exposition format
+    return HttpResponse(
+        campquest_metrics.REGISTRY.render_prometheus(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,369 @@
+""" Daemon mode: many searches from one watch list, in one process.
+
+The watch list is a YAML or TOML file:
+
+    interval: 60
+    watches:
+      - name: yosemite-june
+        parks: [232447, 232450]
+        start_date: 2025-06-01
+        end_date: 2025-06-30
+        nights: 2
+        weekends_only: true
+        notify: [pushover, "webhook:https://example.com/hook"]
+
+Every watch shares one scheduler, the client's HTTP connection pool and an
+availability cache, so parks polled by several watches are fetched once per
+interval. The file is reloaded when it changes.
+"""
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, datetime
+
+from camp import metrics
+from camp.cache import AvailabilityCache
+from camp.engine import check_park, generate_human_output, generate_json_output
+from camp.enums.date_format import DateFormat
+from camp.notifiers.base import check_spec
+from camp.planner import FetchPlan
+from camp.state import fingerprint, search_scope
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 60
+SOURCES = ("recreation", "reserve_california")
+
+
+@dataclass(frozen=True)
+class Watch:
+    name: str
+    parks: tuple
+    start_date: datetime
+    end_date: datetime
+    nights: int = None
+    weekends_only: bool = False
+    campsite_type: str = None
+    campsite_ids: tuple = ()
+    excluded_site_ids: tuple = ()
+    source: str = "recreation"
+    # Notifier specs, see camp/notifiers/base.py.
+    notify: tuple = ("stdout",)
+    json_output: bool = False
+    interval: float = None
+
+
+@dataclass
+class WatchList:
+    watches: list
+    interval: float = DEFAULT_INTERVAL
+
+
+def _to_datetime(value, name, key):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    try:
+        return datetime.strptime(str(value), DateFormat.INPUT_DATE_FORMAT.value)
+    except ValueError:
+        raise ValueError("Watch {}: {} is not a valid date: {!r}".format(name, key, value))
+
+
+def parse_watch(entry, position):
+    """ Build a Watch from one entry of the watch list.
+
+    Args:
+        entry: The entry, a dict.
+        position: The position of the entry, used for the default name.
+
+    Returns:
+        Watch: The watch.
+    """
+    name = str(entry.get("name") or "watch-{}".format(position + 1))
+    unknown = set(entry) - set(Watch.__dataclass_fields__)
+    if unknown:
+        raise ValueError("Watch {}: unknown keys {}".format(name, ", ".join(sorted(unknown))))
+    for key in ("parks", "start_date", "end_date"):
+        if not entry.get(key):
+            raise ValueError("Watch {}: {} is required".format(name, key))
+
+    parks = entry["parks"]
+    if not isinstance(parks, (list, tuple)):
+        parks = [parks]
+    start_date = _to_datetime(entry["start_date"], name, "start_date")
+    end_date = _to_datetime(entry["end_date"], name, "end_date")
+    if end_date <= start_date:
+        raise ValueError("Watch {}: end_date must be after start_date".format(name))
+
+    nights = entry.get("nights")
+    if nights is not None and int(nights) <= 0:
+        raise ValueError("Watch {}: not a valid number of nights: {}".format(name, nights))
+    source = entry.get("source", "recreation")
+    if source not in SOURCES:
+        raise ValueError("Watch {}: source must be one of {}".format(name, ", ".join(SOURCES)))
+    notify = entry.get("notify", "stdout")
+    notify = tuple(notify) if isinstance(notify, (list, tuple)) else (notify,)
+    for spec in notify:
+        try:
+            check_spec(spec)
+        except ValueError as e:
+            raise ValueError("Watch {}: {}".format(name, e))
+
+    return Watch(
+        name=name,
+        parks=tuple(int(park) for park in parks),
+        start_date=start_date,
+        end_date=end_date,
+        nights=int(nights) if nights is not None else None,
+        weekends_only=bool(entry.get("weekends_only", False)),
+        campsite_type=entry.get("campsite_type"),
+        campsite_ids=tuple(int(i) for i in entry.get("campsite_ids", ())),
+        excluded_site_ids=tuple(str(i) for i in entry.get("excluded_site_ids", ())),
+        source=source,
+        notify=notify,
+        json_output=bool(entry.get("json_output", False)),
+        interval=float(entry["interval"]) if entry.get("interval") else None,
+    )
+
+
+def load_watch_list(path):
+    """ Load a YAML (.yaml, .yml) or TOML (.toml) watch list.
+
+    Args:
+        path: The path of the watch list.
+
+    Returns:
+        WatchList: The watches and the default interval.
+    """
+    if os.path.splitext(path)[1] == ".toml":
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+
+        with open(path, "rb") as f:
+            try:
+                data = tomllib.load(f)
+            except tomllib.TOMLDecodeError as e:
+                raise ValueError("Invalid TOML in {}: {}".format(path, e))
+    else:
+        import yaml
+
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                data = yaml.safe_load(f) or {}
+            except yaml.YAMLError as e:
+                raise ValueError("Invalid YAML in {}: {}".format(path, e))
+    if not isinstance(data, dict):
+        raise ValueError("The watch list must be a mapping with a watches list")
+
+    watches = [parse_watch(entry, i) for i, entry in enumerate(data.get("watches") or [])]
+    names = [watch.name for watch in watches]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError("Duplicate watch names: {}".format(", ".join(duplicates)))
+    return WatchList(watches, float(data.get("interval", DEFAULT_INTERVAL)))
+
+
+class WatchDaemon:
+    """ Runs every watch of a watch list on one schedule until stopped.
+
+    Like --continuous, a park stops being checked for a watch once it has
+    availability and the watch was notified. A watch starts over when its
+    entry in the file changes. With a StateStore the progress of every watch
+    and the fetched payloads survive a restart.
+    """
+
+    def __init__(self, path, clock=time.monotonic, sleep=time.sleep, out=print, state=None):
+        self.path = path
+        self.clock = clock
+        self.sleep = sleep
+        self.out = out
+        self.mtime = None
+        self.loaded = False
+        self.watch_list = WatchList([])
+        self.state = state
+        self.cache = AvailabilityCache(DEFAULT_INTERVAL, clock=clock, store=state)
+        self.remaining = {}
+        self.next_due = {}
+        self.dispatchers = {}
+
+    def reload_if_changed(self):
+        """ Reload the watch list if the file changed. A broken file keeps the previous watches.
+
+        Returns:
+            bool: True if the watch list was reloaded.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            LOG.error("Cannot read watch list %s: %s", self.path, e)
+            return False
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+
+        try:
+            watch_list = load_watch_list(self.path)
+        except ValueError as e:
+            if not self.loaded:
+                raise
+            LOG.error("Keeping the previous watch list, %s is invalid: %s", self.path, e)
+            return False
+
+        previous = {watch.name: watch for watch in self.watch_list.watches}
+        for watch in watch_list.watches:
+            if previous.get(watch.name) != watch:
+                self.start(watch)
+        for name in set(previous) - {watch.name for watch in watch_list.watches}:
+            self.remaining.pop(name, None)
+            self.next_due.pop(name, None)
+
+        self.watch_list = watch_list
+        self.loaded = True
+        # Payloads stay fresh for the shortest interval, a watch polled more often than
+        # the list must not be served months fetched for the list interval.
+        self.cache.ttl = min([watch_list.interval] + [self.interval_for(watch) for watch in watch_list.watches])
+        LOG.info("Loaded %s watch(es) from %s", len(watch_list.watches), self.path)
+        return True
+
+    @staticmethod
+    def scope(watch):
+        return search_scope(**asdict(watch))
+
+    def start(self, watch):
+        """ Start a watch, resuming its saved progress if there is any. """
+        self.remaining[watch.name] = set(watch.parks)
+        self.next_due[watch.name] = self.clock()
+        saved = self.state.load_search(self.scope(watch)) if self.state else None
+        if saved and saved[0]:
+            remaining, next_due = saved
+            self.remaining[watch.name] = {p for p in watch.parks if str(p) in remaining}
+            if next_due:
+                self.next_due[watch.name] += max(next_due - time.time(), 0.0)
+            LOG.info("Watch %s resumed, %s park(s) left", watch.name, len(self.remaining[watch.name]))
+
+    def save(self, watch):
+        if self.state:
+            wait = self.next_due[watch.name] - self.clock()
+            self.state.save_search(self.scope(watch), self.remaining[watch.name], time.time() + wait)
+
+    def interval_for(self, watch):
+        return watch.interval or self.watch_list.interval
+
+    def check(self, watch, fetch=None):
+        """ Check the remaining parks of a watch and notify if any have availability. """
+        for park_id in sorted(self.remaining[watch.name]):
+            try:
+                with metrics.timer("campquest_stage_seconds", stage="check_park", park=str(park_id)):
+                    info = check_park(
+                        park_id,
+                        watch.start_date,
+                        watch.end_date,
+                        watch.campsite_type,
+                        watch.campsite_ids,
+                        nights=watch.nights,
+                        weekends_only=watch.weekends_only,
+                        excluded_site_ids=watch.excluded_site_ids,
+                        source=watch.source,
+                        fetch=fetch or self.cache.get,
+                    )
+            except Exception as e:
+                from camp.clients import breaker
+
+                # One failing park must not hold up the others, its circuit breaker skips it cheaply.
+                if breaker.is_skipped(e):
+                    LOG.info("Watch %s: park %s skipped: %s", watch.name, park_id, e)
+                else:
+                    LOG.exception("Watch %s: park %s failed, retrying next interval", watch.name, park_id)
+                continue
+            if watch.json_output:
+                output, has_availabilities = generate_json_output({park_id: info})
+            else:
+                output, has_availabilities = generate_human_output(
+                    {park_id: info}, watch.start_date, watch.end_date, True)
+
+            if not has_availabilities:
+                LOG.info("Watch %s: no availability for park ID %s.", watch.name, park_id)
+                continue
+            self.remaining[watch.name].discard(park_id)
+            if self.state:
+                reported = fingerprint(info[2])
+                if self.state.seen(self.scope(watch), park_id) == reported:
+                    LOG.info("Watch %s: park %s has the availability already reported.", watch.name, park_id)
+                    continue
+                self.state.mark_seen(self.scope(watch), park_id, reported)
+            self.notify(watch, output)
+
+    def notify(self, watch, output):
+        LOG.info("Watch %s found availability, notifying %s", watch.name, ", ".join(watch.notify))
+        for spec in watch.notify:
+            if spec == "stdout":
+                self.out("[{}]\n{}".format(watch.name, output))
+                continue
+            # One dispatcher per target, shared by the watches notifying it.
+            if spec not in self.dispatchers:
+                from camp.notifiers.dispatcher import NotificationDispatcher
+
+                self.dispatchers[spec] = NotificationDispatcher([spec])
+            self.dispatchers[spec].submit(output, "CampQuest: {}".format(watch.name))
+
+    def run_cycle(self):
+        """ Reload the watch list if needed and check every watch that is due.
+
+        Returns:
+            float: Seconds until the next watch is due.
+        """
+        self.reload_if_changed()
+        now = self.clock()
+        due_watches = [
+            watch for watch in self.watch_list.watches
+            if self.next_due.get(watch.name, now) <= now and self.remaining.get(watch.name)
+        ]
+
+        # Fetch every park month the due watches need once, then evaluate each watch against it.
+        plan = FetchPlan(self.cache.get)
+        for watch in due_watches:
+            if watch.source == "recreation":
+                for park_id in self.remaining[watch.name]:
+                    plan.add(park_id, watch.start_date, watch.end_date)
+        plan.fetch_all()
+
+        for watch in due_watches:
+            due = self.next_due.get(watch.name, now)
+            metrics.set_gauge("campquest_scheduler_lag_seconds", max(now - due, 0.0), watch=watch.name)
+            try:
+                self.check(watch, fetch=plan.get)
+            except Exception:
+                LOG.exception("Watch %s failed, retrying next interval", watch.name)
+            self.next_due[watch.name] = max(due + self.interval_for(watch), self.clock())
+            self.save(watch)
+        self.cache.prune()
+        if due_watches:
+            metrics.inc("campquest_cycles_total")
+
+        waiting = [self.next_due[watch.name] for watch in self.watch_list.watches
+                   if self.remaining.get(watch.name)]
+        if not waiting:
+            return self.watch_list.interval
+        return max(min(waiting) - self.clock(), 0.0)
+
+    def run(self, max_cycles=None):
+        """ Run until interrupted, or for max_cycles cycles.
+
+        Args:
+            max_cycles: The number of cycles to run, None to run forever. Defaults to None.
+        """
+        cycles = 0
+        try:
+            while max_cycles is None or cycles < max_cycles:
+                wait = self.run_cycle()
+                cycles += 1
+                if max_cycles is None or cycles < max_cycles:
+                    # Wake up at least every second to notice changes to the file.
+                    self.sleep(min(wait, 1.0))
+        finally:
+            for dispatcher in self.dispatchers.values():
+                dispatcher.close()
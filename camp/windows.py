@@ -0,0 +1,225 @@
+""" Flexible-date search: every stay that fits a season, from one fetch.
+
+A fixed search asks for one date range and one number of nights. A
+flexible query describes a season instead, e.g. "2 or 3 nights arriving on
+a Friday or Saturday between June and September, not over July 4th", and
+every candidate window is evaluated against the availability of the whole
+season, fetched once per park month.
+"""
+import bisect
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import FrozenSet, Optional, Tuple
+
+from camp import metrics
+from camp.engine import get_park_information
+from camp.enums.date_format import DateFormat
+from camp.enums.emoji import Emoji
+
+LOG = logging.getLogger(__name__)
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def parse_weekdays(values):
+    """ Parse weekday names such as fri, Saturday or "fri,sat".
+
+    Returns:
+        frozenset: The weekday numbers, Monday is 0.
+    """
+    weekdays = set()
+    for value in values:
+        for name in value.split(","):
+            name = name.strip().lower()[:3]
+            if name not in WEEKDAYS:
+                raise ValueError("Not a weekday: '{}'.".format(value))
+            weekdays.add(WEEKDAYS.index(name))
+    return frozenset(weekdays)
+
+
+def parse_blackouts(values):
+    """ Parse blackout dates, YYYY-MM-DD or an inclusive YYYY-MM-DD:YYYY-MM-DD range.
+
+    Returns:
+        frozenset: The blacked out dates.
+    """
+    dates = set()
+    for value in values:
+        first, _, last = value.partition(":")
+        try:
+            first = datetime.strptime(first, DateFormat.INPUT_DATE_FORMAT.value).date()
+            last = datetime.strptime(last, DateFormat.INPUT_DATE_FORMAT.value).date() if last else first
+        except ValueError:
+            raise ValueError("Not a valid date or date range: '{}'.".format(value))
+        dates.update(first + timedelta(days=i) for i in range((last - first).days + 1))
+    return frozenset(dates)
+
+
+@dataclass(frozen=True)
+class FlexibleQuery:
+    season_start: date
+    # The last possible departure day, like --end-date.
+    season_end: date
+    min_nights: int = 1
+    max_nights: Optional[int] = None
+    # Weekday numbers a stay may start on, Monday is 0. Empty allows any day.
+    arrival_weekdays: FrozenSet[int] = frozenset()
+    # No night of a stay may fall on these dates.
+    blackout_dates: FrozenSet[date] = frozenset()
+
+    def __post_init__(self):
+        if self.min_nights < 1:
+            raise ValueError("The minimum number of nights must be at least 1.")
+        if self.max_nights is not None and self.max_nights < self.min_nights:
+            raise ValueError("The maximum number of nights is below the minimum.")
+        if self.season_end <= self.season_start:
+            raise ValueError("The season must end after it starts.")
+
+    def candidates(self):
+        """ Yield every (arrival, nights) window of the season that meets the constraints. """
+        max_nights = self.max_nights or self.min_nights
+        end = self.season_end.toordinal()
+        blackouts = sorted(d.toordinal() for d in self.blackout_dates)
+        for arrival in range(self.season_start.toordinal(), end - self.min_nights + 1):
+            if self.arrival_weekdays and date.fromordinal(arrival).weekday() not in self.arrival_weekdays:
+                continue
+            # A stay can last until the next blackout night or the end of the season.
+            following = bisect.bisect_left(blackouts, arrival)
+            last = min(end, blackouts[following]) if following < len(blackouts) else end
+            for nights in range(self.min_nights, min(max_nights, last - arrival) + 1):
+                yield arrival, nights
+
+
+@dataclass(frozen=True)
+class Window:
+    arrival: date
+    nights: int
+    site_ids: Tuple[int, ...] = field(default=())
+
+    @property
+    def departure(self):
+        return self.arrival + timedelta(days=self.nights)
+
+    def as_dict(self):
+        return {
+            "arrival": self.arrival.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+            "departure": self.departure.strftime(DateFormat.INPUT_DATE_FORMAT.value),
+            "nights": self.nights,
+            "site_ids": list(self.site_ids),
+        }
+
+
+def run_lengths(park_information):
+    """ Count, for each site and available night, the consecutive available nights starting that night.
+
+    Args:
+        park_information: The available dates by campsite ID, see get_park_information.
+
+    Returns:
+        dict: The run length by date ordinal, by integer campsite ID.
+    """
+    runs_by_site = {}
+    for site_id, dates in park_information.items():
+        ordinals = sorted({
+            datetime.strptime(d, DateFormat.ISO_DATE_FORMAT_RESPONSE.value).toordinal() for d in dates
+        }, reverse=True)
+        runs = runs_by_site[int(site_id)] = {}
+        for ordinal in ordinals:
+            runs[ordinal] = runs.get(ordinal + 1, 0) + 1
+    return runs_by_site
+
+
+def find_windows(park_information, query):
+    """ Evaluate every candidate window of a query against a park's availability.
+
+    Each site's available nights are turned into run lengths once: the
+    number of consecutive available nights starting on each date. A window
+    then fits a site when the run at its arrival covers its nights, so the
+    cost grows with sites times candidate windows, with no date parsing or
+    range scanning per window.
+
+    Args:
+        park_information: The available dates by campsite ID, see get_park_information.
+        query: The FlexibleQuery.
+
+    Returns:
+        list: The Windows with at least one site, ranked by arrival then nights.
+    """
+    runs_by_arrival = {}
+    for site_id, runs in run_lengths(park_information).items():
+        for ordinal, length in runs.items():
+            runs_by_arrival.setdefault(ordinal, []).append((length, site_id))
+
+    windows = []
+    for arrival, nights in query.candidates():
+        sites = tuple(sorted(site_id for length, site_id in runs_by_arrival.get(arrival, ()) if length >= nights))
+        if sites:
+            windows.append(Window(date.fromordinal(arrival), nights, sites))
+    return windows
+
+
+def check_park_windows(
+    park_id, query, campsite_type=None, campsite_ids=(), excluded_site_ids=(), allowed_site_ids=None, fetch=None,
+):
+    """ Check a recreation.gov park for every window of a flexible query.
+
+    Args:
+        park_id: The park ID to check.
+        query: The FlexibleQuery.
+        campsite_type: The campsite type. Defaults to None.
+        campsite_ids: The campsite IDs. Defaults to ().
+        excluded_site_ids: The campsite IDs to exclude. Defaults to ().
+        allowed_site_ids: The campsite IDs left by the query planner, or None to keep all. Defaults to None.
+        fetch: Gets a month of availability, see get_park_information. Defaults to None.
+
+    Returns:
+        tuple: The Windows ranked by arrival, the number of sites and the park name.
+    """
+    from camp.clients.recreation_client import RecreationClient
+
+    season_start = datetime.combine(query.season_start, datetime.min.time())
+    season_end = datetime.combine(query.season_end, datetime.min.time())
+    park_information = get_park_information(
+        park_id, season_start, season_end, campsite_type, campsite_ids, excluded_site_ids=excluded_site_ids,
+        allowed_site_ids=allowed_site_ids, fetch=fetch,
+    )
+    with metrics.timer("campquest_stage_seconds", stage="windows", park=str(park_id)):
+        windows = find_windows(park_information, query)
+    LOG.info("Park %s: %s window(s) fit the query", park_id, len(windows))
+    return windows, len(park_information), RecreationClient.get_park_name(park_id)
+
+
+def generate_windows_output(windows_by_park_id, json_output=False):
+    """ Format the windows of each park.
+
+    Args:
+        windows_by_park_id: The check_park_windows tuple by park ID.
+        json_output: Whether to output JSON. Defaults to False.
+
+    Returns:
+        tuple: The output and whether any window was found.
+    """
+    has_windows = any(windows for windows, _, _ in windows_by_park_id.values())
+    if json_output:
+        return json.dumps({
+            park_id: {"park_name": park_name, "windows": [w.as_dict() for w in windows]}
+            for park_id, (windows, _, park_name) in windows_by_park_id.items() if windows
+        }, indent=2), has_windows
+
+    out = ["There are stays available 😊" if has_windows else "There are no stays available 😢"]
+    for park_id, (windows, maximum, park_name) in windows_by_park_id.items():
+        out.append("{emoji} {park_name} ({park_id}): {count} stay(s) across {maximum} site(s)".format(
+            emoji=Emoji.SUCCESS.value if windows else Emoji.FAILURE.value,
+            park_name=park_name, park_id=park_id, count=len(windows), maximum=maximum,
+        ))
+        for window in windows:
+            out.append("  * {arrival} -> {departure} ({nights} night(s)): {count} site(s) {sites}".format(
+                arrival=window.arrival.strftime("%a %Y-%m-%d"),
+                departure=window.departure.strftime("%a %Y-%m-%d"),
+                nights=window.nights,
+                count=len(window.site_ids),
+                sites=", ".join(str(s) for s in window.site_ids),
+            ))
+    return "\n".join(out), has_windows
@@ -117,6 +117,10 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# The index service (python cli.py --serve-index ...) searches are answered from,
+# e.g. unix:/run/campquest/index.sock. Without it searches go to the upstream APIs.
+CAMPQUEST_INDEX_URL = os.environ.get("CAMPQUEST_INDEX_URL")
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -0,0 +1,13 @@
+"""
+Django settings for running the camp tests.
+
+Uses an in-memory database and leaves out the development-only apps so the
+tests only need Django itself.
+"""
+from campsitefinder.settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS if app not in ("livesync", "django_user_agents")
+]
+
+DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}}
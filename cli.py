@@ -1,37 +1,43 @@
 # -*- coding: utf-8 -*-
 #!/usr/bin/env python3
 
-import json
 import logging
 import sys
 import time
-import rich_click as click
-from collections import defaultdict
-from datetime import datetime, timedelta
-from itertools import count, groupby
+from datetime import datetime
 
-from dateutil import rrule
+import click
 
-from camp.clients.recreation_client import RecreationClient
+from camp import metrics
+# The search engine is shared with the web app. Its functions stay importable
+# from cli for scripts and tests written against earlier versions.
+from camp.engine import (check_park, check_park_async, check_parks_async, consecutive_nights,
+                         generate_human_output, generate_json_output, get_num_available_sites, get_park_information,
+                         is_weekend, iter_parks_async, month_starts)
 from camp.enums.date_format import DateFormat
 from camp.enums.emoji import Emoji
 from camp.utils import formatter
+from camp.utils.log import configure_logging
 
-from camp.clients.reservecalifornia_client import rc_get_all_available_campsites, rc_get_campground_url
+# The API clients (requests, user agents), the notifier (dotenv), rich-click
+# and the profiler are slow to import. The CLI runs from cron every minute, so
+# they are imported where they are used, only when the chosen options need them.
 
-from notifier import send_notification, check_limit
+LOG = logging.getLogger(__name__)
 
-click.rich_click.USE_RICH_MARKUP = True
+# Seconds between checks in continuous mode.
+CYCLE_SECONDS = 5
 
-LOG = logging.getLogger(__name__)
-log_formatter = logging.Formatter(
-    "%(asctime)s - %(process)s - %(levelname)s - %(message)s"
-)
 
-# FileHandler for file output with UTF-8 encoding
-fh = logging.FileHandler('campquest.log', encoding='utf-8')
-fh.setFormatter(log_formatter)
-LOG.addHandler(fh)
+class RichHelpCommand(click.Command):
+    """ Formats --help with rich-click, imported only when help is shown.
+    """
+
+    def format_help(self, ctx, formatter):
+        from rich_click import rich_click
+
+        rich_click.USE_RICH_MARKUP = True
+        rich_click.rich_format_help(self, ctx, formatter)
 
 
 class bcolors:
@@ -48,311 +54,6 @@ class bcolors:
     UNDERLINE = '\033[4m'
 
 
-def get_park_information(
-    park_id, start_date, end_date, campsite_type=None, campsite_ids=(), excluded_site_ids=[]
-):
-    """ Get park information for a given date range.
-
-    Args:
-        park_id: The park ID to get information for.
-        start_date: The start date of the date range.
-        end_date: The end date of the date range.
-        campsite_type: The campsite type, only for recreation.gov. Defaults to None.
-        campsite_ids: The campsite IDs to get information for. Defaults to ().
-        excluded_site_ids: The campsite IDs to exclude. Defaults to [].
-
-    Returns:
-        dict: The park information.
-    """
-    # Get each first of the month for months in the range we care about.
-    start_of_month = datetime(start_date.year, start_date.month, 1)
-    months = list(
-        rrule.rrule(rrule.MONTHLY, dtstart=start_of_month, until=end_date)
-    )
-
-    # Get data for each month.
-    api_data = []
-    for month_date in months:
-        api_data.append(RecreationClient.get_availability(park_id, month_date))
-
-    # Collapse the data into the described output format.
-    # Filter by campsite_type if necessary.
-    data = {}
-
-    for month_data in api_data:
-        for campsite_id, campsite_data in month_data["campsites"].items():
-            if campsite_id in excluded_site_ids:
-                continue
-            available = []
-            a = data.setdefault(campsite_id, [])
-            for date, availability_value in campsite_data[
-                "availabilities"
-            ].items():
-                if availability_value != "Available":
-                    continue
-
-                if (
-                    campsite_type
-                    and campsite_type != campsite_data["campsite_type"]
-                ):
-                    continue
-
-                if (
-                    len(campsite_ids) > 0
-                    and int(campsite_data["campsite_id"]) not in campsite_ids
-                ):
-                    continue
-
-                available.append(date)
-            if available:
-                a += available
-
-    return data
-
-
-def is_weekend(date):
-    """ Check if a date is a weekend.
-
-    Args:
-        date: The date to check if it is a weekend.
-
-    Returns:
-        bool: True if the date is a weekend, False otherwise.
-    """
-    weekday = date.weekday()
-    return weekday == 5 or weekday == 6
-
-
-def get_num_available_sites(
-    park_information, start_date, end_date, nights=None, weekends_only=False,
-):
-    """ Get the number of available sites for a given date range.
-
-    Args:
-        park_information: The park information.
-        start_date: The start date of the date range.
-        end_date: The end date of the date range.
-        nights: The number of nights. Defaults to None.
-        weekends_only: Whether to include only weekends. Defaults to False.
-
-    Returns:
-        tuple: The number of available sites, the maximum number of sites, and the available dates by campsite ID
-    """
-    maximum = len(park_information)
-
-    num_available = 0
-    num_days = (end_date - start_date).days
-    dates = [end_date - timedelta(days=i) for i in range(1, num_days + 1)]
-    if weekends_only:
-        dates = filter(is_weekend, dates)
-    dates = set(
-        formatter.format_date(
-            i, format_string=DateFormat.ISO_DATE_FORMAT_RESPONSE.value
-        )
-        for i in dates
-    )
-
-    if nights not in range(1, num_days + 1):
-        nights = num_days
-        LOG.info("Setting number of nights to {}.".format(nights))
-
-    available_dates_by_campsite_id = defaultdict(list)
-    for site, availabilities in park_information.items():
-        # List of dates that are in the desired range for this site.
-        desired_available = []
-
-        for date in availabilities:
-            if date not in dates:
-                continue
-            desired_available.append(date)
-
-        if not desired_available:
-            continue
-
-        appropriate_consecutive_ranges = consecutive_nights(
-            desired_available, nights
-        )
-
-        if appropriate_consecutive_ranges:
-            num_available += 1
-            LOG.info("Available site {}: {}".format(num_available, site))
-
-        for r in appropriate_consecutive_ranges:
-            start, end = r
-            available_dates_by_campsite_id[int(site)].append(
-                {"start": start, "end": end}
-            )
-
-    return num_available, maximum, available_dates_by_campsite_id
-
-
-def consecutive_nights(available, nights):
-    """ Returns a list of dates from which you can start that have
-    enough consecutive nights. If there is one or more entries in this list, there is at least one date range for this site that is available.
-
-    Args:
-        available: The list of available dates.
-        nights: The number of nights to find.
-
-    Returns:
-        list: The list of consecutive nights.
-    """
-    ordinal_dates = [
-        datetime.strptime(
-            dstr, DateFormat.ISO_DATE_FORMAT_RESPONSE.value
-        ).toordinal()
-        for dstr in available
-    ]
-    c = count()
-
-    consecutive_ranges = list(
-        list(g) for _, g in groupby(ordinal_dates, lambda x: x - next(c))
-    )
-
-    long_enough_consecutive_ranges = []
-    for r in consecutive_ranges:
-        # Skip ranges that are too short.
-        if len(r) < nights:
-            continue
-        for start_index in range(0, len(r) - nights + 1):
-            start_nice = formatter.format_date(
-                datetime.fromordinal(r[start_index]),
-                format_string=DateFormat.INPUT_DATE_FORMAT.value,
-            )
-            end_nice = formatter.format_date(
-                datetime.fromordinal(r[start_index + nights - 1] + 1),
-                format_string=DateFormat.INPUT_DATE_FORMAT.value,
-            )
-            long_enough_consecutive_ranges.append((start_nice, end_nice))
-
-    return long_enough_consecutive_ranges
-
-
-def check_park(
-    park_id, start_date, end_date, campsite_type, campsite_ids=(), nights=None, weekends_only=False, excluded_site_ids=[], source="recreation",
-):
-    """ Check a park for availability.
-
-    Args:
-        park_id: The park ID to check.
-        start_date: The start date.
-        end_date: The end date.
-        campsite_type: The campsite type. Defaults to None.
-        campsite_ids: The campsite IDs. Defaults to ().
-        nights: The number of nights. Defaults to None.
-        weekends_only: Whether to include only weekends. Defaults to False.
-        excluded_site_ids: The campsite IDs to exclude. Defaults to [].
-        source: The source of the park information, recreation or reserve_california. Defaults to "recreation".
-
-    Returns:
-        tuple: The number of available sites, the maximum number of sites, and the available dates by campsite ID, park name
-    """
-    if source == "recreation":
-        park_information = get_park_information(
-            park_id, start_date, end_date, campsite_type, campsite_ids, excluded_site_ids=excluded_site_ids,
-        )
-        park_name = RecreationClient.get_park_name(park_id)
-        current, maximum, availabilities_filtered = get_num_available_sites(
-            park_information, start_date, end_date, nights=nights, weekends_only=weekends_only,
-        )
-    elif source == "reserve_california":
-        park_information = rc_get_all_available_campsites(
-            park_id, start_date, (end_date - start_date).days // 30
-        )
-        # Get the campground name from the first available campsite
-        park_name = park_information[0].campsite.campground if park_information else "Unknown"
-        current = len(park_information)
-        maximum = current  # Update with the actual max if available
-        availabilities_filtered = {site.campsite.campsite: [
-            {"start": site.date, "end": site.date}] for site in park_information}
-
-    return current, maximum, availabilities_filtered, park_name
-
-
-def generate_human_output(
-    info_by_park_id, start_date, end_date, gen_campsite_info=False
-):
-    """ Generate human readable output. If gen_campsite_info is True, it will also display campsite ID and availability dates.
-
-    Args:
-        info_by_park_id: The information by park ID.
-        start_date: The start date.
-        end_date: The end date.
-        gen_campsite_info: Whether to display campsite ID and availability dates. Defaults to False. 
-
-    Returns:
-        tuple: The human readable output and whether there are availabilities.
-    """
-    out = []
-    has_availabilities = False
-    for park_id, info in info_by_park_id.items():
-        current, maximum, available_dates_by_site_id, park_name = info
-        if current:
-            emoji = Emoji.SUCCESS.value
-            has_availabilities = True
-        else:
-            emoji = Emoji.FAILURE.value
-
-        out.append(
-            "{emoji} {park_name} ({park_id}): {current} site(s) available out of {maximum} site(s)".format(
-                emoji=emoji,
-                park_name=park_name,
-                park_id=park_id,
-                current=current,
-                maximum=maximum,
-            )
-        )
-
-        # Displays campsite ID and availability dates.
-        if gen_campsite_info and available_dates_by_site_id:
-            for site_id, dates in available_dates_by_site_id.items():
-                out.append(
-                    "  * Site {site_id} is available on the following dates:".format(
-                        site_id=site_id
-                    )
-                )
-                for date in dates:
-                    out.append(
-                        "    * {start} -> {end}".format(
-                            start=date["start"], end=date["end"]
-                        )
-                    )
-
-    if has_availabilities:
-        out.insert(
-            0, "There are campsites available from {start} to {end} 😊".format(
-                start=start_date.strftime(DateFormat.INPUT_DATE_FORMAT.value),
-                end=end_date.strftime(DateFormat.INPUT_DATE_FORMAT.value),
-            ),
-        )
-    else:
-        out.insert(0, "There are no campsites available 😢")
-    return "\n".join(out), has_availabilities
-
-
-def generate_json_output(info_by_park_id):
-    """ Generate JSON output.
-
-    Args:
-        info_by_park_id: The information by park ID. 
-
-    Returns:
-        tuple: The JSON output and whether there are availabilities.
-    """
-    availabilities_by_park_id = {}
-    has_availabilities = False
-    for park_id, info in info_by_park_id.items():
-        current, _, available_dates_by_site_id, park_name = info
-        if current:
-            has_availabilities = True
-            availabilities_by_park_id[park_id] = {
-                "park_name": park_name,
-                "availabilities": available_dates_by_site_id
-            }
-
-    return json.dumps(availabilities_by_park_id, indent=2), has_availabilities
-
-
 def remove_comments(lines: list[str]) -> list[str]:
     """ Remove comments from a list of lines. Comments are lines that start with a '#'.
 
@@ -393,20 +94,18 @@ def countdown_timer(seconds):
     sys.stdout.write("Completed waiting.\n")
 
 
-@click.command()
+@click.command(cls=RichHelpCommand)
 @click.option(
     "--start-date",
-    required=True,
-    help="Start date [YYYY-MM-DD]",
+    help="Start date [YYYY-MM-DD]. Required unless --watch-file is given.",
     type=str,
-    callback=lambda ctx, param, value: TypeConverter.date(value),
+    callback=lambda ctx, param, value: TypeConverter.date(value) if value else value,
 )
 @click.option(
     "--end-date",
-    required=True,
-    help="End date [YYYY-MM-DD]. You expect to leave this day, not stay the night.",
+    help="End date [YYYY-MM-DD]. You expect to leave this day, not stay the night. Required unless --watch-file is given.",
     type=str,
-    callback=lambda ctx, param, value: TypeConverter.date(value),
+    callback=lambda ctx, param, value: TypeConverter.date(value) if value else value,
 )
 @click.option(
     "--nights",
@@ -437,7 +136,7 @@ def countdown_timer(seconds):
     "--json-output",
     is_flag=True,
     help=(
-        "This make the script output JSON instead of human readable output. Note, this is incompatible with the twitter notifier. This output includes more precise information, such as the exact available dates and which sites are available."
+        "This make the script output JSON instead of human readable output. This output includes more precise information, such as the exact available dates and which sites are available."
     ),
 )
 @click.option(
@@ -447,6 +146,52 @@ def countdown_timer(seconds):
         "Include only weekends (i.e. starting Friday or Saturday)"
     ),
 )
+@click.option(
+    "--flexible",
+    is_flag=True,
+    help="Treat --start-date and --end-date as a season and list every stay in it that meets --min-nights, --max-nights, --arrival-day and --blackout, ranked by arrival. Each park month is fetched once.",
+)
+@click.option(
+    "--min-nights",
+    type=int,
+    callback=lambda ctx, param, value: TypeConverter.positive_int(
+        value) if value else value,
+    help="With --flexible, the shortest stay. Defaults to --nights, or 1.",
+)
+@click.option(
+    "--max-nights",
+    type=int,
+    callback=lambda ctx, param, value: TypeConverter.positive_int(
+        value) if value else value,
+    help="With --flexible, the longest stay. Defaults to the shortest.",
+)
+@click.option(
+    "--arrival-day",
+    "arrival_days",
+    multiple=True,
+    help="With --flexible, a weekday a stay may start on, e.g. fri or fri,sat. Repeatable. Defaults to any day.",
+)
+@click.option(
+    "--blackout",
+    "blackouts",
+    multiple=True,
+    help="With --flexible, a date [YYYY-MM-DD] or inclusive range [YYYY-MM-DD:YYYY-MM-DD] no night of a stay may fall on. Repeatable.",
+)
+@click.option(
+    "--itinerary",
+    is_flag=True,
+    help="Also find stays that switch sites when no single site is free for every night, with the fewest site changes.",
+)
+@click.option(
+    "--same-loop",
+    is_flag=True,
+    help="With --itinerary, keep every site of a stay in one loop. Requires --site-index.",
+)
+@click.option(
+    "--max-changes",
+    type=int,
+    help="With --itinerary, the most site changes to accept. Defaults to no limit.",
+)
 @click.option(
     "--exclusion-file",
     is_flag=True,
@@ -476,27 +221,286 @@ def countdown_timer(seconds):
 @click.option(
     "--notify",
     is_flag=True,
-    help="Send a Pushover notification when campsites are available.",
+    help="Send a Pushover notification when campsites are available. Same as --notifier pushover.",
+)
+@click.option(
+    "--notifier",
+    "notifiers",
+    multiple=True,
+    help="Notify this target when campsites are available: pushover, webhook:URL, smtp:ADDRESS[,ADDRESS], file:PATH or stdout. Repeatable.",
 )
 @click.option(
     "--continuous",
     is_flag=True,
     help="Run the search continuously until a campsite is found."
 )
+@click.option(
+    "--state-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Checkpoint the search to this SQLite file: remaining parks, the next check, reported availability and the last payloads. A restarted search resumes without repeating requests or notifications.",
+)
+@click.option(
+    "--shard-db",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Split the parks of this search with every worker running it against the same SQLite file. Workers hash parks onto each other, lease them, and take over the parks of a worker that stops.",
+)
+@click.option(
+    "--worker-id",
+    help="With --shard-db, the name of this worker. Defaults to host-pid.",
+)
+@click.option(
+    "--show-shards",
+    is_flag=True,
+    help="With --shard-db, print the merged results of all workers for this search and exit.",
+)
+@click.option(
+    "--watch-file",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Run as a daemon checking every search in this YAML or TOML watch list on one schedule. The file is reloaded when it changes.",
+)
+@click.option(
+    "--site-index",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Campsite metadata exported with `python manage.py export_site_index`. Adds site names, loops and types to the output and filters sites locally.",
+)
+@click.option(
+    "--accessible-only",
+    is_flag=True,
+    help="Include only accessible campsites. Requires --site-index.",
+)
+@click.option(
+    "--pipeline",
+    "use_pipeline",
+    is_flag=True,
+    help="Fetch on threads and decode and evaluate on a process pool, overlapping network waits and CPU work across parks. Results print as they complete. Faster on big sweeps.",
+)
+@click.option(
+    "--fetch-workers",
+    type=int,
+    default=8,
+    show_default=True,
+    help="With --pipeline, the number of parks fetched at once.",
+)
+@click.option(
+    "--cpu-workers",
+    type=int,
+    help="With --pipeline, the number of processes decoding and evaluating payloads, 0 for none. Defaults to the number of cores.",
+)
+@click.option(
+    "--serve-index",
+    metavar="ADDRESS",
+    help="Run the index service on ADDRESS (host:port or unix:/path/to.sock): keep the availability of the parks and dates searched, or of every search in --watch-file, in memory and answer queries from it.",
+)
+@click.option(
+    "--index-refresh",
+    type=float,
+    default=60,
+    show_default=True,
+    help="With --serve-index, seconds between refreshes of the indexed availability.",
+)
+@click.option(
+    "--index-url",
+    metavar="ADDRESS",
+    help="Answer the search from the index service at ADDRESS instead of the upstream APIs. Parks it does not index are skipped.",
+)
+@click.option(
+    "--request-timeout",
+    type=float,
+    help="Seconds to wait for an upstream response before giving up on it. Defaults to 30, or CAMPQUEST_HTTP_TIMEOUT.",
+)
+@click.option(
+    "--deadline",
+    type=float,
+    help="Seconds a sweep of all parks may take. Parks without an answer by then are reported stale and checked again next sweep.",
+)
+@click.option(
+    "--hedge",
+    is_flag=True,
+    help="Send a second request when one is slower than the usual p95 latency and use whichever answers first. Spends at most 10% more requests.",
+)
+@click.option(
+    "--request-budget",
+    type=click.IntRange(min=1),
+    help="Send at most this many upstream requests a minute, waiting when the budget is spent. Defaults to 120 with --release-at, no limit otherwise.",
+)
+@click.option(
+    "--release-at",
+    help="Sites are released at this time [YYYY-MM-DD HH:MM[:SS][+HH:MM], local time without an offset]. Runs continuously: warms up before the release, polls at the release instant, then every --burst-interval for --burst-seconds.",
+)
+@click.option(
+    "--burst-seconds",
+    type=float,
+    default=120,
+    show_default=True,
+    help="With --release-at, seconds of fast polling after the release.",
+)
+@click.option(
+    "--burst-interval",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="With --release-at, seconds between polls during the burst.",
+)
+@click.option(
+    "--base-url",
+    help="Send requests for the chosen source to this base URL instead, e.g. a local mock server (python -m benchmarks.mock_server).",
+)
+@click.option(
+    "--metrics",
+    "show_metrics",
+    is_flag=True,
+    help="Print request latency, download size and per-stage timings at exit. In continuous mode a stats line is also printed every cycle.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Run the search under a profiler and print the hottest functions, split into network wait and CPU time.",
+)
+@click.option(
+    "--profile-output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="With --profile, also write the profile. Use a .pstats file for pstats/snakeviz or a .folded file for flamegraph tools.",
+)
 def main(debug, start_date, end_date, nights, campsite_ids, show_campsite_info, campsite_type, json_output,
-         weekends_only, exclusion_file, parks, stdin, source, notify, continuous):
+         weekends_only, flexible, min_nights, max_nights, arrival_days, blackouts, itinerary, same_loop,
+         max_changes, exclusion_file, parks, stdin, source, notify, notifiers, continuous, state_file, shard_db, worker_id,
+         show_shards, watch_file, site_index, accessible_only, use_pipeline,
+         fetch_workers, cpu_workers, serve_index, index_refresh, index_url, request_timeout, deadline, hedge, request_budget,
+         release_at, burst_seconds, burst_interval, base_url, show_metrics, profile, profile_output):
     """ 
         This program is designed to check the availability of campsites in various parks over a specified date range. It uses a rich set of options to customize the search criteria and output format.
     """
-
+    if profile:
+        params = dict(click.get_current_context().params,
+                      profile=False, profile_output=None)
+        from camp import profiling
+
+        result, report = profiling.profile_call(main.callback, **params)
+        print(report.render())
+        if profile_output:
+            report.write(profile_output)
+            print("Profile written to {}".format(profile_output))
+        return result
+
+    configure_logging(logging.DEBUG if debug else logging.INFO)
     if debug:
-        LOG.setLevel(logging.DEBUG)
         LOG.debug("Debug mode enabled.")
-    else:
-        LOG.setLevel(logging.INFO)
 
-    LOG.info("Received inputs: start_date=%s, end_date=%s, nights=%s, campsite_ids=%s, show_campsite_info=%s, campsite_type=%s, json_output=%s, weekends_only=%s, exclusion_file=%s, parks=%s, stdin=%s, source=%s, notify=%s, continuous=%s",
-             start_date, end_date, nights, campsite_ids, show_campsite_info, campsite_type, json_output, weekends_only, exclusion_file, parks, stdin, source, notify, continuous)
+    LOG.info("Received inputs: start_date=%s, end_date=%s, nights=%s, campsite_ids=%s, show_campsite_info=%s, campsite_type=%s, json_output=%s, weekends_only=%s, exclusion_file=%s, parks=%s, stdin=%s, source=%s, notify=%s, notifiers=%s, continuous=%s, state_file=%s, watch_file=%s, site_index=%s, accessible_only=%s",
+             start_date, end_date, nights, campsite_ids, show_campsite_info, campsite_type, json_output, weekends_only, exclusion_file, parks, stdin, source, notify, notifiers, continuous, state_file, watch_file, site_index, accessible_only)
+
+    if show_metrics:
+        click.get_current_context().call_on_close(
+            lambda: print(metrics.REGISTRY.summary()))
+
+    if base_url:
+        if source == "recreation":
+            from camp.clients.recreation_client import RecreationClient
+            RecreationClient.set_base_url(base_url)
+        else:
+            from camp.clients import reservecalifornia_client
+            reservecalifornia_client.set_base_url(base_url)
+        LOG.info("Using base URL %s for %s", base_url, source)
+
+    from camp.clients import latency
+
+    schedule = None
+    if release_at:
+        if source != "recreation":
+            raise click.UsageError("--release-at only supports --source recreation.")
+        if flexible or itinerary or shard_db or watch_file:
+            raise click.UsageError("--release-at cannot be combined with --flexible, --itinerary, --shard-db or --watch-file.")
+        if burst_interval <= 0 or burst_seconds < 0:
+            raise click.UsageError("--burst-interval must be positive and --burst-seconds not negative.")
+        from camp import burst
+
+        try:
+            schedule = burst.BurstSchedule(burst.parse_release(release_at), window=burst_seconds,
+                                           interval=burst_interval, normal_interval=CYCLE_SECONDS)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--release-at")
+        continuous = True
+        request_budget = request_budget or burst.DEFAULT_BUDGET
+
+    budget = latency.RequestBudget(request_budget) if request_budget else None
+    latency.configure(timeout=request_timeout, hedge=hedge, budget=budget)
+    click.get_current_context().call_on_close(lambda: (latency.set_deadline(None), latency.configure()))
+
+    if serve_index and watch_file:
+        from camp.index import watch_list_searches
+
+        try:
+            watch_list_searches(watch_file)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--watch-file")
+        return run_index_service(serve_index, lambda: watch_list_searches(watch_file), index_refresh, state_file)
+
+    if watch_file:
+        from camp.watch import WatchDaemon
+
+        daemon = WatchDaemon(watch_file, state=open_state(state_file))
+        try:
+            daemon.reload_if_changed()
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--watch-file")
+        try:
+            daemon.run()
+        except KeyboardInterrupt:
+            LOG.info("Watch daemon stopped.")
+        return
+
+    if not start_date or not end_date:
+        raise click.UsageError(
+            "--start-date and --end-date are required unless --watch-file is given.")
+
+    query = None
+    if flexible:
+        if source != "recreation":
+            raise click.UsageError("--flexible only supports --source recreation.")
+        if continuous or shard_db:
+            raise click.UsageError("--flexible cannot be combined with --continuous or --shard-db.")
+        from camp.windows import FlexibleQuery, parse_blackouts, parse_weekdays
+
+        try:
+            query = FlexibleQuery(
+                start_date.date(), end_date.date(), min_nights=min_nights or nights or 1, max_nights=max_nights,
+                arrival_weekdays=parse_weekdays(arrival_days), blackout_dates=parse_blackouts(blackouts),
+            )
+        except ValueError as e:
+            raise click.UsageError(str(e))
+    elif min_nights or max_nights or arrival_days or blackouts:
+        raise click.UsageError("--min-nights, --max-nights, --arrival-day and --blackout require --flexible.")
+
+    if itinerary:
+        if source != "recreation":
+            raise click.UsageError("--itinerary only supports --source recreation.")
+        if flexible or continuous or shard_db:
+            raise click.UsageError("--itinerary cannot be combined with --flexible, --continuous or --shard-db.")
+        if same_loop and not site_index:
+            raise click.UsageError("--same-loop requires --site-index.")
+    elif same_loop or max_changes is not None:
+        raise click.UsageError("--same-loop and --max-changes require --itinerary.")
+
+    if use_pipeline:
+        if source != "recreation":
+            raise click.UsageError("--pipeline only supports --source recreation.")
+        if flexible or itinerary or shard_db:
+            raise click.UsageError("--pipeline cannot be combined with --flexible, --itinerary or --shard-db.")
+
+    if index_url:
+        if source != "recreation":
+            raise click.UsageError("--index-url only supports --source recreation.")
+        if flexible or itinerary or shard_db or use_pipeline or release_at or accessible_only:
+            raise click.UsageError("--index-url cannot be combined with --flexible, --itinerary, --shard-db, "
+                                   "--pipeline, --release-at or --accessible-only.")
+    if serve_index and source != "recreation":
+        raise click.UsageError("--serve-index only supports --source recreation.")
+
+    if accessible_only and not site_index:
+        raise click.UsageError("--accessible-only requires --site-index.")
+    if site_index:
+        from camp.site_index import SiteIndex
+        site_index = SiteIndex.load(site_index)
 
     if stdin:
         input_lines = sys.stdin.read().strip().split('\n')
@@ -507,6 +511,9 @@ def main(debug, start_date, end_date, nights, campsite_ids, show_campsite_info,
         raise click.UsageError(
             "You must provide at least one park ID using --parks or --stdin.")
 
+    if serve_index:
+        return run_index_service(serve_index, lambda: [(parks, start_date, end_date)], index_refresh, state_file)
+
     excluded_site_ids = []
     if exclusion_file:
         with open(exclusion_file, "r") as f:
@@ -514,66 +521,406 @@ def main(debug, start_date, end_date, nights, campsite_ids, show_campsite_info,
             excluded_site_ids = [l.strip() for l in excluded_site_ids]
             excluded_site_ids = remove_comments(excluded_site_ids)
 
+    # Skip parks the local site index shows cannot match, before any network call
+    allowed_site_ids_by_park = {}
+    if source == "recreation" and site_index is not None:
+        from camp.planner import plan_parks
+
+        plans, pruned = plan_parks(
+            parks,
+            site_index,
+            campsite_type=campsite_type,
+            campsite_ids=campsite_ids,
+            excluded_site_ids=excluded_site_ids,
+            accessible_only=accessible_only,
+        )
+        for park_id, reason in pruned.items():
+            print("{emoji} Park {park_id} skipped: {reason}".format(
+                emoji=Emoji.SKIPPED.value, park_id=park_id, reason=reason))
+        parks = [plan.park_id for plan in plans]
+        allowed_site_ids_by_park = {
+            plan.park_id: plan.allowed_site_ids for plan in plans}
+
+    if notify:
+        notifiers = ("pushover",) + tuple(n for n in notifiers if n != "pushover")
+    dispatcher = None
+    if notifiers:
+        from camp.notifiers.base import check_spec
+        from camp.notifiers.dispatcher import NotificationDispatcher
+
+        for spec in notifiers:
+            try:
+                check_spec(spec)
+            except ValueError as e:
+                raise click.BadParameter(str(e), param_hint="--notifier")
+        # Hits found within a couple of seconds are merged into one message,
+        # delivered off the polling loop.
+        dispatcher = NotificationDispatcher(notifiers)
+        click.get_current_context().call_on_close(dispatcher.close)
+
     remaining_parks = set(parks)  # Track parks without availability
+    next_cycle_at = None
 
-    while remaining_parks:
-        parks_to_check = list(remaining_parks)  # Copy the remaining parks list
+    store = scope = fetch = None
+    if state_file or shard_db:
+        from camp.state import search_scope
+
+        scope = search_scope(
+            parks=sorted(parks), start_date=start_date, end_date=end_date, nights=nights,
+            campsite_type=campsite_type, campsite_ids=sorted(campsite_ids), weekends_only=weekends_only,
+            excluded_site_ids=excluded_site_ids, source=source, accessible_only=accessible_only,
+        )
+    if (worker_id or show_shards) and not shard_db:
+        raise click.UsageError("--worker-id and --show-shards require --shard-db.")
+    if show_shards:
+        return show_shard_results(shard_db, scope, start_date, end_date, json_output, show_campsite_info,
+                                  site_index)
+
+    if state_file:
+        from camp.state import fingerprint
+        from camp.cache import AvailabilityCache
+
+        store = open_state(state_file)
+        if source == "recreation":
+            # Bursts revalidate every poll, unchanged months cost a 304.
+            fetch = AvailabilityCache(0 if schedule else CYCLE_SECONDS, store=store).get
+        saved = store.load_search(scope)
+        # Sharded workers share their progress through the shard file instead.
+        if saved and saved[0] and not shard_db and not query and not itinerary:
+            remaining_parks = {park_id for park_id in parks if str(park_id) in saved[0]}
+            LOG.info("Resuming from %s, %s park(s) left", state_file, len(remaining_parks))
+            wait = saved[1] - time.time() if saved[1] else 0
+            if remaining_parks and wait > 0:
+                next_cycle_at = time.monotonic() + wait
+                countdown_timer(int(wait + 0.999))
+
+    if query:
+        return run_flexible_search(
+            parks, query, campsite_type, campsite_ids, excluded_site_ids, allowed_site_ids_by_park, fetch,
+            json_output, dispatcher,
+        )
+
+    if itinerary:
+        return run_itinerary_search(
+            parks, start_date, end_date, nights, campsite_type, campsite_ids, excluded_site_ids,
+            allowed_site_ids_by_park, fetch, site_index, same_loop, max_changes, json_output, dispatcher,
+        )
 
-        for park_id in parks_to_check:
-            info_by_park_id = {}
-            info_by_park_id[park_id] = check_park(
-                park_id,
-                start_date,
-                end_date,
-                campsite_type,
-                campsite_ids,
-                nights=nights,
-                weekends_only=weekends_only,
-                excluded_site_ids=excluded_site_ids,
-                source=source
+    def check(park_id):
+        with metrics.timer("campquest_stage_seconds", stage="check_park", park=str(park_id)):
+            return check_park(
+                park_id, start_date, end_date, campsite_type, campsite_ids, nights=nights,
+                weekends_only=weekends_only, excluded_site_ids=excluded_site_ids, source=source,
+                allowed_site_ids=allowed_site_ids_by_park.get(park_id), fetch=fetch,
             )
 
-            if json_output:
-                output, has_availabilities = generate_json_output(
-                    info_by_park_id)
-            else:
-                output, has_availabilities = generate_human_output(
-                    info_by_park_id,
-                    start_date,
-                    end_date,
-                    show_campsite_info,
-                )
+    if shard_db:
+        return run_shard_worker(shard_db, scope, parks, check, worker_id, continuous, dispatcher,
+                                lambda info_by_park_id: render(info_by_park_id, start_date, end_date, json_output,
+                                                               show_campsite_info, site_index))
+
+    pipeline = None
+    if use_pipeline:
+        from camp.pipeline import Pipeline
+
+        pipeline = Pipeline(
+            start_date, end_date, campsite_type, campsite_ids, nights=nights, weekends_only=weekends_only,
+            excluded_site_ids=excluded_site_ids, fetch=fetch, fetch_workers=fetch_workers, cpu_workers=cpu_workers,
+        )
+        click.get_current_context().call_on_close(pipeline.close)
+
+    index_client = None
+    if index_url:
+        from camp.index import IndexClient
+
+        index_client = IndexClient(index_url)
+
+    if schedule:
+        burst.prepare(schedule, parks, connections=fetch_workers if use_pipeline else 4)
+
+    while remaining_parks:
+        parks_to_check = list(remaining_parks)  # Copy the remaining parks list
+        if next_cycle_at is not None:
+            metrics.set_gauge("campquest_scheduler_lag_seconds",
+                              max(time.monotonic() - next_cycle_at, 0.0))
+
+        notified = False
+        latency.set_deadline(deadline)
+        if index_client:
+            results = index_client.results(
+                parks_to_check, start_date, end_date, nights=nights, weekends_only=weekends_only,
+                campsite_type=campsite_type, campsite_ids=campsite_ids, excluded_site_ids=excluded_site_ids,
+            )
+        elif pipeline:
+            # Parks come out as they are ready, while the next ones are fetched and evaluated.
+            results = pipeline.run(parks_to_check, allowed_site_ids_by_park, keep_going=continuous)
+        else:
+            # In continuous mode a failing park is retried next cycle, its circuit breaker keeps that cheap.
+            results = check_parks(parks_to_check, check, keep_going=continuous)
+        for park_id, info in results:
+            if isinstance(info, Exception):
+                report_skipped(park_id, info)
+                continue
+            info_by_park_id = {park_id: info}
+
+            with metrics.timer("campquest_stage_seconds", stage="output"):
+                if json_output:
+                    output, has_availabilities = generate_json_output(
+                        info_by_park_id, site_index=site_index)
+                else:
+                    output, has_availabilities = generate_human_output(
+                        info_by_park_id,
+                        start_date,
+                        end_date,
+                        show_campsite_info,
+                        site_index=site_index,
+                    )
 
             #  Setup so it runs in a loop if notify is selected until a site is found
             if has_availabilities:
                 print(output)
-                LOG.info("Output: %s", output)
+                LOG.info("Output: %s", formatter.truncate(output))
                 LOG.info("Success! Output generated - No Notification Sent!")
                 remaining_parks.remove(park_id)  # Remove park from the loop
                 # return has_availabilities
-                if notify:
-                    print(output)
-                    send_notification(output, "CampQuest")
-                    limit_data = check_limit()
-                    LOG.info("Message limit: %s, Remaining: %s",
-                             limit_data.get("limit"), limit_data.get("remaining"))
-                    LOG.info("Success! Output generated - Notification Sent!")
-                    return has_availabilities
+                reported = None
+                if store:
+                    reported = fingerprint(info_by_park_id[park_id][2])
+                    if store.seen(scope, park_id) == reported:
+                        LOG.info("Park %s has the availability already reported, not notifying.", park_id)
+                        reported = None
+                    else:
+                        store.mark_seen(scope, park_id, reported)
+                if dispatcher and (reported or not store):
+                    dispatcher.submit(output)
+                    notified = True
             else:
                 print(output)
                 LOG.info(f"No availability for park ID {park_id}.")
+            if store:
+                store.save_search(scope, remaining_parks)
+        latency.set_deadline(None)
+
+        # The cycle is checked to the end so every park found in it is notified, then the search stops.
+        if notified:
+            dispatcher.close()
+            LOG.info("Notifications sent: %s, failed: %s",
+                     dict(dispatcher.sent), dict(dispatcher.failed))
+            LOG.info("Success! Output generated - Notification Sent!")
+            return True
 
         if not continuous:  # Exit the loop if not in continuous mode
             break
 
+        metrics.inc("campquest_cycles_total")
+        if show_metrics:
+            stats = metrics.REGISTRY.stats_line()
+            LOG.info("Stats: %s", stats)
+            print("Stats: " + stats)
+
         if remaining_parks:
+            poll_at = schedule.next_poll() if schedule else time.time() + CYCLE_SECONDS
+            wait = poll_at - time.time()
             LOG.info(
-                "No availability found for some parks, checking again in 60 seconds...")
-            countdown_timer(5)  # Wait 60 seconds before re-checking
+                "No availability found for some parks, checking again in %.1f seconds...", wait)
+            next_cycle_at = time.monotonic() + wait
+            if store:
+                store.save_search(scope, remaining_parks, time.time() + wait)
+            if schedule and wait < CYCLE_SECONDS:
+                # Too short for a countdown, the next poll keeps to the burst grid.
+                burst.sleep_until(poll_at)
+            else:
+                countdown_timer(int(wait + 0.999))
         else:
             LOG.info("All parks checked. Exiting loop.")
 
 
+def render(info_by_park_id, start_date, end_date, json_output, show_campsite_info, site_index):
+    """ Render the results of some parks as JSON or human output, with whether any has availability. """
+    if json_output:
+        return generate_json_output(info_by_park_id, site_index=site_index)
+    return generate_human_output(info_by_park_id, start_date, end_date, show_campsite_info,
+                                 site_index=site_index)
+
+
+def check_parks(parks, check, keep_going=False):
+    """ Check parks in turn.
+
+    A park that times out, misses the sweep deadline or has an open circuit
+    is yielded with its error, and so is every failed park with keep_going.
+    """
+    from camp.clients import breaker
+
+    for park_id in parks:
+        try:
+            info = check(park_id)
+        except Exception as e:
+            if not (keep_going or breaker.is_skipped(e)):
+                raise
+            info = e
+        yield park_id, info
+
+
+def report_skipped(park_id, error):
+    from camp.clients import breaker, latency
+    from camp.index import NotIndexed
+
+    if latency.is_stale(error):
+        metrics.inc("campquest_stale_parks_total")
+        reason = "is stale: no answer before the deadline"
+    elif isinstance(error, (breaker.CircuitOpen, NotIndexed)):
+        reason = "skipped: {}".format(error)
+    else:
+        reason = "failed: {}".format(error)
+    print("{emoji} Park {park_id} {reason}, it stays in the next sweep.".format(
+        emoji=Emoji.STALE.value if latency.is_stale(error) else Emoji.SKIPPED.value,
+        park_id=park_id, reason=reason))
+    LOG.warning("Park %s %s", park_id, reason)
+
+
+def run_index_service(address, searches, interval, state_file):
+    """ Serve the index of the searched parks on `address` until interrupted. """
+    from camp.index import AvailabilityIndex, IndexService, make_server
+
+    fetch = None
+    if state_file:
+        from camp.cache import AvailabilityCache
+
+        # Unchanged months are revalidated with a conditional request.
+        fetch = AvailabilityCache(0, store=open_state(state_file)).get
+    index = AvailabilityIndex()
+    service = IndexService(index, searches, interval=interval, fetch=fetch)
+    server = make_server(address, index)
+    service.start()
+    print("Serving the availability index on {}".format(address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        LOG.info("Index service stopped.")
+    finally:
+        service.stop()
+        server.server_close()
+
+
+def run_flexible_search(parks, query, campsite_type, campsite_ids, excluded_site_ids, allowed_site_ids_by_park,
+                        fetch, json_output, dispatcher):
+    """ Print every window of a flexible query in each park, notifying when there is one. """
+    from camp.windows import check_park_windows, generate_windows_output
+
+    windows_by_park_id = {}
+    for park_id in parks:
+        with metrics.timer("campquest_stage_seconds", stage="check_park", park=str(park_id)):
+            windows_by_park_id[park_id] = check_park_windows(
+                park_id, query, campsite_type, campsite_ids, excluded_site_ids=excluded_site_ids,
+                allowed_site_ids=allowed_site_ids_by_park.get(park_id), fetch=fetch,
+            )
+    output, has_windows = generate_windows_output(windows_by_park_id, json_output)
+    print(output)
+    LOG.info("Output: %s", formatter.truncate(output))
+    if has_windows and dispatcher:
+        dispatcher.submit(output)
+    return has_windows
+
+
+def run_itinerary_search(parks, start_date, end_date, nights, campsite_type, campsite_ids, excluded_site_ids,
+                         allowed_site_ids_by_park, fetch, site_index, same_loop, max_changes, json_output, dispatcher):
+    """ Print the itineraries with the fewest site changes in each park, notifying when there is one. """
+    from camp.itinerary import check_park_itineraries, generate_itinerary_output
+
+    itineraries_by_park_id = {}
+    for park_id in parks:
+        with metrics.timer("campquest_stage_seconds", stage="check_park", park=str(park_id)):
+            itineraries_by_park_id[park_id] = check_park_itineraries(
+                park_id, start_date, end_date, nights=nights, campsite_type=campsite_type,
+                campsite_ids=campsite_ids, excluded_site_ids=excluded_site_ids,
+                allowed_site_ids=allowed_site_ids_by_park.get(park_id), fetch=fetch, site_index=site_index,
+                same_loop=same_loop, max_changes=max_changes,
+            )
+    output, has_itineraries = generate_itinerary_output(itineraries_by_park_id, json_output)
+    print(output)
+    LOG.info("Output: %s", formatter.truncate(output))
+    if has_itineraries and dispatcher:
+        dispatcher.submit(output)
+    return has_itineraries
+
+
+def run_shard_worker(shard_db, scope, parks, check, worker_id, continuous, dispatcher, render_parks):
+    """ Check this worker's share of the parks, every cycle in continuous mode.
+
+    Every worker prints what it checked. Only the worker that sees an
+    availability change notifies, so the workers never notify twice.
+
+    Args:
+        shard_db: The path of the shared SQLite file.
+        scope: The search scope.
+        parks: Every park ID of the search.
+        check: Called with a park ID, returns the check_park tuple.
+        worker_id: The name of this worker, or None.
+        continuous: Whether to keep checking until interrupted.
+        dispatcher: The NotificationDispatcher, or None.
+        render_parks: Called with info_by_park_id, returns the output and whether there is availability.
+    """
+    from camp.shard import ShardWorker
+
+    worker = ShardWorker(shard_db, scope, parks, check, worker_id=worker_id)
+    LOG.info("Shard worker %s started on %s", worker.worker_id, shard_db)
+    try:
+        while True:
+            checked = worker.run_cycle()
+            LOG.info("Worker %s checked %s of %s park(s)", worker.worker_id, len(checked), len(parks))
+            for park_id, info, changed in checked:
+                output, has_availabilities = render_parks({park_id: info})
+                print(output)
+                if has_availabilities and changed and dispatcher:
+                    dispatcher.submit(output)
+            if not continuous:
+                break
+            metrics.inc("campquest_cycles_total")
+            countdown_timer(CYCLE_SECONDS)
+    except KeyboardInterrupt:
+        LOG.info("Shard worker %s stopped.", worker.worker_id)
+    finally:
+        # Hand the parks over to the other workers now rather than when the lease expires.
+        worker.stop()
+
+
+def show_shard_results(shard_db, scope, start_date, end_date, json_output, show_campsite_info, site_index):
+    """ Print the merged results of every worker of a sharded search. """
+    from camp.shard import merged_view
+
+    info_by_park_id, checked_by, workers = merged_view(shard_db, scope)
+    if not info_by_park_id:
+        print("No results for this search in {} yet.".format(shard_db))
+        return False
+    output, has_availabilities = render(info_by_park_id, start_date, end_date, json_output, show_campsite_info,
+                                        site_index)
+    print(output)
+    if not json_output:
+        print("Live workers: {}".format(", ".join(workers) or "none"))
+        for park_id, (checked_worker, checked_at) in sorted(checked_by.items(), key=lambda item: str(item[0])):
+            print("  park {} checked by {} at {}".format(
+                park_id, checked_worker, datetime.fromtimestamp(checked_at).strftime("%Y-%m-%d %H:%M:%S")))
+    return has_availabilities
+
+
+def open_state(state_file):
+    """ Open the state store, closed when the command exits.
+
+    Args:
+        state_file: The path of the SQLite file, or None.
+
+    Returns:
+        StateStore: The store, or None without a state file.
+    """
+    if not state_file:
+        return None
+    from camp.state import StateStore
+
+    store = StateStore(state_file)
+    click.get_current_context().call_on_close(store.close)
+    return store
+
+
 class TypeConverter:
     @classmethod
     def date(cls, date_str):